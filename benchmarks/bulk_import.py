@@ -0,0 +1,87 @@
+# Скорость импорта: строки в секунду через одиночные POST и через пакетные эндпоинты.
+#
+#   uvicorn main:app --port 8000
+#   python -m benchmarks.bulk_import --url http://127.0.0.1:8000 --rows 5000
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import httpx
+
+
+async def auth_headers(client):
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    password = "bench_password"
+    await client.post("/users/signup", json={"username": username, "email": f"{username}@example.com", "password": password})
+    response = await client.post("/users/signin", json={"username": username, "password": password})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def landmark(i):
+    return {
+        "name": f"Bench landmark {i}",
+        "description": "Synthetic landmark for the import benchmark",
+        "location": "Bench city",
+        "country": "Benchland",
+        "image_url": "https://example.com/bench.jpg",
+    }
+
+
+# Одиночные запросы, concurrency штук одновременно
+async def single(client, headers, rows, concurrency):
+    queue = asyncio.Queue()
+    for i in range(rows):
+        queue.put_nowait(i)
+
+    async def worker():
+        while not queue.empty():
+            i = queue.get_nowait()
+            await client.post("/landmarks/landmarks", json=landmark(i), headers=headers)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started
+
+
+async def bulk(client, headers, rows, chunk_size, ndjson):
+    if ndjson:
+        body = "\n".join(json.dumps(landmark(i)) for i in range(rows)).encode("utf-8")
+        request_headers = {**headers, "Content-Type": "application/x-ndjson"}
+    else:
+        body = json.dumps([landmark(i) for i in range(rows)]).encode("utf-8")
+        request_headers = {**headers, "Content-Type": "application/json"}
+
+    started = time.perf_counter()
+    response = await client.post(f"/landmarks/landmarks/bulk?chunk_size={chunk_size}", content=body, headers=request_headers)
+    elapsed = time.perf_counter() - started
+    response.raise_for_status()
+    return elapsed
+
+
+async def run(url, rows, concurrency, chunk_size):
+    async with httpx.AsyncClient(base_url=url, timeout=600) as client:
+        headers = await auth_headers(client)
+        results = {
+            "single": await single(client, headers, rows, concurrency),
+            "bulk_json": await bulk(client, headers, rows, chunk_size, ndjson=False),
+            "bulk_ndjson": await bulk(client, headers, rows, chunk_size, ndjson=True),
+        }
+    for name, elapsed in results.items():
+        print(f"{name}: rows={rows} seconds={elapsed:.3f} rows_per_sec={rows / elapsed:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Single vs bulk import benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rows, args.concurrency, args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# Нагрузочный тест: пропускная способность API при N одновременных клиентах.
+#
+# Запуск (сервер должен быть уже поднят):
+#   uvicorn main:app --port 8000
+#   python -m benchmarks.concurrency --url http://127.0.0.1:8000 --clients 100 --requests 20
+#
+# Чтобы сравнить "до" и "после", запустите скрипт на двух ревизиях
+# и сравните строки "rps" и "p99".
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+# Эндпоинты, которые дёргает каждый клиент по кругу
+DEFAULT_PATHS = [
+    "/landmarks/",
+    "/landmarks/landmarks/1",
+    "/landmarks/landmarks/country/France",
+    "/photos/",
+    "/ratings/landmark/1",
+    "/users/",
+]
+
+
+async def run_client(client: httpx.AsyncClient, paths, requests_per_client, latencies, errors):
+    for i in range(requests_per_client):
+        path = paths[i % len(paths)]
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(str(e))
+        latencies.append(time.perf_counter() - started)
+
+
+async def run(url: str, clients: int, requests_per_client: int, paths):
+    latencies = []
+    errors = []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            run_client(client, paths, requests_per_client, latencies, errors)
+            for _ in range(clients)
+        ))
+        elapsed = time.perf_counter() - started
+
+    return {"clients": clients, **summarize(latencies, errors, elapsed)}
+
+
+# Сводка по списку задержек (в секундах)
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    if not total:
+        return {"requests": 0, "errors": len(errors)}
+    return {
+        "requests": total,
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[min(total - 1, int(total * 0.99))] * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrency benchmark for the Landmark API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 100, 200])
+    parser.add_argument("--requests", type=int, default=20, help="requests per client")
+    args = parser.parse_args()
+
+    for clients in args.clients:
+        result = asyncio.run(run(args.url, clients, args.requests, DEFAULT_PATHS))
+        print(" ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Чтения по id при большом числе одновременных клиентов: пачки и общие запросы слоя данных
+# (generateCRUDControllers.py) против прямого session.get, в одном процессе на одних данных.
+#   hot    - все клиенты волной запрашивают одну и ту же сводку оценок и одного пользователя;
+#   spread - каждый клиент волны запрашивает свою фотографию.
+# Для каждого режима: rps, p50/p95 и число SQL-запросов (на запрос и всего).
+#
+#   python -m benchmarks.fanout --clients 500 --waves 5
+#   python -m benchmarks.fanout --env --clients 500     # база из .env (данные добавляются)
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+from benchmarks.suite import Recorder, summarize
+
+SCENARIOS = ("hot", "spread")
+
+
+async def run(args):
+    import httpx
+    from sqlalchemy import select
+    from main import app
+    import generateCRUDControllers
+    from config.database import ReadSessionLocal, async_engine, read_async_engine
+    from models.landmarks import Landmark
+    from models.photo import Photo
+    from models.user import User
+    from services.queryCounter import count_queries
+
+    async with ReadSessionLocal() as db:
+        landmark_id = (await db.execute(select(Landmark.id).order_by(Landmark.id.desc()).limit(1))).scalar_one()
+        user_id = (await db.execute(select(User.id).order_by(User.id.desc()).limit(1))).scalar_one()
+        photo_ids = (await db.execute(select(Photo.id).order_by(Photo.id.desc()).limit(args.clients * args.waves))).scalars().all()
+
+    def paths(scenario, wave):
+        if scenario == "hot":
+            return [f"/ratings/landmark/{landmark_id}/summary" if i % 2 else f"/users/{user_id}" for i in range(args.clients)]
+        start = wave * args.clients
+        return [f"/photos/{photo_ids[(start + i) % len(photo_ids)]}" for i in range(args.clients)]
+
+    engines = {async_engine.sync_engine, read_async_engine.sync_engine}
+    results = []
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fanout", timeout=120) as client:
+            for scenario in args.scenarios:
+                for batching in (False, True):
+                    generateCRUDControllers.REPOSITORY_BATCHING = batching
+                    recorder = Recorder()
+                    counters = [count_queries(engine) for engine in engines]
+                    for counter in counters:
+                        counter.__enter__()
+                    started = time.perf_counter()
+                    try:
+                        for wave in range(args.waves):
+                            await asyncio.gather(*(recorder.request(client, "GET", path) for path in paths(scenario, wave)))
+                    finally:
+                        elapsed = time.perf_counter() - started
+                        for counter in counters:
+                            counter.__exit__(None, None, None)
+                    summary = summarize(recorder.latencies, recorder.errors, elapsed, sum(counter.count for counter in counters))
+                    mode = "batched" if batching else "direct"
+                    results.append((scenario, mode, summary))
+                    print(f"{scenario:6} {mode:7} " + " ".join(f"{key}={summary[key]}" for key in
+                          ("requests", "errors", "rps", "p50_ms", "p95_ms", "queries", "queries_per_request")), flush=True)
+    print("repositories", generateCRUDControllers.repository_stats())
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fan-out by-id reads: batched repository vs direct session.get")
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "landmarks_fanout.db"), help="SQLite file")
+    parser.add_argument("--env", action="store_true", help="Use the database from .env instead of SQLite")
+    parser.add_argument("--clients", type=int, default=500, help="concurrent requests per wave")
+    parser.add_argument("--waves", type=int, default=5)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.env:
+        os.environ["DB_DIALECT"] = "sqlite"
+        os.environ["DB_NAME"] = args.database
+        os.environ.pop("DB_ASYNC_DIALECT", None)
+        os.environ.pop("DB_REPLICA_HOST", None)
+        if os.path.exists(args.database):
+            os.remove(args.database)
+
+    from config.createtables import create_tables, create_synthetic_data
+    create_tables()
+    create_synthetic_data(100, 100, args.clients * args.waves, 1000, seed=args.seed)
+
+    asyncio.run(run(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
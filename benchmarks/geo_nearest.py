@@ -0,0 +1,140 @@
+# Задержка поиска k ближайших на 1 млн точек.
+#
+#   python -m benchmarks.geo_nearest --points 1000000 --queries 2000
+#   python -m benchmarks.geo_nearest --points 1000000 --database --seed-database
+#
+# По умолчанию меряется индекс в памяти (GEO_BACKEND=memory). С --database - запросы
+# по индексу geohash в базе из .env; --seed-database сначала заливает туда точки.
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from services.geo import GeoIndex, LandmarkGeo
+
+# Точки сгущаются вокруг "городов", как настоящие достопримечательности
+CITIES = 2000
+CITY_SPREAD_DEG = 0.3
+
+
+def generate(points, seed):
+    rng = random.Random(seed)
+    cities = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(CITIES)]
+    for landmark_id in range(1, points + 1):
+        if rng.random() < 0.9:
+            city_lat, city_lon = rng.choice(cities)
+            latitude = max(-90.0, min(90.0, rng.gauss(city_lat, CITY_SPREAD_DEG)))
+            longitude = max(-180.0, min(180.0, rng.gauss(city_lon, CITY_SPREAD_DEG)))
+        else:
+            latitude, longitude = rng.uniform(-80, 80), rng.uniform(-180, 180)
+        yield landmark_id, latitude, longitude
+
+
+def queries(count, seed):
+    rng = random.Random(seed + 1)
+    cities = [(rng.uniform(-60, 70), rng.uniform(-180, 180)) for _ in range(50)]
+    result = []
+    for _ in range(count):
+        # Половина - рядом с плотными местами, половина - случайные точки (океан, пустыня)
+        if rng.random() < 0.5:
+            city_lat, city_lon = rng.choice(cities)
+            result.append((rng.gauss(city_lat, CITY_SPREAD_DEG), rng.gauss(city_lon, CITY_SPREAD_DEG)))
+        else:
+            result.append((rng.uniform(-80, 80), rng.uniform(-180, 180)))
+    return result
+
+
+def report(label, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{label}: queries={len(latencies)} p50={statistics.median(latencies):.2f}ms "
+        f"p95={p95:.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms"
+    )
+
+
+def bench_memory(args):
+    index = GeoIndex()
+    started = time.perf_counter()
+    for landmark_id, latitude, longitude in generate(args.points, args.seed):
+        index.add(landmark_id, latitude, longitude, f"Landmark {landmark_id}", None, None)
+    print(f"indexed {len(index)} points in {time.perf_counter() - started:.1f}s")
+
+    latencies = []
+    for latitude, longitude in queries(args.queries, args.seed):
+        started = time.perf_counter()
+        index.nearest(latitude, longitude, args.k)
+        latencies.append((time.perf_counter() - started) * 1000)
+    report(f"memory k={args.k}", latencies)
+
+
+async def seed_database(points, seed):
+    from sqlalchemy import insert, select, func
+    from config.database import AsyncSessionLocal
+    from models.landmarks import Landmark
+    from models.photo import Photo  # нужны для настройки связей моделей
+    from models.rating import Rating
+    from models.user import User
+    from services.geohash import encode
+
+    async with AsyncSessionLocal() as db:
+        user_id = (await db.execute(select(func.min(User.id)))).scalar()
+        if user_id is None:
+            raise SystemExit("Create at least one user first (python -m config.createtables)")
+        batch = []
+        for landmark_id, latitude, longitude in generate(points, seed):
+            batch.append({
+                "name": f"Bench point {landmark_id}", "description": "", "location": "", "country": "Benchland",
+                "image_url": "", "user_id": user_id,
+                "latitude": latitude, "longitude": longitude, "geohash": encode(latitude, longitude),
+            })
+            if len(batch) == 10000:
+                await db.execute(insert(Landmark), batch)
+                batch = []
+        if batch:
+            await db.execute(insert(Landmark), batch)
+        await db.commit()
+
+
+async def bench_database(args):
+    from config.database import AsyncSessionLocal, async_engine
+
+    try:
+        if args.seed_database:
+            started = time.perf_counter()
+            await seed_database(args.points, args.seed)
+            print(f"seeded {args.points} points in {time.perf_counter() - started:.1f}s")
+
+        geo = LandmarkGeo(backend="database")
+        latencies = []
+        async with AsyncSessionLocal() as db:
+            for latitude, longitude in queries(args.queries, args.seed):
+                started = time.perf_counter()
+                await geo.nearest(db, latitude, longitude, args.k)
+                latencies.append((time.perf_counter() - started) * 1000)
+        report(f"database k={args.k}", latencies)
+    finally:
+        await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--points", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--database", action="store_true", help="Мерить запросы к базе вместо индекса в памяти")
+    parser.add_argument("--seed-database", action="store_true", help="Перед замером залить точки в базу")
+    args = parser.parse_args()
+
+    if args.database:
+        asyncio.run(bench_database(args))
+    else:
+        bench_memory(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# Смешанная нагрузка: шторм входов (bcrypt) параллельно с чтением.
+# Показывает, насколько вход мешает остальным эндпоинтам.
+#
+#   uvicorn main:app --port 8000
+#   python -m benchmarks.mixed_login --url http://127.0.0.1:8000 --login-clients 50 --read-clients 100
+
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+from benchmarks.concurrency import DEFAULT_PATHS, summarize
+
+
+async def login_client(client, username, password, count, latencies, errors):
+    for _ in range(count):
+        started = time.perf_counter()
+        response = await client.post("/users/signin", json={"username": username, "password": password})
+        latencies.append(time.perf_counter() - started)
+        # 503 - ожидаемый отказ при переполнении очереди хеширования
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def read_client(client, count, latencies, errors):
+    for i in range(count):
+        started = time.perf_counter()
+        response = await client.get(DEFAULT_PATHS[i % len(DEFAULT_PATHS)])
+        latencies.append(time.perf_counter() - started)
+        if response.status_code >= 500:
+            errors.append(response.status_code)
+
+
+async def run(url, login_clients, read_clients, requests_per_client):
+    username = f"bench_{uuid.uuid4().hex[:8]}"
+    password = "bench_password"
+    limits = httpx.Limits(max_connections=login_clients + read_clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        await client.post("/users/signup", json={"username": username, "email": f"{username}@example.com", "password": password})
+
+        login_latencies, login_errors = [], []
+        read_latencies, read_errors = [], []
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(login_client(client, username, password, requests_per_client, login_latencies, login_errors) for _ in range(login_clients)),
+            *(read_client(client, requests_per_client, read_latencies, read_errors) for _ in range(read_clients)),
+        )
+        elapsed = time.perf_counter() - started
+
+    return {
+        "login": summarize(login_latencies, login_errors, elapsed),
+        "read": summarize(read_latencies, read_errors, elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mixed login + read benchmark for the Landmark API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--login-clients", type=int, default=50)
+    parser.add_argument("--read-clients", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=10, help="requests per client")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.login_clients, args.read_clients, args.requests))
+    for kind, summary in result.items():
+        print(kind, " ".join(f"{key}={value}" for key, value in summary.items()))
+
+
+if __name__ == "__main__":
+    main()
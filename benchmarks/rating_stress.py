@@ -0,0 +1,133 @@
+# Стресс-тест записи оценок: много клиентов одновременно ставят, меняют и снимают оценки
+# нескольких "горячих" достопримечательностей, в том числе пачками повторных кликов.
+# После нагрузки хранимые агрегаты сверяются с пересчётом по таблице ratings.
+#
+#   python -m benchmarks.rating_stress --users 50 --landmarks 3 --operations 2000
+#   python -m benchmarks.rating_stress --env      # база из .env (MySQL/PostgreSQL)
+#
+# Код возврата 1 - агрегаты разошлись или были ответы 5xx.
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+
+async def run(args):
+    import httpx
+    from sqlalchemy import select, func
+    from main import app
+    from config.createtables import SYNTHETIC_PASSWORD
+    from config.database import AsyncSessionLocal, async_engine
+    from models.landmarks import Landmark
+    from models.rating import Rating
+    from models.user import User
+    from services.ratingAggregates import HISTOGRAM_COLUMNS
+    from services.ratingWrites import rating_writes
+    from benchmarks.suite import tokens_for
+
+    async with AsyncSessionLocal() as db:
+        landmark_ids = (await db.execute(select(Landmark.id).order_by(Landmark.id.desc()).limit(args.landmarks))).scalars().all()
+        usernames = (await db.execute(
+            select(User.username).where(User.username.like("bench%\\_%", escape="\\")).order_by(User.id.desc()).limit(args.users)
+        )).scalars().all()
+
+    rng = random.Random(args.seed)
+    statuses = {}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://stress", timeout=120) as client:
+            headers = await tokens_for(client, usernames, SYNTHETIC_PASSWORD)
+            own = {}  # (клиент, достопримечательность) -> id оценки
+
+            async def operation(index):
+                user = rng.randrange(len(headers))
+                landmark_id = rng.choice(landmark_ids)
+                key = (user, landmark_id)
+                if key in own and rng.random() < 0.2:
+                    response = await client.delete(f"/ratings/{own[key]}", headers=headers[user])
+                    if response.status_code == 200:
+                        own.pop(key, None)
+                    return [response]
+                # Повторные клики: несколько оценок подряд, не дожидаясь ответов
+                clicks = rng.randint(1, args.burst)
+                responses = await asyncio.gather(*(
+                    client.post("/ratings/", json={"landmark_id": landmark_id, "rating": rng.randint(1, 5)}, headers=headers[user])
+                    for _ in range(clicks)
+                ))
+                for response in responses:
+                    if response.status_code in (200, 201):
+                        own[key] = response.json()["id"]
+                return responses
+
+            semaphore = asyncio.Semaphore(args.concurrency)
+
+            async def limited(index):
+                async with semaphore:
+                    for response in await operation(index):
+                        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(limited(i) for i in range(args.operations)))
+            elapsed = time.perf_counter() - started
+
+    requests = sum(statuses.values())
+    print(f"requests={requests} seconds={elapsed:.2f} rps={requests / elapsed:.1f} statuses={dict(sorted(statuses.items()))}")
+    print(f"coalescer {rating_writes.stats()}")
+
+    ok = not any(status >= 500 for status in statuses)
+    async with AsyncSessionLocal() as db:
+        for landmark_id in landmark_ids:
+            landmark = await db.get(Landmark, landmark_id)
+            rows = (await db.execute(
+                select(Rating.rating, func.count()).where(Rating.landmark_id == landmark_id).group_by(Rating.rating)
+            )).all()
+            histogram = {star: 0 for star in HISTOGRAM_COLUMNS}
+            histogram.update(dict(rows))
+            count = sum(histogram.values())
+            total = sum(star * n for star, n in histogram.items())
+            stored = {star: getattr(landmark, column.key) for star, column in HISTOGRAM_COLUMNS.items()}
+            matches = (
+                landmark.rating_count == count
+                and landmark.rating_sum == total
+                and stored == histogram
+                and abs(landmark.avg_rating - (total / count if count else 0)) < 1e-6
+            )
+            ok = ok and matches
+            print(f"[{'ok' if matches else 'MISMATCH'}] landmark {landmark_id}: stored count={landmark.rating_count} "
+                  f"sum={landmark.rating_sum} histogram={stored}; actual count={count} sum={total} histogram={histogram}")
+    await async_engine.dispose()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent rating writers stress test")
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "landmarks_rating_stress.db"), help="SQLite file")
+    parser.add_argument("--env", action="store_true", help="Use the database from .env instead of SQLite")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--landmarks", type=int, default=3, help="hot landmarks all writers compete for")
+    parser.add_argument("--operations", type=int, default=2000)
+    parser.add_argument("--burst", type=int, default=4, help="max repeated clicks per operation")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not args.env:
+        os.environ["DB_DIALECT"] = "sqlite"
+        os.environ["DB_NAME"] = args.database
+        os.environ.pop("DB_ASYNC_DIALECT", None)
+        os.environ.pop("DB_REPLICA_HOST", None)
+        if os.path.exists(args.database):
+            os.remove(args.database)
+
+    from config.createtables import create_tables, create_synthetic_data
+    create_tables()
+    create_synthetic_data(args.users, args.landmarks, 0, 0, seed=args.seed)
+
+    return 0 if asyncio.run(run(args)) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Задержка подсказок при наборе на индексе в памяти (без HTTP и базы).
+#
+#   python -m benchmarks.search_typeahead --docs 1000000 --queries 2000
+
+import argparse
+import random
+import statistics
+import time
+
+from services.search import InvertedIndex
+
+SYLLABLES = ["ka", "ro", "mi", "sa", "to", "le", "na", "vi", "du", "per", "gor", "ost", "ber", "lin", "mon", "tar"]
+KINDS = ["castle", "bridge", "tower", "cathedral", "museum", "park", "palace", "square", "fortress", "lake"]
+
+
+def word(rng):
+    return "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+
+
+def build(docs, seed):
+    rng = random.Random(seed)
+    cities = [word(rng).capitalize() for _ in range(5000)]
+    index = InvertedIndex()
+    started = time.perf_counter()
+    for landmark_id in range(1, docs + 1):
+        city = rng.choice(cities)
+        name = f"{word(rng).capitalize()} {rng.choice(KINDS)}"
+        description = f"Old {rng.choice(KINDS)} near {city} built by {word(rng).capitalize()}"
+        index.add(landmark_id, name, description, city, "Benchland")
+    return index, time.perf_counter() - started, cities
+
+
+def queries(count, cities, seed):
+    rng = random.Random(seed + 1)
+    result = []
+    for _ in range(count):
+        city = rng.choice(cities).lower()
+        kind = rng.choice(KINDS)
+        # Пользователь набирает 1-6 букв последнего слова
+        typed = rng.randint(1, 6)
+        if rng.random() < 0.5:
+            result.append(city[:typed])
+        else:
+            result.append(f"{kind} {city[:typed]}")
+    return result
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=1000000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    index, build_seconds, cities = build(args.docs, args.seed)
+    print(f"indexed {len(index)} docs, {len(index.terms)} terms in {build_seconds:.1f}s")
+
+    latencies = []
+    for query in queries(args.queries, cities, args.seed):
+        started = time.perf_counter()
+        index.search(query, limit=args.limit, prefix=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    print(
+        f"queries={len(latencies)} "
+        f"p50={statistics.median(latencies):.2f}ms "
+        f"p95={percentile(latencies, 0.95):.2f}ms "
+        f"p99={percentile(latencies, 0.99):.2f}ms "
+        f"max={max(latencies):.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
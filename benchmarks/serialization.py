@@ -0,0 +1,80 @@
+# Скорость сериализации списков на одном ядре (строк в секунду, без HTTP и базы):
+#   fastapi  - ORM-объекты через response_model (serialize_response + JSONResponse), прежний путь;
+#   adapter  - ORM-объекты через TypeAdapter(...).dump_json (кэш ответов);
+#   tuples   - кортежи колонок через orjson (services/serialization.py).
+#
+#   python -m benchmarks.serialization --rows 100 1000 --repeat 200
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from pydantic import TypeAdapter
+
+from models.landmarks import Landmark
+from models.photo import Photo  # нужны для настройки связей моделей
+from models.rating import Rating
+from models.user import User
+from schemas.landmarks import LandmarkBase
+from services.serialization import rows_to_json, schema_columns
+
+FIELDS = schema_columns(Landmark, LandmarkBase)
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append((
+            f"Landmark {i}", "A long enough description " * 4, f"City {i % 100}", "France",
+            f"https://example.com/{i}.jpg", rng.uniform(-60, 70), rng.uniform(-180, 180),
+            i + 1, round(rng.uniform(0, 5), 2), rng.randint(0, 1000),
+        ))
+    return rows
+
+
+def make_objects(rows):
+    return [Landmark(**dict(zip(FIELDS, row))) for row in rows]
+
+
+def bench(label, rows_count, repeat, serialize):
+    serialize()  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        serialize()
+    elapsed = time.perf_counter() - started
+    print(f"{label:8} rows={rows_count:6} {rows_count * repeat / elapsed:12.0f} rows/s  {elapsed / repeat * 1000:8.3f} ms/page")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="List serialization throughput per core")
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    field = create_model_field(name="Response_get_all_landmarks", type_=List[LandmarkBase], mode="serialization")
+    adapter = TypeAdapter(List[LandmarkBase])
+
+    for count in args.rows:
+        rows = make_rows(count, args.seed)
+        objects = make_objects(rows)
+        loop = asyncio.new_event_loop()
+
+        def fastapi_path():
+            content = loop.run_until_complete(serialize_response(field=field, response_content=objects))
+            return JSONResponse(content).body
+
+        bench("fastapi", count, args.repeat, fastapi_path)
+        bench("adapter", count, args.repeat, lambda: adapter.dump_json(adapter.validate_python(objects, from_attributes=True)))
+        bench("tuples", count, args.repeat, lambda: rows_to_json(FIELDS, rows))
+        loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# Модель похожих достопримечательностей (services/similarity.py) на синтетических оценках.
+#   memory   - только расчёт: разреженная матрица и соседи всех достопримечательностей по блокам
+#              (без базы, масштаб 10M оценок на одной машине);
+#   database - полный путь через базу: сборка (чтение ratings, расчёт, запись landmark_similarities)
+#              и инкрементальный пересчёт нескольких достопримечательностей.
+# У пользователей и достопримечательностей есть скрытые категории (оценки выше в любимых категориях),
+# поэтому same_category - доля соседей из той же категории - показывает, что модель что-то находит
+# (случайные соседи дали бы 1 / categories).
+#
+#   python -m benchmarks.similarity --ratings 10000000 --users 500000 --landmarks 50000
+#   python -m benchmarks.similarity --mode database --ratings 1000000
+#   python -m benchmarks.similarity --max-seconds 300    # код возврата 1, если расчёт дольше
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+
+
+def synthetic_ratings(args):
+    import numpy as np
+
+    rng = np.random.default_rng(args.seed)
+    # Популярность достопримечательностей по закону Ципфа, активность пользователей - логнормальная
+    popularity = 1.0 / np.arange(1, args.landmarks + 1) ** args.zipf
+    popularity /= popularity.sum()
+    activity = rng.lognormal(0, 1, args.users)
+    degrees = np.maximum(1, np.round(activity / activity.sum() * args.ratings)).astype(np.int64)
+
+    users = np.repeat(np.arange(args.users, dtype=np.int64), degrees)
+    landmarks = rng.choice(args.landmarks, size=len(users), p=popularity).astype(np.int64)
+
+    # Часть посещений - в любимой категории пользователя
+    landmark_category = rng.integers(0, args.categories, args.landmarks)
+    favourite = rng.integers(0, args.categories, args.users)
+    by_category = [np.flatnonzero(landmark_category == category) for category in range(args.categories)]
+    themed = np.flatnonzero(rng.random(len(users)) < args.themed)
+    for category, members in enumerate(by_category):
+        visits = themed[favourite[users[themed]] == category]
+        weights = popularity[members] / popularity[members].sum()
+        landmarks[visits] = rng.choice(members, size=len(visits), p=weights)
+
+    keys = np.unique(users * args.landmarks + landmarks)
+    users, landmarks = keys // args.landmarks, keys % args.landmarks
+    liked = landmark_category[landmarks] == favourite[users]
+    ratings = np.clip(np.where(liked, 4.5, 2.5) + rng.normal(0, 1, len(users)), 1, 5).round().astype(np.int64)
+    return users, landmarks, ratings, landmark_category
+
+
+def peak_memory_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def same_category(landmark_ids, similar_ids, category) -> float:
+    if not len(landmark_ids):
+        return 0.0
+    return round(float((category[landmark_ids] == category[similar_ids]).mean()), 3)
+
+
+def run_memory(args):
+    import numpy as np
+    from services.similarity import RatingMatrix
+
+    started = time.perf_counter()
+    users, landmarks, ratings, category = synthetic_ratings(args)
+    generated = time.perf_counter()
+    print(f"ratings={len(ratings)} users={args.users} landmarks={args.landmarks} generate_s={generated - started:.1f}", flush=True)
+
+    matrix = RatingMatrix(users, landmarks, ratings)
+    del users, landmarks, ratings
+    norms = matrix.norms()
+    built = time.perf_counter()
+
+    pairs = blocks = 0
+    matching = 0.0
+    for (landmark_ids, similar_ids, scores, commons), _ in matrix.neighbours(np.arange(len(matrix)), norms):
+        blocks += 1
+        pairs += len(landmark_ids)
+        matching += same_category(landmark_ids, similar_ids, category) * len(landmark_ids)
+    finished = time.perf_counter()
+
+    return {
+        "mode": "memory",
+        "ratings": int(matrix.ratings.nnz),
+        "landmarks": len(matrix),
+        "blocks": blocks,
+        "pairs": pairs,
+        "same_category": round(matching / pairs, 3) if pairs else 0.0,
+        "random_category": round(1 / args.categories, 3),
+        "matrix_seconds": round(built - generated, 2),
+        "neighbours_seconds": round(finished - built, 2),
+        "seconds": round(finished - generated, 2),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def run_database(args):
+    import numpy as np
+    from sqlalchemy import insert, select, update
+    from config.createtables import create_tables, create_synthetic_data
+    from config.database import engine
+    from models.landmarks import Landmark
+    from models.rating import Rating
+    from models.similarity import LandmarkSimilarity
+    from models.user import User
+    from services.ratingAggregates import recalculate_statement
+    from services.similarity import similarity_model
+
+    create_tables()
+    create_synthetic_data(args.users, args.landmarks, 0, 0, seed=args.seed)
+    users, landmarks, ratings, category = synthetic_ratings(args)
+    with engine.begin() as connection:
+        user_ids = np.array(connection.execute(select(User.id).order_by(User.id)).scalars().all()[-args.users:])
+        landmark_ids = np.array(connection.execute(select(Landmark.id).order_by(Landmark.id)).scalars().all()[-args.landmarks:])
+        rows = np.stack((user_ids[users], landmark_ids[landmarks], ratings), axis=1).tolist()
+        for start in range(0, len(rows), 50_000):
+            connection.execute(insert(Rating), [
+                {"user_id": user_id, "landmark_id": landmark_id, "rating": rating}
+                for user_id, landmark_id, rating in rows[start:start + 50_000]
+            ])
+        connection.execute(recalculate_statement())
+    print(f"ratings={len(ratings)} users={args.users} landmarks={args.landmarks} (seeded)", flush=True)
+
+    rebuild = similarity_model.rebuild()
+    category_by_id = dict(zip(landmark_ids.tolist(), category.tolist()))
+    with engine.connect() as connection:
+        stored = connection.execute(select(LandmarkSimilarity.landmark_id, LandmarkSimilarity.similar_id)).all()
+    matching = sum(category_by_id[a] == category_by_id[b] for a, b in stored)
+
+    # Пересчёт после новых оценок: достопримечательности из разных частей распределения популярности
+    rng = np.random.default_rng(args.seed + 1)
+    refreshed = sorted(set(landmark_ids[rng.integers(0, args.landmarks, args.refresh)].tolist()))
+    started = time.perf_counter()
+    refresh = similarity_model.refresh(refreshed)
+    with engine.begin() as connection:
+        connection.execute(update(Landmark).values(similarity_dirty=False))
+
+    return {
+        "mode": "database",
+        "rebuild": rebuild,
+        "same_category": round(matching / len(stored), 3) if stored else 0.0,
+        "random_category": round(1 / args.categories, 3),
+        "refresh": refresh,
+        "refresh_ms_per_landmark": round((time.perf_counter() - started) * 1000 / len(refreshed), 1),
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Landmark similarity model: full build and incremental refresh")
+    parser.add_argument("--mode", choices=("memory", "database"), default="memory")
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "landmarks_similarity.db"), help="SQLite file")
+    parser.add_argument("--env", action="store_true", help="Use the database from .env instead of SQLite (data is added)")
+    parser.add_argument("--ratings", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=500_000)
+    parser.add_argument("--landmarks", type=int, default=50_000)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--zipf", type=float, default=0.8, help="popularity skew of landmarks")
+    parser.add_argument("--themed", type=float, default=0.3, help="share of visits in the user's favourite category")
+    parser.add_argument("--refresh", type=int, default=20, help="landmarks to refresh incrementally (database mode)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-seconds", type=float, help="fail if the build takes longer")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if not args.env:
+        os.environ["DB_DIALECT"] = "sqlite"
+        os.environ["DB_NAME"] = args.database
+        os.environ.pop("DB_ASYNC_DIALECT", None)
+        os.environ.pop("DB_REPLICA_HOST", None)
+        if os.path.exists(args.database):
+            os.remove(args.database)
+
+    result = run_memory(args) if args.mode == "memory" else run_database(args)
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+            output.write("\n")
+
+    seconds = result["seconds"] if args.mode == "memory" else result["rebuild"]["seconds"]
+    if args.max_seconds is not None and seconds > args.max_seconds:
+        print(f"FAIL: build took {seconds} s > {args.max_seconds} s")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+# Время старта воркера API: импорт приложения, первый обслуженный запрос (/health/live)
+# и готовность (/health/ready - прогреты пулы и индексы). Каждый воркер - отдельный процесс
+# со свежим интерпретатором; --workers запускает их одновременно на одной базе, как uvicorn --workers.
+#
+#   python -m benchmarks.startup --workers 1 4 32
+#   python -m benchmarks.startup --workers 32 --max-import-ms 1500 --max-ready-ms 5000   # код возврата 1 при превышении
+#   python -m benchmarks.startup --importtime 15   # самые медленные модули при импорте
+#
+# По умолчанию база - SQLite-файл с синтетическими данными (--landmarks); --env - база из .env.
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Один воркер: время от начала импорта, в миллисекундах
+def child():
+    started = time.perf_counter()
+    import main
+    imported = time.perf_counter()
+
+    import httpx
+
+    async def serve():
+        timings = {}
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://startup") as client:
+                response = await client.get("/health/live")
+                timings["first_request"] = time.perf_counter()
+                if response.status_code != 200:
+                    raise SystemExit(f"/health/live returned {response.status_code}")
+                while (await client.get("/health/ready")).status_code != 200:
+                    await asyncio.sleep(0.005)
+                timings["ready"] = time.perf_counter()
+        return timings
+
+    timings = asyncio.run(serve())
+    print(json.dumps({
+        "import_ms": round((imported - started) * 1000, 1),
+        "first_request_ms": round((timings["first_request"] - started) * 1000, 1),
+        "ready_ms": round((timings["ready"] - started) * 1000, 1),
+    }))
+
+
+def run_workers(count, env):
+    started = time.perf_counter()
+    processes = [
+        subprocess.Popen([sys.executable, "-m", "benchmarks.startup", "--child"], cwd=ROOT, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        for _ in range(count)
+    ]
+    results = []
+    for process in processes:
+        output, _ = process.communicate()
+        if process.returncode != 0:
+            raise SystemExit(f"worker exited with {process.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    wall = time.perf_counter() - started
+
+    summary = {"workers": count, "all_ready_ms": round(wall * 1000, 1)}
+    for key in ("import_ms", "first_request_ms", "ready_ms"):
+        values = sorted(result[key] for result in results)
+        summary[key] = {"median": round(statistics.median(values), 1), "max": values[-1]}
+    return summary
+
+
+def slowest_imports(env, top):
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=env,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = line[12:].split("|")
+        if cumulative.strip().isdigit():
+            rows.append((int(cumulative), name.strip()))
+    for cumulative, name in sorted(rows, reverse=True)[:top]:
+        print(f"{cumulative / 1000:9.1f} ms  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API worker startup time: import, first request, readiness")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "landmarks_startup.db"), help="SQLite file")
+    parser.add_argument("--env", action="store_true", help="Use the database from .env instead of SQLite")
+    parser.add_argument("--landmarks", type=int, default=10000, help="synthetic landmarks for the in-memory index warm-up")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--max-import-ms", type=float, help="fail if the median import time is higher")
+    parser.add_argument("--max-ready-ms", type=float, help="fail if the slowest worker is ready later")
+    parser.add_argument("--importtime", type=int, metavar="N", help="print the N slowest imports of main")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    if args.child:
+        child()
+        return 0
+
+    env = dict(os.environ)
+    if not args.env:
+        env.update(DB_DIALECT="sqlite", DB_NAME=args.database)
+        env.pop("DB_ASYNC_DIALECT", None)
+        env.pop("DB_REPLICA_HOST", None)
+        if os.path.exists(args.database):
+            os.remove(args.database)
+        # Данные готовит отдельный процесс: схема создаётся один раз до старта воркеров
+        seed = ("from config.createtables import create_tables, create_synthetic_data; create_tables(); "
+                f"create_synthetic_data(100, {args.landmarks}, 0, 0)")
+        subprocess.run([sys.executable, "-c", seed], cwd=ROOT, env=env, check=True, capture_output=True)
+
+    if args.importtime:
+        slowest_imports(env, args.importtime)
+
+    results = []
+    failed = False
+    for count in args.workers:
+        summary = run_workers(count, env)
+        results.append(summary)
+        print(f"workers={count:3} import_ms={summary['import_ms']} first_request_ms={summary['first_request_ms']} "
+              f"ready_ms={summary['ready_ms']} all_ready_ms={summary['all_ready_ms']}", flush=True)
+        if args.max_import_ms is not None and summary["import_ms"]["median"] > args.max_import_ms:
+            print(f"FAIL: median import {summary['import_ms']['median']} ms > {args.max_import_ms} ms")
+            failed = True
+        if args.max_ready_ms is not None and summary["ready_ms"]["max"] > args.max_ready_ms:
+            print(f"FAIL: slowest ready {summary['ready_ms']['max']} ms > {args.max_ready_ms} ms")
+            failed = True
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"results": results}, output, indent=2)
+            output.write("\n")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,306 @@
+# Воспроизводимый набор нагрузочных сценариев: API в том же процессе (httpx.ASGITransport),
+# синтетические данные в отдельной базе, результат - JSON для сравнения между коммитами.
+#
+#   python -m benchmarks.suite --users 10000 --landmarks 10000 --photos 20000 --ratings 50000 -o bench.json
+#   python -m benchmarks.suite --reuse -o after.json --compare bench.json
+#
+# По умолчанию база - SQLite-файл (--database, пересоздаётся, если не задан --reuse).
+# С --env используется база из .env: данные добавляются к существующим.
+#
+# Сценарии (--workloads): browse - чтение по всем роутерам, login - шторм входов (bcrypt),
+# rating_burst - пакеты оценок от многих пользователей, bulk_import - NDJSON-импорт достопримечательностей.
+# Для каждого: число запросов, ошибки (5xx и неожиданные 4xx), rps, p50/p95/p99 и число SQL-запросов.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+WORKLOADS = ("browse", "login", "rating_burst", "bulk_import")
+WARMUP_PATHS = ("/landmarks/", "/landmarks/landmarks/search?q=tower", "/landmarks/landmarks/nearby?lat=0&lon=0")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+# Сводка сценария: задержки в секундах, statements - SQL-запросы за сценарий
+def summarize(latencies, errors, elapsed, statements, rows=None):
+    latencies = sorted(latencies)
+    total = len(latencies)
+    summary = {"requests": total, "errors": errors, "seconds": round(elapsed, 3), "queries": statements}
+    if total:
+        summary.update({
+            "rps": round(total / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2),
+            "queries_per_request": round(statements / total, 2),
+        })
+    if rows is not None:
+        summary["rows_per_second"] = round(rows / elapsed, 1)
+    return summary
+
+
+class Recorder:
+    def __init__(self, expected=(200,)):
+        self.expected = expected
+        self.latencies = []
+        self.errors = 0
+
+    async def request(self, client, method, path, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, path, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        if response.status_code not in self.expected:
+            self.errors += 1
+        return response
+
+
+async def run_clients(clients, body):
+    await asyncio.gather(*(body(index) for index in range(clients)))
+
+
+async def browse(client, ctx, recorder):
+    rng = random.Random(ctx["seed"])
+    landmark_ids, user_ids = ctx["landmark_ids"], ctx["user_ids"]
+    words = ["tower", "castle", "grand", "temple", "royal", "gard", "mus"]
+
+    def paths():
+        landmark_id = rng.choice(landmark_ids)
+        return [
+            f"/landmarks/?page={rng.randint(1, 20)}",
+            f"/landmarks/landmarks/{landmark_id}",
+            f"/landmarks/landmarks/{landmark_id}/detail?include=photos,owner,rating_summary",
+            f"/landmarks/landmarks/country/{rng.choice(['France', 'Italy', 'Japan'])}",
+            f"/landmarks/landmarks/search?q={rng.choice(words)}",
+            f"/landmarks/landmarks/nearby?lat={rng.uniform(-60, 70):.4f}&lon={rng.uniform(-180, 180):.4f}",
+            f"/photos/landmark/{landmark_id}",
+            f"/ratings/landmark/{landmark_id}/summary",
+            f"/users/{rng.choice(user_ids)}",
+        ]
+
+    total = ctx["requests"] * ctx["clients"]
+    plan = [path for _ in range(total // 9 + 1) for path in paths()][:total]
+
+    async def body(index):
+        for path in plan[index::ctx["clients"]]:
+            await recorder.request(client, "GET", path)
+
+    await run_clients(ctx["clients"], body)
+
+
+async def login(client, ctx, recorder):
+    usernames = ctx["usernames"]
+
+    async def body(index):
+        for i in range(ctx["requests"]):
+            username = usernames[(index * ctx["requests"] + i) % len(usernames)]
+            await recorder.request(client, "POST", "/users/signin", json={"username": username, "password": ctx["password"]})
+
+    await run_clients(ctx["clients"], body)
+
+
+# Каждый клиент - отдельный пользователь; пакеты по batch оценок, повтор оценки (409 в ответе) не ошибка
+async def rating_burst(client, ctx, recorder):
+    rng = random.Random(ctx["seed"] + 1)
+    landmark_ids = ctx["landmark_ids"]
+
+    async def body(index):
+        headers = ctx["headers"][index % len(ctx["headers"])]
+        for _ in range(ctx["requests"]):
+            items = [{"landmark_id": landmark_id, "rating": rng.randint(1, 5)}
+                     for landmark_id in rng.sample(landmark_ids, min(ctx["batch"], len(landmark_ids)))]
+            await recorder.request(client, "POST", "/ratings/bulk", json=items, headers=headers)
+
+    await run_clients(ctx["clients"], body)
+    return ctx["clients"] * ctx["requests"] * ctx["batch"]
+
+
+async def bulk_import(client, ctx, recorder):
+    rng = random.Random(ctx["seed"] + 2)
+
+    def ndjson(count):
+        return "".join(json.dumps({
+            "name": f"Imported {rng.randint(0, 10 ** 9)}", "description": "Synthetic import",
+            "location": "Bench city", "country": "Benchland", "image_url": "https://example.com/i.jpg",
+            "latitude": rng.uniform(-60, 70), "longitude": rng.uniform(-180, 180),
+        }) + "\n" for _ in range(count))
+
+    async def body(index):
+        headers = {**ctx["headers"][index % len(ctx["headers"])], "Content-Type": "application/x-ndjson"}
+        for _ in range(ctx["requests"]):
+            await recorder.request(client, "POST", "/landmarks/landmarks/bulk", content=ndjson(ctx["import_rows"]), headers=headers)
+
+    await run_clients(ctx["clients"], body)
+    return ctx["clients"] * ctx["requests"] * ctx["import_rows"]
+
+
+WORKLOAD_FUNCTIONS = {
+    "browse": browse,
+    "login": login,
+    "rating_burst": rating_burst,
+    "bulk_import": bulk_import,
+}
+
+
+async def tokens_for(client, usernames, password):
+    headers = []
+    for username in usernames:
+        response = await client.post("/users/signin", json={"username": username, "password": password})
+        headers.append({"Authorization": f"Bearer {response.json()['access_token']}"})
+    return headers
+
+
+async def run_suite(args):
+    import httpx
+    from sqlalchemy import select
+    from main import app
+    from config.createtables import SYNTHETIC_PASSWORD
+    from config.database import AsyncSessionLocal, async_engine, read_async_engine
+    from models.landmarks import Landmark
+    from models.user import User
+    from services.queryCounter import count_queries
+
+    async with AsyncSessionLocal() as db:
+        landmark_ids = (await db.execute(select(Landmark.id).order_by(Landmark.id).limit(args.sample))).scalars().all()
+        users = (await db.execute(
+            select(User.id, User.username).where(User.username.like("bench%\\_%", escape="\\")).order_by(User.id).limit(args.sample)
+        )).all()
+    if not landmark_ids or not users:
+        raise SystemExit("No synthetic data: run without --reuse first")
+
+    ctx = {
+        "seed": args.seed,
+        "clients": args.clients,
+        "requests": args.requests,
+        "batch": args.rating_batch,
+        "import_rows": args.import_rows,
+        "password": SYNTHETIC_PASSWORD,
+        "landmark_ids": landmark_ids,
+        "user_ids": [user_id for user_id, _ in users],
+        "usernames": [username for _, username in users],
+    }
+    results = {}
+    engines = {async_engine.sync_engine, read_async_engine.sync_engine}
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=120) as client:
+            ctx["headers"] = await tokens_for(client, ctx["usernames"][:args.clients], SYNTHETIC_PASSWORD)
+            # Прогрев при старте (пулы, индексы в памяти) и первые запросы - не в замере
+            while (await client.get("/health/ready")).status_code != 200:
+                await asyncio.sleep(0.01)
+            for path in WARMUP_PATHS:
+                await client.get(path)
+            for name in args.workloads:
+                recorder = Recorder()
+                counters = [count_queries(engine) for engine in engines]
+                for counter in counters:
+                    counter.__enter__()
+                started = time.perf_counter()
+                try:
+                    rows = await WORKLOAD_FUNCTIONS[name](client, ctx, recorder)
+                finally:
+                    elapsed = time.perf_counter() - started
+                    for counter in counters:
+                        counter.__exit__(None, None, None)
+                results[name] = summarize(recorder.latencies, recorder.errors, elapsed,
+                                          sum(counter.count for counter in counters), rows)
+                print(name, " ".join(f"{key}={value}" for key, value in results[name].items()), flush=True)
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Изменение ключевых показателей относительно прошлого прогона
+def compare(base, current):
+    for name, summary in current["workloads"].items():
+        previous = base.get("workloads", {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in ("rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"):
+            if previous.get(key) and key in summary:
+                changes.append(f"{key} {previous[key]} -> {summary[key]} ({(summary[key] / previous[key] - 1) * 100:+.1f}%)")
+        print(f"{name}: " + ", ".join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducible benchmark suite for the Landmark API")
+    parser.add_argument("--database", default=os.path.join(tempfile.gettempdir(), "landmarks_bench.db"), help="SQLite file")
+    parser.add_argument("--env", action="store_true", help="Use the database from .env instead of SQLite")
+    parser.add_argument("--reuse", action="store_true", help="Do not recreate and seed the database")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--landmarks", type=int, default=10000)
+    parser.add_argument("--photos", type=int, default=20000)
+    parser.add_argument("--ratings", type=int, default=50000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workloads", nargs="+", choices=WORKLOADS, default=list(WORKLOADS))
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=25, help="requests per client")
+    parser.add_argument("--rating-batch", type=int, default=20, help="ratings per /ratings/bulk request")
+    parser.add_argument("--import-rows", type=int, default=500, help="landmarks per /landmarks/bulk request")
+    parser.add_argument("--sample", type=int, default=5000, help="ids the workloads pick from")
+    parser.add_argument("-o", "--output", default="bench.json")
+    parser.add_argument("--compare", help="Previous result to compare with")
+    args = parser.parse_args()
+
+    # Настройки базы читаются при импорте config.database, поэтому задаются до импорта приложения
+    if not args.env:
+        os.environ["DB_DIALECT"] = "sqlite"
+        os.environ["DB_NAME"] = args.database
+        os.environ.pop("DB_ASYNC_DIALECT", None)
+        os.environ.pop("DB_REPLICA_HOST", None)
+        if not args.reuse and os.path.exists(args.database):
+            os.remove(args.database)
+
+    dataset = None
+    if not args.reuse:
+        from config.createtables import create_tables, create_synthetic_data
+        create_tables()
+        started = time.perf_counter()
+        dataset = create_synthetic_data(args.users, args.landmarks, args.photos, args.ratings, seed=args.seed)
+        dataset["seconds"] = round(time.perf_counter() - started, 2)
+        print("seeded", " ".join(f"{key}={value}" for key, value in dataset.items()), flush=True)
+
+    results = asyncio.run(run_suite(args))
+
+    from config.database import async_engine
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "database": async_engine.dialect.name,
+            "dataset": dataset,
+            "clients": args.clients,
+            "requests_per_client": args.requests,
+            "seed": args.seed,
+        },
+        "workloads": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2, sort_keys=True)
+        output.write("\n")
+    print(f"written {args.output}")
+
+    if args.compare:
+        with open(args.compare) as previous:
+            compare(json.load(previous), report)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+# Рейтинг популярности в памяти (services/trending.py) без базы: поток событий (оценки и фото
+# по закону Ципфа, время идёт вперёд) и запросы первых N - общий список и по странам.
+# Для сравнения - выбор первых N полным проходом по всем счётам (heapq.nlargest), как без индекса.
+#
+#   python -m benchmarks.trending --landmarks 1000000 --events 500000 --queries 2000
+#   python -m benchmarks.trending --max-top-us 200   # код возврата 1, если p95 первых N медленнее
+
+import argparse
+import heapq
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+
+
+def percentiles(samples_us):
+    samples_us = sorted(samples_us)
+    return {
+        "p50_us": round(statistics.median(samples_us), 1),
+        "p95_us": round(samples_us[int(len(samples_us) * 0.95) - 1], 1),
+        "max_us": round(samples_us[-1], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory trending leaderboard: event updates and top-N queries")
+    parser.add_argument("--landmarks", type=int, default=1_000_000)
+    parser.add_argument("--countries", type=int, default=200)
+    parser.add_argument("--events", type=int, default=500_000)
+    parser.add_argument("--hours", type=float, default=240, help="time span of the event stream")
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--zipf", type=float, default=1.0, help="popularity skew of landmarks")
+    parser.add_argument("--scan-queries", type=int, default=20, help="full-scan top-N queries for comparison")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-top-us", type=float, help="fail if the p95 top-N latency is higher")
+    parser.add_argument("-o", "--output", help="write the results as JSON")
+    args = parser.parse_args()
+
+    # Модуль импортирует config.database: без .env - SQLite (база не открывается)
+    os.environ.setdefault("DB_DIALECT", "sqlite")
+    os.environ.setdefault("DB_NAME", ":memory:")
+    from services.trending import TrendingBoard, rating_weight, TRENDING_PHOTO_WEIGHT, TRENDING_HALF_LIFE_HOURS
+
+    rng = random.Random(args.seed)
+    countries = [f"country-{index}" for index in range(args.countries)]
+    board = TrendingBoard()
+    board.ready = True
+
+    # Стартовый рейтинг: у каждой достопримечательности небольшой счёт
+    started = time.perf_counter()
+    for landmark_id in range(1, args.landmarks + 1):
+        board.ranking.put(landmark_id, rng.random(), f"landmark {landmark_id}", None, countries[landmark_id % args.countries])
+    loaded = time.perf_counter()
+
+    # Поток событий: популярные получают больше, время растёт равномерно
+    weights = [1.0 / rank ** args.zipf for rank in range(1, args.landmarks + 1)]
+    targets = rng.choices(range(1, args.landmarks + 1), weights=weights, k=args.events)
+    start_time = datetime(2026, 6, 1)
+    step = timedelta(hours=args.hours) / max(1, args.events)
+    updates_started = time.perf_counter()
+    for index, landmark_id in enumerate(targets):
+        weight = TRENDING_PHOTO_WEIGHT if rng.random() < 0.2 else rating_weight(rng.randint(1, 5))
+        board.record(landmark_id, weight, at=start_time + step * index)
+    updates_finished = time.perf_counter()
+    now = start_time + step * args.events
+
+    top_overall, top_country = [], []
+    for _ in range(args.queries):
+        began = time.perf_counter()
+        board.top(None, args.limit, now)
+        top_overall.append((time.perf_counter() - began) * 1e6)
+        country = rng.choice(countries)
+        began = time.perf_counter()
+        board.top(country, args.limit, now)
+        top_country.append((time.perf_counter() - began) * 1e6)
+
+    scans = []
+    for _ in range(args.scan_queries):
+        began = time.perf_counter()
+        heapq.nlargest(args.limit, board.ranking.entries.items(), key=lambda item: item[1][0])
+        scans.append((time.perf_counter() - began) * 1e6)
+
+    # Проверка: индекс отдаёт то же, что полный проход
+    expected = [landmark_id for landmark_id, _ in heapq.nlargest(args.limit, board.ranking.entries.items(), key=lambda item: (item[1][0], -item[0]))]
+    actual = [hit["id"] for hit in board.top(None, args.limit, now)]
+
+    result = {
+        "landmarks": args.landmarks,
+        "countries": args.countries,
+        "events": args.events,
+        "half_life_hours": TRENDING_HALF_LIFE_HOURS,
+        "load_seconds": round(loaded - started, 2),
+        "updates_per_second": round(args.events / (updates_finished - updates_started)),
+        "top_overall": percentiles(top_overall),
+        "top_country": percentiles(top_country),
+        "full_scan": percentiles(scans),
+        "matches_full_scan": expected == actual,
+    }
+    print(json.dumps(result, indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2)
+            output.write("\n")
+
+    if not result["matches_full_scan"]:
+        print("FAIL: top-N differs from the full scan")
+        return 1
+    worst = max(result["top_overall"]["p95_us"], result["top_country"]["p95_us"])
+    if args.max_top_us is not None and worst > args.max_top_us:
+        print(f"FAIL: top-N p95 {worst} us > {args.max_top_us} us")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
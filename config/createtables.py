@@ -1,3 +1,8 @@
+import os
+import random
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import insert, select, func
 from sqlalchemy.orm import Session
 from config.database import engine, SessionLocal
 from models.user import User
@@ -6,19 +11,34 @@ from models.photo import Photo
 from models.rating import Rating
 from config.database import Base  # Если Base определен в другом файле
 from sqlalchemy.exc import IntegrityError
-from passlib.context import CryptContext
+from services.passwords import password_context
+from services.ratingAggregates import recalculate_statement
+from services.geohash import encode
 
-# Создание таблиц
+# Путь к alembic.ini в корне проекта
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'alembic.ini')
+
+def alembic_config() -> Config:
+    config = Config(ALEMBIC_INI)
+    config.set_main_option('script_location', os.path.join(os.path.dirname(ALEMBIC_INI), 'migrations'))
+    return config
+
+# Создание/обновление таблиц через миграции Alembic (вместо Base.metadata.create_all)
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    command.upgrade(alembic_config(), 'head')
+
+# Пересчёт хранимых агрегатов оценок по таблице ratings
+# (нужен один раз для уже существующих данных, дальше они обновляются инкрементально)
+def recalculate_rating_aggregates():
+    with engine.begin() as connection:
+        connection.execute(recalculate_statement())
 
 # Функция для добавления начальных данных
 def create_initial_data():
     db = SessionLocal()
     try:
         # Хеширование паролей
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        hashed_password = pwd_context.hash("user1_123")
+        hashed_password = password_context().hash("user1_123")
 
         # Создание пользователей
         user1 = User(username="user1", email="user1@example.com", password=hashed_password)
@@ -39,6 +59,8 @@ def create_initial_data():
             description="The design of the Eiffel Tower is attributed to Maurice Koechlin and Émile Nouguier, two senior engineers working for the Compagnie des Établissements Eiffel. It was envisaged after discussion about a suitable centerpiece for the proposed 1889 Exposition Universelle, a world's fair to celebrate the centennial of the French Revolution.",
             location="Paris",
             country="France",
+            latitude=48.8584,
+            longitude=2.2945,
             image_url="https://upload.wikimedia.org/wikipedia/commons/thumb/8/85/Tour_Eiffel_Wikimedia_Commons_%28cropped%29.jpg/250px-Tour_Eiffel_Wikimedia_Commons_%28cropped%29.jpg",
             user_id=user1.id  # Связь с пользователем
         )
@@ -76,6 +98,92 @@ def create_initial_data():
     finally:
         db.close()
 
+# Синтетические данные для нагрузочных тестов (benchmarks/suite.py): многострочные INSERT пачками,
+# один хеш пароля на всех (пароль SYNTHETIC_PASSWORD), агрегаты оценок - одним пересчётом в конце.
+# Оценки уникальны по (landmark_id, user_id), поэтому ratings не больше landmarks * users.
+SYNTHETIC_PASSWORD = "bench_password"
+SYNTHETIC_COUNTRIES = ["France", "Italy", "Spain", "Germany", "Japan", "Peru", "Egypt", "India", "Canada", "Brazil"]
+SYNTHETIC_WORDS = ["tower", "castle", "bridge", "temple", "museum", "palace", "cathedral", "garden", "fortress", "harbor",
+                   "ancient", "royal", "grand", "old", "national", "sacred", "golden", "stone", "river", "mountain"]
+
+
+def _insert_batches(connection, table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            connection.execute(insert(table), batch)
+            batch = []
+    if batch:
+        connection.execute(insert(table), batch)
+
+
+# Новые id таблицы (больше before) по порядку вставки
+def _new_ids(connection, model, before):
+    return connection.execute(select(model.id).where(model.id > before).order_by(model.id)).scalars().all()
+
+
+def create_synthetic_data(users: int, landmarks: int, photos: int, ratings: int, seed: int = 42, batch_size: int = 10000) -> dict:
+    if landmarks and not users:
+        raise ValueError("Landmarks need at least one user")
+    ratings = min(ratings, landmarks * users)
+    rng = random.Random(seed)
+    password = password_context().hash(SYNTHETIC_PASSWORD)
+
+    with engine.begin() as connection:
+        max_user = connection.execute(select(func.coalesce(func.max(User.id), 0))).scalar()
+        max_landmark = connection.execute(select(func.coalesce(func.max(Landmark.id), 0))).scalar()
+        prefix = f"bench{max_user}"
+
+        _insert_batches(connection, User, (
+            {"username": f"{prefix}_{i}", "email": f"{prefix}_{i}@example.com", "password": password}
+            for i in range(users)
+        ), batch_size)
+        user_ids = _new_ids(connection, User, max_user)
+
+        def landmark_row(i):
+            latitude, longitude = rng.uniform(-60, 70), rng.uniform(-180, 180)
+            words = rng.sample(SYNTHETIC_WORDS, 3)
+            return {
+                "name": f"{words[0].title()} {words[1]} {i}",
+                "description": f"A {words[0]} {words[1]} near the {words[2]}",
+                "location": f"City {i % 1000}",
+                "country": SYNTHETIC_COUNTRIES[i % len(SYNTHETIC_COUNTRIES)],
+                "image_url": f"https://example.com/landmarks/{i}.jpg",
+                "user_id": user_ids[i % len(user_ids)],
+                "latitude": latitude,
+                "longitude": longitude,
+                "geohash": encode(latitude, longitude),
+            }
+
+        _insert_batches(connection, Landmark, (landmark_row(i) for i in range(landmarks)), batch_size)
+        landmark_ids = _new_ids(connection, Landmark, max_landmark)
+
+        _insert_batches(connection, Photo, (
+            {
+                "image_url": f"https://example.com/photos/{i}.jpg",
+                "user_id": rng.choice(user_ids),
+                "landmark_id": rng.choice(landmark_ids),
+            }
+            for i in range(photos if landmark_ids else 0)
+        ), batch_size)
+
+        # k-я оценка: достопримечательность k % L, пользователь со сдвигом - пары не повторяются
+        _insert_batches(connection, Rating, (
+            {
+                "rating": rng.randint(1, 5),
+                "landmark_id": landmark_ids[k % len(landmark_ids)],
+                "user_id": user_ids[(k // len(landmark_ids) + (k % len(landmark_ids)) * 7) % len(user_ids)],
+            }
+            for k in range(ratings)
+        ), batch_size)
+
+        connection.execute(recalculate_statement())
+
+    return {"users": users, "landmarks": landmarks, "photos": photos if landmark_ids else 0, "ratings": ratings,
+            "user_prefix": prefix, "first_landmark_id": landmark_ids[0] if landmark_ids else None}
+
+
 if __name__ == "__main__":
     create_tables()  # Создание таблиц
     create_initial_data()  # Добавление начальных данных
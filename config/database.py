@@ -1,7 +1,12 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base  # Используйте новый импорт
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+from sqlalchemy.orm import Session, sessionmaker, declarative_base  # Используйте новый импорт
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from dotenv import load_dotenv
+from typing import Callable, List
 import os
+import time
 
 # Загрузка переменных окружения
 load_dotenv()
@@ -13,15 +18,129 @@ DB_PASS = os.getenv('DB_PASS')
 DB_NAME = os.getenv('DB_NAME')
 DB_DIALECT = os.getenv('DB_DIALECT')
 
+# Реплика для чтения; если DB_REPLICA_HOST не задан, чтение идёт с основной базы
+DB_REPLICA_HOST = os.getenv('DB_REPLICA_HOST')
+DB_REPLICA_USER = os.getenv('DB_REPLICA_USER', DB_USER)
+DB_REPLICA_PASS = os.getenv('DB_REPLICA_PASS', DB_PASS)
+DB_REPLICA_NAME = os.getenv('DB_REPLICA_NAME', DB_NAME)
+
+# Пул соединений (на каждый engine и каждый процесс).
+# recycle меньше wait_timeout сервера, pre_ping проверяет соединение перед выдачей:
+# без них после простоя приходит "MySQL server has gone away".
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', '1') == '1'
+
+# Асинхронные драйверы для каждого диалекта
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
 # Формируем строку подключения
-DATABASE_URL = f"{DB_DIALECT}://{DB_USER}:{DB_PASS}@{DB_HOST}/{DB_NAME}"
+def build_database_url(dialect: str, host=None, user=None, password=None, name=None) -> str:
+    name = name or DB_NAME
+    if dialect.startswith('sqlite'):
+        return f"{dialect}:///{name}"
+    return f"{dialect}://{user or DB_USER}:{password or DB_PASS}@{host or DB_HOST}/{name}"
+
+
+ASYNC_DIALECT = os.getenv('DB_ASYNC_DIALECT') or ASYNC_DRIVERS.get(DB_DIALECT.split('+')[0], DB_DIALECT)
+
+DATABASE_URL = build_database_url(DB_DIALECT)
+ASYNC_DATABASE_URL = build_database_url(ASYNC_DIALECT)
+ASYNC_REPLICA_URL = (
+    build_database_url(ASYNC_DIALECT, DB_REPLICA_HOST, DB_REPLICA_USER, DB_REPLICA_PASS, DB_REPLICA_NAME)
+    if DB_REPLICA_HOST else None
+)
+
+
+# Наблюдатели выдачи соединений: observer(pool, seconds, outcome), outcome - "ok", "timeout" или "error".
+# Счётчики по ним ведёт services/poolMetrics.py
+pool_checkout_observers: List[Callable] = []
+
+
+# Класс пула с замером времени получения соединения. Новый класс на каждый engine:
+# при dispose() SQLAlchemy пересоздаёт пул тем же классом, и счётчики по классу сохраняются.
+def _timed_pool_class(base):
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                connection = super()._do_get()
+                outcome = "ok"
+                return connection
+            except PoolTimeoutError:
+                outcome = "timeout"
+                raise
+            finally:
+                for observer in pool_checkout_observers:
+                    observer(self, time.perf_counter() - started, outcome)
+
+    return TimedPool
+
+
+def _pool_options(is_async: bool) -> dict:
+    return {
+        'poolclass': _timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool),
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+
+
+# Создаем engine (синхронный, для скриптов вроде config/createtables.py)
+engine = create_engine(DATABASE_URL, **_pool_options(False))  # Удалено `check_same_thread=False`, так как это не нужно для MySQL
 
-# Создаем engine
-engine = create_engine(DATABASE_URL)  # Удалено `check_same_thread=False`, так как это не нужно для MySQL
+# Создаем асинхронный engine для обработчиков запросов
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(True))
+
+# Engine для чтения: реплика или тот же основной
+read_async_engine = (
+    create_async_engine(ASYNC_REPLICA_URL, **_pool_options(True))
+    if ASYNC_REPLICA_URL else async_engine
+)
+
+# SQLite проверяет внешние ключи и выполняет ON DELETE CASCADE только с PRAGMA foreign_keys=ON
+# на каждом соединении. Включается для engine обработчиков, но не для синхронного engine миграций:
+# batch-миграции SQLite пересоздают таблицы, и DROP TABLE родителя удалил бы дочерние строки каскадом.
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA foreign_keys=ON')
+    cursor.close()
+
+
+for _engine in {id(e): e for e in (async_engine, read_async_engine)}.values():
+    if _engine.dialect.name == 'sqlite':
+        event.listen(_engine.sync_engine, 'connect', _sqlite_foreign_keys)
+
+# Закрывает соединения пулов асинхронных engine (при остановке приложения)
+async def dispose_engines():
+    await async_engine.dispose()
+    if read_async_engine is not async_engine:
+        await read_async_engine.dispose()
 
 # Создаем sessionmaker
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
+# Сессия основной базы: помечает, что в ней была запись (для чтения своих записей).
+# write_commits - число commit с изменениями в этом процессе (по нему сбрасываются общие чтения)
+class PrimarySession(Session):
+    write_commits = 0
+
+
+# expire_on_commit=False: после commit объекты остаются доступны без ленивой подгрузки
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False, sync_session_class=PrimarySession)
+ReadSessionLocal = async_sessionmaker(bind=read_async_engine, autoflush=False, expire_on_commit=False)
+
 # Создаем Base
 Base = declarative_base()  # Это необходимо для определения моделей
 
@@ -32,3 +151,22 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Признак записи в транзакции сессии основной базы (session.info['wrote'], снимается при commit);
+# по нему же services/readRouting.py направляет следующие чтения клиента на основную базу
+@event.listens_for(PrimarySession, 'after_flush')
+def _flushed(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(PrimarySession, 'do_orm_execute')
+def _executed(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(PrimarySession, 'after_commit')
+def _committed(session):
+    if session.info.pop('wrote', False):
+        PrimarySession.write_commits += 1
@@ -0,0 +1,30 @@
+# Выгрузка каталога для аналитики без запуска сервера.
+# Пример: python -m config.export landmarks --format csv --gzip -o landmarks.csv.gz
+# С SOFT_DELETE=1 мягко удалённое не выгружается: условия добавлены в сами запросы (services/export.py),
+# критерии ORM на соединении engine не действуют.
+import argparse
+import sys
+from config.database import engine
+from models.user import User  # нужен для настройки связей моделей
+from services.export import EXPORTS, FORMATS, iter_export
+
+
+def export(table: str, fmt: str, output, gzip: bool = False):
+    with engine.connect() as connection:
+        for chunk in iter_export(connection, table, fmt, gzip=gzip):
+            output.write(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stream a table to NDJSON or CSV")
+    parser.add_argument("table", choices=list(EXPORTS))
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("-o", "--output", help="Файл для записи (по умолчанию stdout)")
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "wb") as output:
+            export(args.table, args.format, output, gzip=args.gzip)
+    else:
+        export(args.table, args.format, sys.stdout.buffer, gzip=args.gzip)
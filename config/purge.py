@@ -0,0 +1,21 @@
+# Очистка мягко удалённых пользователей и достопримечательностей (services/deletion.py) до конца,
+# без ограничения PURGE_JOB_SECONDS: перед выключением SOFT_DELETE или после долгого простоя воркера.
+# Пачки и паузы те же, что у фоновой задачи, так что запуск на работающем сервисе безопасен.
+# Запуск: python -m config.purge
+import argparse
+import asyncio
+import json
+from config.database import async_engine
+from services.deletion import purge_deleted
+
+
+async def main() -> dict:
+    try:
+        return await purge_deleted(seconds=float("inf"))
+    finally:
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Purge soft-deleted users and landmarks with their rows in batches").parse_args()
+    print(json.dumps(asyncio.run(main())))
@@ -0,0 +1,31 @@
+# Проверка схемы базы перед запуском воркеров API: версия в alembic_version должна совпадать
+# с последней миграцией. Выполняется один раз на развёртывание, сами воркеры схему не проверяют
+# и DDL не выполняют.
+# Запуск: python -m config.schemacheck            (код возврата 1, если база отстаёт)
+#         python -m config.schemacheck --upgrade  (сначала применить миграции)
+import argparse
+import sys
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from config.database import engine
+from config.createtables import alembic_config, create_tables
+
+
+def check_schema() -> bool:
+    heads = set(ScriptDirectory.from_config(alembic_config()).get_heads())
+    with engine.connect() as connection:
+        current = set(MigrationContext.configure(connection).get_current_heads())
+    if current == heads:
+        print(f"schema is up to date: {', '.join(sorted(heads))}")
+        return True
+    print(f"schema is at {', '.join(sorted(current)) or 'nothing'}, expected {', '.join(sorted(heads))}: run alembic upgrade head")
+    return False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that the database schema is at the latest migration")
+    parser.add_argument("--upgrade", action="store_true", help="apply pending migrations first")
+    args = parser.parse_args()
+    if args.upgrade:
+        create_tables()
+    sys.exit(0 if check_schema() else 1)
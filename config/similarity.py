@@ -0,0 +1,22 @@
+# Модель похожих достопримечательностей (services/similarity.py) вне API:
+# полная сборка после миграции 0008 и периодически (например, раз в сутки из cron), чтобы
+# вернуть точный top-K после инкрементальных пересчётов; пересчёт отдельных достопримечательностей.
+# Запуск: python -m config.similarity              (полная сборка)
+#         python -m config.similarity --refresh 1 2 3
+import argparse
+import json
+import logging
+from models.user import User  # нужны для настройки связей моделей
+from models.photo import Photo
+from services.similarity import similarity_model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the landmark similarity model from the ratings table")
+    parser.add_argument("--refresh", type=int, nargs="+", metavar="LANDMARK_ID", help="recompute only these landmarks")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.refresh:
+        print(json.dumps(similarity_model.refresh(args.refresh)))
+    else:
+        print(json.dumps(similarity_model.rebuild()))
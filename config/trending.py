@@ -0,0 +1,14 @@
+# Полный пересчёт популярности (services/trending.py) по created_at оценок и фото вне API:
+# после смены TRENDING_EPOCH, TRENDING_HALF_LIFE_HOURS или весов. У записей, созданных до миграции 0009,
+# created_at - время миграции: пересчёт засчитает их как события этого момента (стартовый рейтинг,
+# который затухает как обычно).
+# Запуск: python -m config.trending
+import argparse
+import json
+from models.user import User  # нужны для настройки связей моделей
+from services.trending import rebuild_scores
+
+
+if __name__ == "__main__":
+    argparse.ArgumentParser(description="Recompute trending scores from rating and photo timestamps").parse_args()
+    print(json.dumps(rebuild_scores()))
@@ -0,0 +1,30 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from typing import Literal
+from config.database import ReadSessionLocal
+from middleware.authJWT import get_current_user
+from services.export import MEDIA_TYPES, aiter_export
+
+# Выгрузка отдаёт таблицы целиком (в том числе user_id оценок) - только по токену
+router = APIRouter(dependencies=[Depends(get_current_user)])
+
+
+# Потоковая выгрузка таблицы в NDJSON или CSV с постоянным расходом памяти.
+# landmarks выгружаются вместе с агрегатами оценок и числом фото.
+# gzip=true - файл .gz (application/gzip), а не Content-Encoding: клиент сохраняет его сжатым.
+@router.get("/{table}")
+async def export_table(
+    table: Literal["landmarks", "photos", "ratings"],
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+):
+    extension = "csv" if format == "csv" else "ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="{table}.{extension}{".gz" if gzip else ""}"'}
+
+    # Сессия открывается внутри генератора: зависимость get_read_db закрылась бы до конца потока.
+    # Полный проход по таблице идёт с реплики, если она настроена
+    return StreamingResponse(
+        aiter_export(ReadSessionLocal, table, format, gzip=gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[format],
+        headers=headers,
+    )
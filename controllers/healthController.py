@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Response
+from services.readiness import readiness
+
+router = APIRouter()
+
+
+# Процесс запущен и отвечает (liveness): не зависит от базы
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+
+# Процесс готов к трафику (readiness): 503, пока не закончен прогрев пулов и индексов
+@router.get("/ready")
+async def ready(response: Response):
+    if not readiness.ready:
+        response.status_code = 503
+    return readiness.stats()
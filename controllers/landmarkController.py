@@ -1,100 +1,340 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import List
-from config.database import get_db
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Literal
+from services.readRouting import get_async_db, get_read_db
 from models.landmarks import Landmark
-from schemas.landmarks import LandmarkBase, LandmarkCreate
+from schemas.landmarks import LandmarkBase, LandmarkCreate, LandmarkUpdateItem, LandmarkSearchHit, LandmarkNearby, GeoCluster, LandmarkDetail, SimilarLandmark, TrendingLandmark
+from schemas.bulk import BulkResponse
 from middleware.authJWT import get_current_user  # Импортируем зависимость для токена
-from models.user import User
+from schemas.user import CurrentUser
+from services.pagination import PageParams, paginate
+from services.responseCache import response_cache
+from services.bulk import bulk_openapi, chunk_size_param, run_bulk, owned_ids, insert_rows, update_rows
+from services.search import landmark_search
+from services.geo import BBoxParams, landmark_geo
+from services.geohash import encode_optional, cluster_precision
+from services.embeds import IncludeParams, landmark_load_options, landmark_detail_statement, landmark_with_embeds
+from services.similarity import similar_landmarks, SIMILARITY_TOP_K
+from services.trending import trending_board
+from services.deletion import delete_landmarks
+from services.jobs import job_worker
+from generateCRUDControllers import landmark_crud
 
 
 router = APIRouter()
 
+# Поля, доступные для проекции через ?fields=
+LANDMARK_FIELDS = list(LandmarkBase.model_fields)
+
 # Получение всех достопримечательностей для пользователя
 @router.get("/landmarks/user/{user_id}", response_model=List[LandmarkBase], tags=["Landmarks"])
-async def find_landmarks_by_user(user_id: int, db: Session = Depends(get_db)):
-    landmarks = db.query(Landmark).filter(Landmark.user_id == user_id).all()
-    if not landmarks:
-        raise HTTPException(status_code=404, detail="No landmarks found for this user")
-    return landmarks
+async def find_landmarks_by_user(user_id: int, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    return await paginate(
+        db, Landmark, page, response,
+        where=[Landmark.user_id == user_id],
+        allowed_fields=LANDMARK_FIELDS,
+        schema=LandmarkBase,
+        not_found="No landmarks found for this user",
+    )
+
+
+# Полнотекстовый поиск по названию, описанию и месту.
+# prefix=true - последнее слово считается началом слова (подсказки при наборе).
+# Объявлен до /landmarks/{landmark_id}, иначе "search" попадёт в landmark_id.
+@router.get("/landmarks/search", response_model=List[LandmarkSearchHit], tags=["Landmarks"])
+async def search_landmarks(
+    q: str = Query(..., min_length=1, max_length=200),
+    prefix: bool = True,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await landmark_search.search(db, q, limit=limit, prefix=prefix)
+
+
+# k ближайших достопримечательностей к точке (по желанию - не дальше radius_km)
+@router.get("/landmarks/nearby", response_model=List[LandmarkNearby], tags=["Landmarks"])
+async def find_landmarks_nearby(
+    lat: float = Query(..., ge=-90, le=90),
+    lon: float = Query(..., ge=-180, le=180),
+    k: int = Query(10, ge=1, le=100),
+    radius_km: Optional[float] = Query(None, gt=0),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await landmark_geo.nearest(db, lat, lon, k, max_km=radius_km)
+
+
+# Достопримечательности в окне карты
+@router.get("/landmarks/bbox", response_model=List[LandmarkNearby], tags=["Landmarks"])
+async def find_landmarks_in_bbox(
+    area: BBoxParams = Depends(),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await landmark_geo.within(db, area.bbox, limit)
+
+
+# Кластеры для окна карты на уровне масштаба zoom: чем меньше zoom, тем крупнее ячейки
+@router.get("/landmarks/clusters", response_model=List[GeoCluster], tags=["Landmarks"])
+async def cluster_landmarks(
+    area: BBoxParams = Depends(),
+    zoom: int = Query(..., ge=0, le=22),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await landmark_geo.clusters(db, area.bbox, cluster_precision(zoom))
+
+
+# Популярные сейчас: по оценкам и фото с затуханием (вес события вдвое меньше каждые
+# TRENDING_HALF_LIFE_HOURS), общий список или внутри страны. Из рейтинга в памяти процесса
+@router.get("/landmarks/trending", response_model=List[TrendingLandmark], tags=["Landmarks"])
+async def get_trending_landmarks(
+    country: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    return await trending_board.trending(db, country, limit)
+
+
+# Страница достопримечательностей вместе с фото, сводкой оценок и владельцем (?include=...).
+# Число SQL-запросов постоянно и не зависит от limit: см. landmark_load_options.
+@router.get("/landmarks/detail", response_model=List[LandmarkDetail], response_model_exclude_unset=True, tags=["Landmarks"])
+async def get_landmarks_detail(
+    response: Response,
+    country: Optional[str] = None,
+    embeds: IncludeParams = Depends(),
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    if page.fields and embeds.include:
+        raise HTTPException(status_code=400, detail="fields and include cannot be combined")
+    where = [Landmark.country == country] if country is not None else []
+    rows = await paginate(
+        db, Landmark, page, response,
+        where=where,
+        allowed_fields=LANDMARK_FIELDS,
+        options=landmark_load_options(embeds.include),
+    )
+    if page.fields:
+        return rows
+    return [landmark_with_embeds(landmark, embeds.include) for landmark in rows]
 
 
 @router.get("/landmarks/{landmark_id}", response_model=LandmarkBase, tags=["Landmarks"])
-async def get_landmark_by_id(landmark_id: int, db: Session = Depends(get_db)):
-    # Ищем достопримечательность по ID
-    db_landmark = db.query(Landmark).filter(Landmark.id == landmark_id).first()
+async def get_landmark_by_id(landmark_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    async def load(response: Response):
+        # Ищем достопримечательность по ID
+        return await landmark_crud.find_one(db, landmark_id)
+
+    return await response_cache.respond(request, "landmarks", LandmarkBase, load)
+
+
+# Одна достопримечательность с вложенными данными по ?include=photos,rating_summary,owner
+@router.get("/landmarks/{landmark_id}/detail", response_model=LandmarkDetail, response_model_exclude_unset=True, tags=["Landmarks"])
+async def get_landmark_detail(landmark_id: int, embeds: IncludeParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    db_landmark = (await db.execute(landmark_detail_statement(landmark_id, embeds.include))).unique().scalar_one_or_none()
 
     if not db_landmark:
         raise HTTPException(status_code=404, detail="Landmark not found")
-    
-    return db_landmark
+
+    return landmark_with_embeds(db_landmark, embeds.include)
+
+
+# Похожие достопримечательности: готовые соседи из landmark_similarities (services/similarity.py)
+@router.get("/landmarks/{landmark_id}/similar", response_model=List[SimilarLandmark], tags=["Landmarks"])
+async def get_similar_landmarks(
+    landmark_id: int,
+    request: Request,
+    limit: int = Query(10, ge=1, le=SIMILARITY_TOP_K),
+    db: AsyncSession = Depends(get_read_db),
+):
+    async def load(response: Response):
+        await landmark_crud.find_one(db, landmark_id)
+        return await similar_landmarks(db, landmark_id, limit)
+
+    return await response_cache.respond(request, "landmarks", List[SimilarLandmark], load)
 
 
 # Получение всех достопримечательностей для страны
 @router.get("/landmarks/country/{country}", response_model=List[LandmarkBase], tags=["Landmarks"])
-async def find_landmarks_by_country(country: str, db: Session = Depends(get_db)):
-    landmarks = db.query(Landmark).filter(Landmark.country == country).all()
-    if not landmarks:
-        raise HTTPException(status_code=404, detail="No landmarks found in this country")
-    return landmarks
+async def find_landmarks_by_country(country: str, request: Request, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    async def load(response: Response):
+        return await paginate(
+            db, Landmark, page, response,
+            where=[Landmark.country == country],
+            allowed_fields=LANDMARK_FIELDS,
+            schema=LandmarkBase,
+            not_found="No landmarks found in this country",
+        )
+
+    return await response_cache.respond(request, "landmarks", List[LandmarkBase], load)
 
+# Условия и ключ сортировки списка (tests/test_query_plans.py проверяет план того же запроса)
+def landmark_list_filters(country: Optional[str], rating: Optional[float], sort: str):
+    where = []
+    if country is not None:
+        where.append(Landmark.country == country)
+    if rating is not None:
+        where.append(Landmark.avg_rating >= rating)
+
+    # Ключ сортировки заканчивается id, чтобы курсор был однозначным; "-" - по убыванию
+    if sort == "rating":
+        order_by = [(Landmark.avg_rating, False), (Landmark.id, False)]
+    elif sort == "-rating":
+        order_by = [(Landmark.avg_rating, True), (Landmark.id, True)]
+    else:
+        order_by = [(Landmark.id, False)]
+    return where, order_by
+
+
+# Список достопримечательностей с фильтрацией по стране/рейтингу и сортировкой.
+# Использует хранимые агрегаты и индекс (country, avg_rating), таблицу ratings не читает.
 @router.get("/", response_model=List[LandmarkBase])
-async def get_all_landmarks(db: Session = Depends(get_db)):
-    landmarks = db.query(Landmark).all()
-    return landmarks
+async def get_all_landmarks(
+    request: Request,
+    country: Optional[str] = None,
+    rating: Optional[float] = Query(None, ge=0, le=5, description="Минимальная средняя оценка"),
+    sort: Literal["id", "rating", "-rating"] = "id",
+    page: PageParams = Depends(),
+    db: AsyncSession = Depends(get_read_db)
+):
+    where, order_by = landmark_list_filters(country, rating, sort)
+
+    async def load(response: Response):
+        return await paginate(db, Landmark, page, response, where=where, order_by=order_by, allowed_fields=LANDMARK_FIELDS, schema=LandmarkBase)
+
+    return await response_cache.respond(request, "landmarks", List[LandmarkBase], load)
 
 @router.post("/landmarks", response_model=LandmarkCreate, tags=["Landmarks"])
-async def create_landmark(landmark: LandmarkCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_landmark(landmark: LandmarkCreate, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
     try:
         
-        # Создаем новый объект Landmark с данными из тела запроса
-        new_landmark = Landmark(
-        name=landmark.name,
-        description=landmark.description,
-        location=landmark.location,
-        country=landmark.country,
-        image_url=landmark.image_url,
-        user_id=current_user.id  # Безопасно: взято из токена
+        # Создаем и сохраняем новую достопримечательность с данными из тела запроса
+        new_landmark = await landmark_crud.create(
+            db,
+            name=landmark.name,
+            description=landmark.description,
+            location=landmark.location,
+            country=landmark.country,
+            image_url=landmark.image_url,
+            latitude=landmark.latitude,
+            longitude=landmark.longitude,
+            user_id=current_user.id  # Безопасно: взято из токена
         )
- 
-        # Добавляем новую достопримечательность в базу данных
-        db.add(new_landmark)
-        db.commit()  # Сохраняем изменения в базе данных
-        db.refresh(new_landmark)  # Обновляем объект с новыми данными
+        await response_cache.invalidate("landmarks")
+        landmark_search.add(new_landmark)
+        landmark_geo.add(new_landmark)
 
         return new_landmark
     except Exception as e:
-        db.rollback()  # В случае ошибки откатываем изменения
+        await db.rollback()  # В случае ошибки откатываем изменения
         raise HTTPException(status_code=500, detail=str(e))
     
 
+# Пакетное создание: JSON-массив или NDJSON, многострочный INSERT пачками в одной транзакции
+@router.post("/landmarks/bulk", response_model=BulkResponse, tags=["Landmarks"], openapi_extra=bulk_openapi(LandmarkCreate))
+async def bulk_create_landmarks(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    created = []
+
+    async def handle_chunk(chunk, result):
+        rows = [
+            {**landmark.model_dump(), "user_id": current_user.id, "geohash": encode_optional(landmark.latitude, landmark.longitude)}
+            for _, landmark in chunk
+        ]
+        ids = await insert_rows(db, Landmark, rows)
+        created.extend(LandmarkUpdateItem(id=landmark_id, **row) for landmark_id, row in zip(ids, rows))
+        result.ids.extend(ids)
+        result.processed += len(rows)
+
+    result = await run_bulk(request, db, LandmarkCreate, chunk_size, handle_chunk)
+    await response_cache.invalidate("landmarks")
+    landmark_search.add_many(created)
+    landmark_geo.add_many(created)
+    return result.as_dict()
+
+
+# Пакетное обновление своих достопримечательностей (проверка владельца одним запросом на пачку)
+@router.put("/landmarks/bulk", response_model=BulkResponse, tags=["Landmarks"], openapi_extra=bulk_openapi(LandmarkUpdateItem))
+async def bulk_update_landmarks(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    updated = []
+
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Landmark, chunk, lambda item: item.id, current_user.id, result)
+        items = [landmark for _, landmark in chunk if landmark.id in allowed]
+        await update_rows(db, Landmark, [
+            {**landmark.model_dump(), "geohash": encode_optional(landmark.latitude, landmark.longitude)}
+            for landmark in items
+        ])
+        updated.extend(items)
+        result.processed += len(items)
+
+    result = await run_bulk(request, db, LandmarkUpdateItem, chunk_size, handle_chunk)
+    await response_cache.invalidate("landmarks")
+    landmark_search.add_many(updated)
+    landmark_geo.add_many(updated)
+    trending_board.add_many(updated)
+    return result.as_dict()
+
+
+# Пакетное удаление своих достопримечательностей вместе с их фото и оценками (services/deletion.py)
+@router.delete("/landmarks/bulk", response_model=BulkResponse, tags=["Landmarks"], openapi_extra=bulk_openapi(int))
+async def bulk_delete_landmarks(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    deleted = []
+
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Landmark, chunk, lambda landmark_id: landmark_id, current_user.id, result)
+        deleted.extend(allowed)
+        await delete_landmarks(db, allowed)
+        result.processed += len(allowed)
+
+    result = await run_bulk(request, db, int, chunk_size, handle_chunk)
+    job_worker.notify()
+    await response_cache.invalidate("landmarks", "photos")
+    landmark_search.remove_many(deleted)
+    landmark_geo.remove_many(deleted)
+    trending_board.remove_many(deleted)
+    return result.as_dict()
+
+
 @router.put("/landmarks/{landmark_id}", response_model=LandmarkBase, tags=["Landmarks"])
 async def update_landmark(
     landmark_id: int,
     landmark: LandmarkCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Ищем достопримечательность по ID
-    db_landmark = db.query(Landmark).filter(Landmark.id == landmark_id).first()
-
-    if not db_landmark:
-        raise HTTPException(status_code=404, detail="Landmark not found")
-    
-    # Проверяем, принадлежит ли достопримечательность текущему пользователю
-    if db_landmark.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You are not authorized to edit this landmark")
-
-    # Обновляем поля достопримечательности
-    db_landmark.name = landmark.name
-    db_landmark.description = landmark.description
-    db_landmark.location = landmark.location
-    db_landmark.country = landmark.country
-    db_landmark.image_url = landmark.image_url
+    # Ищем достопримечательность по ID и проверяем, принадлежит ли она текущему пользователю
+    db_landmark = await landmark_crud.find_owned(db, landmark_id, current_user.id, "You are not authorized to edit this landmark")
 
-    # Сохраняем изменения в базе
-    db.commit()
-    db.refresh(db_landmark)
+    # Обновляем поля достопримечательности и сохраняем изменения в базе
+    await landmark_crud.update(
+        db,
+        db_landmark,
+        name=landmark.name,
+        description=landmark.description,
+        location=landmark.location,
+        country=landmark.country,
+        image_url=landmark.image_url,
+        latitude=landmark.latitude,
+        longitude=landmark.longitude,
+    )
+    await response_cache.invalidate("landmarks")
+    landmark_search.add(db_landmark)
+    landmark_geo.add(db_landmark)
+    trending_board.add(db_landmark)
 
     return db_landmark
 
@@ -102,21 +342,20 @@ async def update_landmark(
 @router.delete("/landmarks/{landmark_id}", tags=["Landmarks"])
 async def delete_landmark(
     landmark_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Ищем достопримечательность по ID
-    db_landmark = db.query(Landmark).filter(Landmark.id == landmark_id).first()
-
-    if not db_landmark:
-        raise HTTPException(status_code=404, detail="Landmark not found")
-
-    # Проверяем, принадлежит ли она текущему пользователю
-    if db_landmark.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You are not authorized to delete this landmark")
+    # Ищем достопримечательность по ID и проверяем, принадлежит ли она текущему пользователю
+    db_landmark = await landmark_crud.find_owned(db, landmark_id, current_user.id, "You are not authorized to delete this landmark")
 
-    # Удаляем достопримечательность
-    db.delete(db_landmark)
-    db.commit()
+    # Удаляем достопримечательность: фото, оценки и места в списках похожих удаляет база
+    # каскадом, при SOFT_DELETE=1 - фоновая очистка (до неё всё это уже скрыто)
+    await delete_landmarks(db, [db_landmark.id])
+    await db.commit()
+    job_worker.notify()
+    await response_cache.invalidate("landmarks", "photos")
+    landmark_search.remove(landmark_id)
+    landmark_geo.remove(landmark_id)
+    trending_board.remove(landmark_id)
 
     return {"message": "Landmark successfully deleted"}
\ No newline at end of file
@@ -0,0 +1,26 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from services.poolMetrics import pool_stats
+from services.metrics import registry, CounterFunction, GaugeFunction
+from services.jobs import job_worker
+
+router = APIRouter()
+
+
+def _pool_gauge(field: str):
+    def collect() -> dict:
+        return {(name,): stats[field] for name, stats in pool_stats().items() if name != "read_routing"}
+    return collect
+
+
+registry.register(GaugeFunction("db_pool_checked_out", "Connections checked out of the pool", ("pool",), _pool_gauge("checked_out")))
+registry.register(GaugeFunction("db_pool_peak_checked_out", "Peak connections checked out", ("pool",), _pool_gauge("peak_checked_out")))
+registry.register(CounterFunction("db_pool_checkouts_total", "Connections handed out since start", ("pool",), _pool_gauge("checkouts")))
+registry.register(CounterFunction("db_pool_timeouts_total", "Pool checkout timeouts since start", ("pool",), _pool_gauge("timeouts")))
+registry.register(GaugeFunction("jobs_running", "Background jobs running in this process", (), lambda: {(): job_worker.stats()["running"]}))
+
+
+# Метрики процесса в текстовом формате Prometheus
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
@@ -1,13 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Path, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from models.photo import Photo
-from config.database import get_db
+from models.landmarks import Landmark
+from services.readRouting import get_async_db, get_read_db
 from pydantic import BaseModel
 from typing import List
-from schemas.photo import PhotoBase, PhotoCreate
+from schemas.photo import PhotoBase, PhotoCreate, PhotoUpdateItem, PhotoUploaded
+from schemas.bulk import BulkResponse
 from middleware.authJWT import get_current_user
-from models.user import User
+from schemas.user import CurrentUser
+from services.pagination import PageParams, paginate
+from services.responseCache import response_cache
+from services.bulk import bulk_openapi, chunk_size_param, run_bulk, owned_ids, existing_ids, insert_rows, update_rows
+from services.blobStore import blob_store, IMMUTABLE_CACHE_CONTROL, S3_PRESIGN_TTL
+from services.uploads import receive_image, CONTENT_TYPES
+from services.thumbnails import thumbnails, THUMBNAIL_SIZES
+from services.jobs import enqueue, job_worker
+from services.trending import trending_board
+from generateCRUDControllers import landmark_crud, photo_crud
 
 router = APIRouter()
 
@@ -21,25 +34,38 @@ class PhotoBase(BaseModel):
         "from_attributes": True
     }
 
+# Поля, доступные для проекции через ?fields=
+PHOTO_FIELDS = list(PhotoBase.model_fields)
 
-# Генерация CRUD операций
-def generate_crud_operations(model):
-    return {
-        'create': lambda db, data: db.add(model(**data)) or db.commit(),
-        'get_all': lambda db: db.query(model).all(),
-        'get_one': lambda db, id: db.query(model).filter(model.id == id).first(),
-        'update': lambda db, id, data: db.query(model).filter(model.id == id).update(data) or db.commit(),
-        'delete': lambda db, id: db.query(model).filter(model.id == id).delete() or db.commit(),
+# Ключ файла в хранилище: sha256 и расширение (исключает выход за пределы каталога)
+BLOB_KEY_PATTERN = r"^[0-9a-f]{64}\.[a-z]{3,4}$"
+
+UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["landmark_id", "file"],
+                    "properties": {
+                        "landmark_id": {"type": "integer"},
+                        "file": {"type": "string", "format": "binary"},
+                    },
+                }
+            }
+        },
     }
+}
 
-photo_crud = generate_crud_operations(Photo)
 
 # Получение всех фотографий пользователя
 @router.get("/user/{user_id}", response_model=List[PhotoBase])
-async def get_photos_by_user(user_id: int, db: Session = Depends(get_db)):
+async def get_photos_by_user(user_id: int, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        photos = db.query(Photo).filter(Photo.user_id == user_id).all()
-        return photos
+        return await paginate(db, Photo, page, response, where=[Photo.user_id == user_id], allowed_fields=PHOTO_FIELDS, schema=PhotoBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -47,100 +73,252 @@ async def get_photos_by_user(user_id: int, db: Session = Depends(get_db)):
 
 # Получение всех фотографий для достопримечательности
 @router.get("/landmark/{landmark_id}", response_model=List[PhotoBase])
-async def get_photos_by_landmark(landmark_id: int, db: Session = Depends(get_db)):
+async def get_photos_by_landmark(landmark_id: int, request: Request, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
+    async def load(response: Response):
+        return await paginate(db, Photo, page, response, where=[Photo.landmark_id == landmark_id], allowed_fields=PHOTO_FIELDS, schema=PhotoBase)
+
     try:
-        photos = db.query(Photo).filter(Photo.landmark_id == landmark_id).all()
-        return photos
+        return await response_cache.respond(request, "photos", List[PhotoBase], load)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
     
 @router.get("/", response_model=List[PhotoBase])
-async def get_all_photos(db: Session = Depends(get_db)):
+async def get_all_photos(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        photos = db.query(Photo).all()
-        return photos
+        return await paginate(db, Photo, page, response, allowed_fields=PHOTO_FIELDS, schema=PhotoBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.get("/{photo_id}", response_model=PhotoBase)
-async def get_photo_by_id(photo_id: int, db: Session = Depends(get_db)):
+async def get_photo_by_id(photo_id: int, db: AsyncSession = Depends(get_read_db)):
     try:
-        photo = db.query(Photo).filter(Photo.id == photo_id).first()
-        if not photo:
-            raise HTTPException(status_code=404, detail="Photo not found")
-        return photo
+        return await photo_crud.find_one(db, photo_id)
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.post("/photos", response_model=PhotoCreate, tags=["Photos"])
-async def create_photo(photo: PhotoCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def create_photo(photo: PhotoCreate, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    # Отсутствующая или удалённая достопримечательность - 404, а не ошибка внешнего ключа
+    await landmark_crud.find_one(db, photo.landmark_id)
     try:
-        new_photo = Photo(
-            image_url = photo.image_url,
-            landmark_id = photo.landmark_id,
+        new_photo = await photo_crud.create(
+            db,
+            image_url=photo.image_url,
+            landmark_id=photo.landmark_id,
             user_id=current_user.id
         )
-
-        db.add(new_photo)
-        db.commit()
-        db.refresh(new_photo)
+        trending_board.record_photos([new_photo.landmark_id])
+        await response_cache.invalidate("photos")
 
         return new_photo
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
     
+# Ссылки на оригинал и миниатюры загруженной фотографии
+def uploaded_photo(request: Request, photo: Photo) -> dict:
+    return {
+        "id": photo.id,
+        "user_id": photo.user_id,
+        "landmark_id": photo.landmark_id,
+        "image_url": photo.image_url,
+        "content_type": photo.content_type,
+        "size_bytes": photo.size_bytes,
+        "thumbnails": {
+            size: request.app.url_path_for("get_photo_thumbnail", key=photo.blob_key, size=size)
+            for size in THUMBNAIL_SIZES
+        },
+    }
+
+
+# Загрузка файла фотографии (multipart/form-data: landmark_id и file).
+# Файл пишется в хранилище по мере получения, одинаковые файлы хранятся один раз,
+# миниатюры строит фоновая задача.
+@router.post("/photos/upload", response_model=PhotoUploaded, tags=["Photos"], openapi_extra=UPLOAD_OPENAPI)
+async def upload_photo(request: Request, db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    fields, upload = await receive_image(request, blob_store)
+    if upload is None:
+        raise HTTPException(status_code=400, detail="File is required")
+    try:
+        landmark_id = int(fields.get("landmark_id", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="landmark_id must be an integer")
+
+    # Если достопримечательности нет, файл остаётся в хранилище без ссылок - как и после удаления фото
+    await landmark_crud.find_one(db, landmark_id)
+
+    new_photo = Photo(
+        image_url=request.app.url_path_for("get_photo_file", key=upload.key),
+        landmark_id=landmark_id,
+        user_id=current_user.id,
+        blob_key=upload.key,
+        content_type=upload.content_type,
+        size_bytes=upload.size,
+    )
+    db.add(new_photo)
+    enqueue(db, "photo_thumbnails", {"key": upload.key})
+    await db.commit()
+    await db.refresh(new_photo)
+    job_worker.notify()
+    trending_board.record_photos([new_photo.landmark_id])
+    await response_cache.invalidate("photos")
+
+    return uploaded_photo(request, new_photo)
+
+
+# Отдача файла из хранилища. Содержимое по ключу не меняется, поэтому ETag - сам ключ,
+# а кэшировать можно навсегда. С диска файл отдаёт FileResponse: поддерживает Range
+# и http.response.pathsend (sendfile), если сервер его предлагает. Для S3 - редирект на подписанную ссылку.
+async def blob_response(request: Request, key: str, media_type: str) -> Response:
+    etag = f'"{key}"'
+    headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL, "ETag": etag}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    path = blob_store.local_path(key)
+    if path is not None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    if await blob_store.head_object(key) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    # Подписанная ссылка истекает, поэтому сам редирект кэшируется ненадолго
+    return RedirectResponse(
+        blob_store.presigned_url(key), status_code=307,
+        headers={"Cache-Control": f"private, max-age={S3_PRESIGN_TTL // 2}"},
+    )
+
+
+@router.get("/files/{key}", tags=["Photos"])
+async def get_photo_file(request: Request, key: str = Path(..., pattern=BLOB_KEY_PATTERN)):
+    media_type = CONTENT_TYPES.get(key.rsplit(".", 1)[1])
+    if media_type is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return await blob_response(request, key, media_type)
+
+
+# Миниатюра JPEG; если фоновая задача ещё не успела, строится по запросу
+@router.get("/files/{key}/thumbnail/{size}", tags=["Photos"])
+async def get_photo_thumbnail(request: Request, size: int, key: str = Path(..., pattern=BLOB_KEY_PATTERN)):
+    if size not in THUMBNAIL_SIZES:
+        raise HTTPException(status_code=404, detail=f"Thumbnail sizes: {', '.join(map(str, THUMBNAIL_SIZES))}")
+    if await blob_store.head_object(key) is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    try:
+        thumbnail = await thumbnails.ensure(key, size)
+    except Exception:
+        raise HTTPException(status_code=422, detail="Image cannot be decoded")
+    return await blob_response(request, thumbnail, "image/jpeg")
+
+
+# Пакетное добавление фотографий: JSON-массив или NDJSON
+@router.post("/photos/bulk", response_model=BulkResponse, tags=["Photos"], openapi_extra=bulk_openapi(PhotoCreate))
+async def bulk_create_photos(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    created = []
+
+    async def handle_chunk(chunk, result):
+        landmarks = await existing_ids(db, Landmark, [photo.landmark_id for _, photo in chunk])
+        rows = []
+        for index, photo in chunk:
+            if photo.landmark_id not in landmarks:
+                result.fail(index, 404, f"Landmark {photo.landmark_id} not found")
+                continue
+            rows.append({**photo.model_dump(), "user_id": current_user.id})
+        result.ids.extend(await insert_rows(db, Photo, rows))
+        created.extend(row["landmark_id"] for row in rows)
+        result.processed += len(rows)
+
+    result = await run_bulk(request, db, PhotoCreate, chunk_size, handle_chunk)
+    trending_board.record_photos(created)
+    await response_cache.invalidate("photos")
+    return result.as_dict()
+
+
+# Пакетное обновление своих фотографий
+@router.put("/photos/bulk", response_model=BulkResponse, tags=["Photos"], openapi_extra=bulk_openapi(PhotoUpdateItem))
+async def bulk_update_photos(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Photo, chunk, lambda item: item.id, current_user.id, result)
+        landmarks = await existing_ids(db, Landmark, [photo.landmark_id for _, photo in chunk])
+        rows = []
+        for index, photo in chunk:
+            if photo.id not in allowed:
+                continue
+            if photo.landmark_id not in landmarks:
+                result.fail(index, 404, f"Landmark {photo.landmark_id} not found")
+                continue
+            rows.append(photo.model_dump())
+        await update_rows(db, Photo, rows)
+        result.processed += len(rows)
+
+    result = await run_bulk(request, db, PhotoUpdateItem, chunk_size, handle_chunk)
+    await response_cache.invalidate("photos")
+    return result.as_dict()
+
+
+# Пакетное удаление своих фотографий
+@router.delete("/photos/bulk", response_model=BulkResponse, tags=["Photos"], openapi_extra=bulk_openapi(int))
+async def bulk_delete_photos(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Photo, chunk, lambda photo_id: photo_id, current_user.id, result)
+        if allowed:
+            await db.execute(delete(Photo).where(Photo.id.in_(allowed)))
+        result.processed += len(allowed)
+
+    result = await run_bulk(request, db, int, chunk_size, handle_chunk)
+    await response_cache.invalidate("photos")
+    return result.as_dict()
+
 @router.put("/photos/{photo_id}", response_model=PhotoBase, tags=["Photos"])
 async def update_photo(
     photo_id: int,
     photo: PhotoCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Ищем достопримечательность по ID
-    db_photo = db.query(Photo).filter(Photo.id == photo_id).first()
+    # Ищем фотографию по ID и проверяем, принадлежит ли она текущему пользователю
+    db_photo = await photo_crud.find_owned(db, photo_id, current_user.id, "You are not authorized to edit this landmark")
 
-    if not db_photo:
-        raise HTTPException(status_code=404, detail="photo not found")
-    
-    # Проверяем, принадлежит ли достопримечательность текущему пользователю
-    if db_photo.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You are not authorized to edit this landmark")
-
-    # Обновляем поля достопримечательности
-    db_photo.image_url = photo.image_url,
-    db_photo.landmark_id = photo.landmark_id
-
-    # Сохраняем изменения в базе
-    db.commit()
-    db.refresh(db_photo)
+    # Обновляем поля фотографии и сохраняем изменения в базе
+    await photo_crud.update(db, db_photo, image_url=photo.image_url, landmark_id=photo.landmark_id)
+    await response_cache.invalidate("photos")
 
     return db_photo
     
 @router.delete("/photos/{photo_id}", tags=["Photos"])
 async def delete_photo(
     photo_id: int,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    # Ищем фотографию по ID
-    db_photo = db.query(Photo).filter(Photo.id == photo_id).first()
-
-    if not db_photo:
-        raise HTTPException(status_code=404, detail="Photo not found")
-
-    # Проверяем, принадлежит ли фотография текущему пользователю
-    if db_photo.user_id != current_user.id:
-        raise HTTPException(status_code=403, detail="You are not authorized to delete this photo")
+    # Ищем фотографию по ID и проверяем, принадлежит ли она текущему пользователю
+    db_photo = await photo_crud.find_owned(db, photo_id, current_user.id, "You are not authorized to delete this photo")
 
     # Удаляем запись из базы данных
-    db.delete(db_photo)
-    db.commit()
+    await photo_crud.delete(db, db_photo)
+    await response_cache.invalidate("photos")
 
     return {"message": "Photo successfully deleted"}
\ No newline at end of file
@@ -0,0 +1,40 @@
+import hmac
+import os
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from services.profiling import profiler, slow_queries, PROFILE_MAX_SECONDS, SLOW_QUERY_MS
+
+# Общий секрет для /profiling/*: заголовок X-Profiling-Token. Пока не задан, эндпоинты закрыты -
+# стеки и журнал SQL раскрывают внутренности сервиса и данные запросов.
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+
+
+# Зависимость роутера: сравнение за постоянное время, без токена - 403
+def require_profiling_token(x_profiling_token: Optional[str] = Header(None)) -> None:
+    if not PROFILING_TOKEN or x_profiling_token is None or not hmac.compare_digest(x_profiling_token, PROFILING_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling token required")
+
+
+router = APIRouter(dependencies=[Depends(require_profiling_token)])
+
+
+# Collapsed stacks процесса, обработавшего запрос, за seconds секунд текущей нагрузки
+# (flamegraph.pl profile.collapsed > profile.svg или https://www.speedscope.app)
+@router.get("/flamegraph", response_class=PlainTextResponse)
+async def capture_flamegraph(
+    seconds: float = Query(10, gt=0, le=PROFILE_MAX_SECONDS),
+    interval_ms: float = Query(5, ge=1, le=1000),
+):
+    collapsed = await profiler.capture(seconds, interval_ms / 1000)
+    if collapsed is None:
+        raise HTTPException(status_code=409, detail="Profiler is already running")
+    filename = f"profile-{os.getpid()}-{int(time.time())}.collapsed"
+    return PlainTextResponse(collapsed, headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# Последние медленные SQL этого процесса с планом (параметры - при SLOW_QUERY_PARAMETERS=1)
+@router.get("/slow-queries")
+async def get_slow_queries():
+    return {"threshold_ms": SLOW_QUERY_MS, "queries": list(reversed(slow_queries))}
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Request, Response
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from models.rating import Rating
-from config.database import get_db
+from models.landmarks import Landmark
+from schemas.rating import RatingSummary, RatingCreate, RatingUpdateItem, RatingWritten
+from schemas.bulk import BulkResponse
+from schemas.user import CurrentUser
+from middleware.authJWT import get_current_user
+from services.ratingAggregates import rating_summary
+from services.jobs import enqueue, job_worker, PRIORITY_HIGH
+from services.pagination import PageParams, paginate
+from services.responseCache import response_cache
+from services.bulk import bulk_openapi, chunk_size_param, run_bulk, owned_ids, existing_ids, insert_new_rows, update_rows
+from services.readRouting import get_async_db, get_read_db, read_routing
+from services.ratingWrites import set_rating, LandmarkNotFound
+from services.similarity import schedule_refresh
+from services.trending import trending_board
+from generateCRUDControllers import landmark_crud, rating_crud
 from pydantic import BaseModel
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -13,30 +29,24 @@ class RatingBase(BaseModel):
     rating: int
     user_id: int
     landmark_id: int
+    created_at: Optional[datetime] = None  # UTC
+    updated_at: Optional[datetime] = None  # UTC
 
     model_config = {
         "from_attributes": True
     }
 
+# Поля, доступные для проекции через ?fields=
+RATING_FIELDS = list(RatingBase.model_fields)
 
-# Генерация CRUD операций
-def generate_crud_operations(model):
-    return {
-        'create': lambda db, data: db.add(model(**data)) or db.commit(),
-        'get_all': lambda db: db.query(model).all(),
-        'get_one': lambda db, id: db.query(model).filter(model.id == id).first(),
-        'update': lambda db, id, data: db.query(model).filter(model.id == id).update(data) or db.commit(),
-        'delete': lambda db, id: db.query(model).filter(model.id == id).delete() or db.commit(),
-    }
-
-rating_crud = generate_crud_operations(Rating)
 
 # Получение всех рейтингов пользователя
 @router.get("/user/{user_id}", response_model=List[RatingBase])
-async def get_ratings_by_user(user_id: int, db: Session = Depends(get_db)):
+async def get_ratings_by_user(user_id: int, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        ratings = db.query(Rating).filter(Rating.user_id == user_id).all()
-        return ratings
+        return await paginate(db, Rating, page, response, where=[Rating.user_id == user_id], allowed_fields=RATING_FIELDS, schema=RatingBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
@@ -44,34 +54,213 @@ async def get_ratings_by_user(user_id: int, db: Session = Depends(get_db)):
 
 # Получение всех рейтингов для достопримечательности
 @router.get("/landmark/{landmark_id}", response_model=List[RatingBase])
-async def get_ratings_by_landmark(landmark_id: int, db: Session = Depends(get_db)):
+async def get_ratings_by_landmark(landmark_id: int, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        ratings = db.query(Rating).filter(Rating.landmark_id == landmark_id).all()
-        return ratings
+        return await paginate(db, Rating, page, response, where=[Rating.landmark_id == landmark_id], allowed_fields=RATING_FIELDS, schema=RatingBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+# Сводка оценок достопримечательности: читает агрегаты из landmarks, без сканирования ratings
+@router.get("/landmark/{landmark_id}/summary", response_model=RatingSummary)
+async def get_rating_summary(landmark_id: int, db: AsyncSession = Depends(get_read_db)):
+    return rating_summary(await landmark_crud.find_one(db, landmark_id))
+
 @router.get("/", response_model=List[RatingBase])
-async def get_all_ratings(db: Session = Depends(get_db)):
+async def get_all_ratings(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        ratings = db.query(Rating).all()
-        return ratings
+        return await paginate(db, Rating, page, response, allowed_fields=RATING_FIELDS, schema=RatingBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
 @router.get("/{rating_id}", response_model=RatingBase)
-async def get_rating_by_id(rating_id: int, db: Session = Depends(get_db)):
+async def get_rating_by_id(rating_id: int, db: AsyncSession = Depends(get_read_db)):
     try:
-        rating = db.query(Rating).filter(Rating.id == rating_id).first()
-        if not rating:
-            raise HTTPException(status_code=404, detail="Rating not found")
-        return rating
+        return await rating_crud.find_one(db, rating_id)
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
+
+# Агрегаты затронутых достопримечательностей пересчитываются фоновой задачей после commit:
+# пакетная транзакция не держит блокировки строк landmarks, пересчёт идёт одним UPDATE на пачку.
+def enqueue_aggregates(db: AsyncSession, landmark_ids) -> None:
+    if landmark_ids:
+        enqueue(db, "rating_aggregates", {"landmark_ids": sorted(landmark_ids)}, priority=PRIORITY_HIGH)
+        schedule_refresh(db)
+
+
+# Пакетное добавление оценок. Одна оценка на достопримечательность от пользователя.
+@router.post("/bulk", response_model=BulkResponse, tags=["Ratings"], openapi_extra=bulk_openapi(RatingCreate))
+async def bulk_create_ratings(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    created = []
+
+    async def handle_chunk(chunk, result):
+        landmark_ids = {rating.landmark_id for _, rating in chunk}
+        landmarks = await existing_ids(db, Landmark, landmark_ids)
+        rated = await db.execute(
+            select(Rating.landmark_id).where(Rating.user_id == current_user.id, Rating.landmark_id.in_(landmark_ids))
+        )
+        already_rated = set(rated.scalars().all())
+
+        rows, indexes = [], []
+        for index, rating in chunk:
+            if rating.landmark_id not in landmarks:
+                result.fail(index, 404, f"Landmark {rating.landmark_id} not found")
+            elif rating.landmark_id in already_rated:
+                result.fail(index, 409, f"Landmark {rating.landmark_id} is already rated")
+            else:
+                already_rated.add(rating.landmark_id)
+                rows.append({**rating.model_dump(), "user_id": current_user.id})
+                indexes.append(index)
+
+        # Оценку могла поставить параллельная одиночная запись (POST /ratings/) уже после проверки выше
+        inserted = await insert_new_rows(db, Rating, rows, ("landmark_id", "user_id"))
+        written = []
+        for index, row in zip(indexes, rows):
+            rating_id = inserted.get((row["landmark_id"], row["user_id"]))
+            if rating_id is None:
+                result.fail(index, 409, f"Landmark {row['landmark_id']} is already rated")
+            else:
+                result.ids.append(rating_id)
+                written.append(row)
+        enqueue_aggregates(db, {row["landmark_id"] for row in written})
+        created.extend(written)
+        result.processed += len(written)
+
+    result = await run_bulk(request, db, RatingCreate, chunk_size, handle_chunk)
+    for row in created:
+        trending_board.record_rating(row["landmark_id"], row["rating"])
+    job_worker.notify()
+    await response_cache.invalidate("landmarks")
+    return result.as_dict()
+
+
+# Пакетное изменение своих оценок
+@router.put("/bulk", response_model=BulkResponse, tags=["Ratings"], openapi_extra=bulk_openapi(RatingUpdateItem))
+async def bulk_update_ratings(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Rating, chunk, lambda item: item.id, current_user.id, result)
+        current = await db.execute(select(Rating.id, Rating.landmark_id).where(Rating.id.in_(allowed)))
+        landmark_of = dict(current.all())
+
+        rows, touched = [], set()
+        for _, item in chunk:
+            if item.id not in allowed:
+                continue
+            rows.append(item.model_dump())
+            touched.add(landmark_of[item.id])
+
+        await update_rows(db, Rating, rows)
+        enqueue_aggregates(db, touched)
+        result.processed += len(rows)
+
+    result = await run_bulk(request, db, RatingUpdateItem, chunk_size, handle_chunk)
+    job_worker.notify()
+    await response_cache.invalidate("landmarks")
+    return result.as_dict()
+
+
+# Пакетное удаление своих оценок
+@router.delete("/bulk", response_model=BulkResponse, tags=["Ratings"], openapi_extra=bulk_openapi(int))
+async def bulk_delete_ratings(
+    request: Request,
+    chunk_size: int = Depends(chunk_size_param),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    async def handle_chunk(chunk, result):
+        allowed = await owned_ids(db, Rating, chunk, lambda rating_id: rating_id, current_user.id, result)
+        if not allowed:
+            return
+        current = await db.execute(select(Rating.landmark_id).where(Rating.id.in_(allowed)).distinct())
+        await db.execute(delete(Rating).where(Rating.id.in_(allowed)))
+        enqueue_aggregates(db, set(current.scalars().all()))
+        result.processed += len(allowed)
+
+    result = await run_bulk(request, db, int, chunk_size, handle_chunk)
+    job_worker.notify()
+    await response_cache.invalidate("landmarks")
+    return result.as_dict()
+
+
+# Запись одной оценки: значение через склейку частых повторов, в базу - upsert и сдвиг агрегатов
+# одной транзакцией под блокировкой строки достопримечательности (services/ratingWrites.py)
+async def _write_own_rating(request: Request, response: Response, user_id: int, landmark_id: int, value):
+    try:
+        rating_id, created, stored = await set_rating(user_id, landmark_id, value)
+    except LandmarkNotFound:
+        raise HTTPException(status_code=404, detail="Landmark not found")
+    read_routing.mark_write(request, response)
+    await response_cache.invalidate("landmarks")
+    return rating_id, created, stored
+
+
+# Оценка достопримечательности: новая или замена своей прежней (одна на пользователя)
+@router.post("/", response_model=RatingWritten, tags=["Ratings"])
+async def create_rating(
+    rating: RatingCreate,
+    request: Request,
+    response: Response,
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    rating_id, created, stored = await _write_own_rating(request, response, current_user.id, rating.landmark_id, rating.rating)
+    if stored is None:
+        raise HTTPException(status_code=409, detail="Rating was removed by a later request")
+    if created:
+        response.status_code = 201
+    return {"id": rating_id, "rating": stored, "user_id": current_user.id, "landmark_id": rating.landmark_id, "created": created}
+
+
+# Изменение своей оценки
+@router.put("/{rating_id}", response_model=RatingWritten, tags=["Ratings"])
+async def update_rating(
+    rating_id: int,
+    item: RatingCreate,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    rating = await rating_crud.find_owned(db, rating_id, current_user.id, "You are not authorized to change this rating")
+    if item.landmark_id != rating.landmark_id:
+        raise HTTPException(status_code=400, detail="A rating cannot be moved to another landmark")
+    # Запись идёт в своей транзакции; соединение чтения отпускаем, чтобы не держать его (и блокировку SQLite)
+    await db.close()
+    written_id, _, stored = await _write_own_rating(request, response, current_user.id, rating.landmark_id, item.rating)
+    if stored is None or written_id != rating_id:
+        raise HTTPException(status_code=409, detail="Rating was removed by a later request")
+    return {"id": rating_id, "rating": stored, "user_id": current_user.id, "landmark_id": rating.landmark_id, "created": False}
+
+
+# Удаление своей оценки
+@router.delete("/{rating_id}", tags=["Ratings"])
+async def delete_rating(
+    rating_id: int,
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: CurrentUser = Depends(get_current_user)
+):
+    rating = await rating_crud.find_owned(db, rating_id, current_user.id, "You are not authorized to change this rating")
+    await db.close()
+    await _write_own_rating(request, response, current_user.id, rating.landmark_id, None)
+    return {"message": "Rating successfully deleted"}
@@ -0,0 +1,41 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.readRouting import get_read_db
+from services.poolMetrics import pool_stats
+from middleware.authJWT import auth_cache
+from services import passwords
+from services.responseCache import response_cache
+from services.thumbnails import thumbnails
+from services.jobs import job_worker, queue_depth
+from services.ratingWrites import rating_writes
+from services.similarity import similarity_model
+from services.trending import trending_board
+from generateCRUDControllers import repository_stats
+
+router = APIRouter()
+
+
+# Счётчики внутренних кэшей (для подбора размеров)
+@router.get("/")
+async def get_stats():
+    return {
+        "auth_cache": auth_cache.stats(),
+        "password_hashing": passwords.stats(),
+        "response_cache": response_cache.stats(),
+        "thumbnails": thumbnails.stats(),
+        "job_worker": job_worker.stats(),
+        "rating_writes": rating_writes.stats(),
+        "similarity": similarity_model.stats(),
+        "trending": trending_board.stats(),
+        "repositories": repository_stats(),
+        "db_pools": pool_stats(),
+    }
+
+
+# Очередь фоновых задач: глубина по видам (общая для всех воркеров) и задержки воркера этого процесса
+@router.get("/jobs")
+async def get_job_stats(db: AsyncSession = Depends(get_read_db)):
+    return {
+        "depth": await queue_depth(db),
+        "worker": job_worker.stats(),
+    }
@@ -1,16 +1,27 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from models.user import User
-from config.database import get_db
-import bcrypt
-import jwt
+from services.readRouting import get_async_db, get_read_db
 from pydantic import BaseModel
 import os
 from datetime import datetime, timedelta
 from typing import List
 from schemas.user import UserBase
-
+from schemas.landmarks import LandmarkRecommendation
+from middleware.authJWT import JWT_EMBED_USER_ID, get_current_user, revoke_user
+from schemas.user import CurrentUser
+from services.passwords import hash_password, verify_password
+from services.pagination import PageParams, paginate
+from services.similarity import recommendations
+from services.deletion import delete_user
+from services.jobs import job_worker
+from services.responseCache import response_cache
+from services.search import landmark_search
+from services.geo import landmark_geo
+from services.trending import trending_board
+from generateCRUDControllers import user_crud
 
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
@@ -31,90 +42,124 @@ class SignUp(BaseModel):
     password: str
 
 
-# Генерация CRUD операций
-def generate_crud_operations(model):
-    return {
-        'create': lambda db, data: db.add(model(**data)) or db.commit(),
-        'get_all': lambda db: db.query(model).all(),
-        'get_one': lambda db, id: db.query(model).filter(model.id == id).first(),
-        'update': lambda db, id, data: db.query(model).filter(model.id == id).update(data) or db.commit(),
-        'delete': lambda db, id: db.query(model).filter(model.id == id).delete() or db.commit(),
-    }
-
-user_crud = generate_crud_operations(User)
+# Поля, доступные для проекции через ?fields=
+USER_FIELDS = list(UserBase.model_fields)
 
 # Метод для получения пользователей по имени пользователя
-@router.get("/username/{username}")
-async def get_users_by_username(username: str, db: Session = Depends(get_db)):
+@router.get("/username/{username}", response_model=List[UserBase])
+async def get_users_by_username(username: str, response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        users = db.query(User).filter(User.username == username).all()
-        return users
+        return await paginate(db, User, page, response, where=[User.username == username], allowed_fields=USER_FIELDS, schema=UserBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # Функция для создания JWT токена с истечением
 def create_access_token(data: dict, expires_delta: timedelta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)):
+    import jwt  # PyJWT загружается при первом входе, а не при импорте приложения
+
     to_encode = data.copy()
-    expire = datetime.utcnow() + expires_delta
-    to_encode.update({"exp": expire})
+    now = datetime.utcnow()
+    to_encode.update({"iat": now, "exp": now + expires_delta})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 @router.post("/signup")
-async def signup(sign_up_data: SignUp, db: Session = Depends(get_db)):
+async def signup(sign_up_data: SignUp, db: AsyncSession = Depends(get_async_db)):
     try:
         # Проверка, существует ли уже пользователь с таким же именем или email
-        existing_user = db.query(User).filter((User.username == sign_up_data.username) | (User.email == sign_up_data.email)).first()
+        # (мягко удалённые тоже: их строки ещё заняты до конца очистки)
+        result = await db.execute(
+            select(User).where((User.username == sign_up_data.username) | (User.email == sign_up_data.email)).execution_options(include_deleted=True)
+        )
+        existing_user = result.scalars().first()
         if existing_user:
             raise HTTPException(status_code=400, detail="Username or email is already taken")
 
         # Хэширование пароля перед сохранением
-        hashed_password = bcrypt.hashpw(sign_up_data.password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        hashed_password = await hash_password(sign_up_data.password)
 
         # Создание нового пользователя и добавление в базу данных
-        new_user = User(username=sign_up_data.username, email=sign_up_data.email, password=hashed_password)
-        db.add(new_user)
-        db.commit()
+        new_user = await user_crud.create(db, username=sign_up_data.username, email=sign_up_data.email, password=hashed_password)
 
         return {"message": "User successfully registered", "username": new_user.username}
 
-    except SQLAlchemyError as e:
+    except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="User registration failed")
 
 
 # Метод для входа пользователя
 @router.post("/signin")
-async def signin(sign_in_data: SignIn, db: Session = Depends(get_db)):
+async def signin(sign_in_data: SignIn, db: AsyncSession = Depends(get_async_db)):
     try:
-        user = db.query(User).filter(User.username == sign_in_data.username).first()
+        result = await db.execute(select(User).where(User.username == sign_in_data.username))
+        user = result.scalars().first()
         if not user:
             raise HTTPException(status_code=401, detail="Invalid username or password")
         
-        # Проверка пароля с использованием bcrypt
-        is_match = bcrypt.checkpw(sign_in_data.password.encode('utf-8'), user.password.encode('utf-8'))
+        # Проверка пароля с использованием bcrypt (в отдельном пуле потоков)
+        is_match, new_hash = await verify_password(sign_in_data.password, user.password)
         if not is_match:
             raise HTTPException(status_code=401, detail="Invalid username or password")
-        
-        # Генерация JWT токена
-        access_token = create_access_token(data={"sub": user.username})
+
+        # Хеш создан с устаревшей стоимостью - сохраняем пересчитанный
+        if new_hash:
+            user.password = new_hash
+            await db.commit()
+
+        # Генерация JWT токена (с id пользователя, чтобы проверка токена не ходила в базу)
+        claims = {"sub": user.username}
+        if JWT_EMBED_USER_ID:
+            claims["uid"] = user.id
+        access_token = create_access_token(data=claims)
         return {"message": "Authentication successful", "access_token": access_token, "token_type": "bearer"}
 
-    except SQLAlchemyError as e:
+    except SQLAlchemyError:
         raise HTTPException(status_code=500, detail="User login failed")
 
+# Удаление своей учётной записи вместе с достопримечательностями, фото и оценками
+# (services/deletion.py: каскад в базе или, при SOFT_DELETE=1, скрытие и фоновая очистка)
+@router.delete("/me")
+async def delete_current_user(db: AsyncSession = Depends(get_async_db), current_user: CurrentUser = Depends(get_current_user)):
+    # Токены отзываются до commit: другие воркеры перестают доверять uid в токене раньше,
+    # чем пользователь исчезнет из базы
+    await revoke_user(current_user.id)
+    try:
+        landmark_ids = await delete_user(db, current_user.id)
+        await db.commit()
+    except SQLAlchemyError:
+        raise HTTPException(status_code=500, detail="User deletion failed")
+    job_worker.notify()
+    await response_cache.invalidate("landmarks", "photos")
+    landmark_search.remove_many(landmark_ids)
+    landmark_geo.remove_many(landmark_ids)
+    trending_board.remove_many(landmark_ids)
+    return {"message": "User successfully deleted"}
+
 @router.get("/", response_model=List[UserBase])
-async def get_all_users(db: Session = Depends(get_db)):
+async def get_all_users(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_read_db)):
     try:
-        users = db.query(User).all()
-        return users
+        return await paginate(db, User, page, response, allowed_fields=USER_FIELDS, schema=UserBase)
+    except HTTPException:
+        raise
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
     
 @router.get("/{user_id}", response_model=UserBase)
-async def get_user_by_id(user_id: int, db: Session = Depends(get_db)):
+async def get_user_by_id(user_id: int, db: AsyncSession = Depends(get_read_db)):
     try:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        return user
+        return await user_crud.find_one(db, user_id)
     except SQLAlchemyError as e:
         raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+
+# Рекомендации по оценкам пользователя: соседи понравившихся достопримечательностей,
+# которые он ещё не оценивал (services/similarity.py)
+@router.get("/{user_id}/recommendations", response_model=List[LandmarkRecommendation])
+async def get_user_recommendations(
+    user_id: int,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db),
+):
+    await user_crud.find_one(db, user_id)
+    return await recommendations(db, user_id, limit)
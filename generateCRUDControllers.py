@@ -1,51 +1,163 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from typing import Type, TypeVar, Generic
-from pydantic import BaseModel
-from config.database import get_db
+import asyncio
+import os
+from typing import Dict, Generic, Iterable, List, Optional, Set, Tuple, Type, TypeVar
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import PrimarySession
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from models.timestamps import utcnow
+from models.user import User
 
-T = TypeVar("T", bound=BaseModel)
+# 0 - чтения по id идут прямо через session.get, без пачек и общих запросов (для сравнения)
+REPOSITORY_BATCHING = os.getenv("REPOSITORY_BATCHING", "1") == "1"
 
+T = TypeVar("T")
+
+
+# Общий слой доступа к данным одной модели для всех роутеров.
+# Чтения по id (get, get_many, find_one) собираются в пачку до конца текущего тика цикла событий
+# и выполняются одним SELECT ... WHERE id IN (...) на engine сессии вызывающего (основная база или реплика).
+# Одинаковые одновременные чтения получают результат одного запроса, пока после его запуска
+# в этом процессе не было commit с изменениями.
+# Такие объекты загружаются в отдельной короткой сессии и отдаются отсоединёнными:
+# только для чтения колонок. Для изменения объект берётся в сессии запроса (find_owned).
 class CRUDController(Generic[T]):
-    def __init__(self, model: Type[T]):
+    def __init__(self, model: Type[T], name: str):
         self.model = model
-        self.router = APIRouter()
-        self.router.add_api_route("/", self.create, methods=["POST"])
-        self.router.add_api_route("/", self.find_all, methods=["GET"])
-        self.router.add_api_route("/{id}", self.find_one, methods=["GET"])
-        self.router.add_api_route("/{id}", self.update, methods=["PUT"])
-        self.router.add_api_route("/{id}", self.delete, methods=["DELETE"])
-    
-    async def create(self, item: T, db: Session = Depends(get_db)):
-        db_item = self.model(**item.dict())
-        db.add(db_item)
-        db.commit()
-        db.refresh(db_item)
-        return db_item
-    
-    async def find_all(self, db: Session = Depends(get_db)):
-        return db.query(self.model).all()
-    
-    async def find_one(self, id: int, db: Session = Depends(get_db)):
-        item = db.query(self.model).filter(self.model.id == id).first()
-        if not item:
-            raise HTTPException(status_code=404, detail="Item not found")
+        self.name = name
+        self.not_found = f"{name} not found"
+        self._pending: Dict[object, Dict[int, asyncio.Future]] = {}
+        self._in_flight: Dict[Tuple[object, int], Tuple[int, asyncio.Future]] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.loads = 0
+        self.queries = 0
+        self.shared = 0
+
+    # Чтение пачки по id (его план проверяет tests/test_query_plans.py)
+    def batch_statement(self, ids: List[int]):
+        return select(self.model).where(self.model.id.in_(ids))
+
+    def _load(self, engine, id: int) -> asyncio.Future:
+        self.loads += 1
+        batch = self._pending.get(engine)
+        if batch is not None and id in batch:
+            self.shared += 1
+            return batch[id]
+
+        flight = self._in_flight.get((engine, id))
+        if flight is not None and flight[0] == PrimarySession.write_commits:
+            self.shared += 1
+            return flight[1]
+
+        loop = asyncio.get_running_loop()
+        if batch is None:
+            batch = self._pending[engine] = {}
+            loop.call_soon(self._dispatch, engine)
+        future = batch[id] = loop.create_future()
+        return future
+
+    def _dispatch(self, engine) -> None:
+        batch = self._pending.pop(engine)
+        generation = PrimarySession.write_commits
+        for id, future in batch.items():
+            self._in_flight[(engine, id)] = (generation, future)
+        task = asyncio.ensure_future(self._fetch(engine, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fetch(self, engine, batch: Dict[int, asyncio.Future]) -> None:
+        self.queries += 1
+        try:
+            async with AsyncSession(bind=engine, autoflush=False, expire_on_commit=False) as session:
+                result = await session.execute(self.batch_statement(list(batch)))
+                found = {row.id: row for row in result.scalars()}
+        except BaseException as error:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(error) if isinstance(error, Exception) else future.cancel()
+            if not isinstance(error, Exception):
+                raise
+        else:
+            for id, future in batch.items():
+                if not future.done():
+                    future.set_result(found.get(id))
+        finally:
+            for id, future in batch.items():
+                flight = self._in_flight.get((engine, id))
+                if flight is not None and flight[1] is future:
+                    del self._in_flight[(engine, id)]
+
+    # Объект по id или None
+    async def get(self, db: AsyncSession, id: int) -> Optional[T]:
+        if not REPOSITORY_BATCHING:
+            return await db.get(self.model, id)
+        # shield: отмена одного запроса не отменяет чтение, которого ждут другие
+        return await asyncio.shield(self._load(db.bind, id))
+
+    # Объекты по списку id одним запросом: {id: объект}, отсутствующих в словаре нет
+    async def get_many(self, db: AsyncSession, ids: Iterable[int]) -> Dict[int, T]:
+        ids = list(dict.fromkeys(ids))
+        if not REPOSITORY_BATCHING:
+            result = await db.execute(self.batch_statement(ids))
+            return {row.id: row for row in result.scalars()}
+        rows = await asyncio.shield(asyncio.gather(*(self._load(db.bind, id) for id in ids)))
+        return {id: row for id, row in zip(ids, rows) if row is not None}
+
+    # Объект по id или 404
+    async def find_one(self, db: AsyncSession, id: int) -> T:
+        item = await self.get(db, id)
+        if item is None:
+            raise HTTPException(status_code=404, detail=self.not_found)
+        return item
+
+    # Объект в сессии запроса для изменения: 404, если нет, 403, если принадлежит другому пользователю
+    async def find_owned(self, db: AsyncSession, id: int, user_id: int, forbidden: str) -> T:
+        item = await db.get(self.model, id)
+        if item is None:
+            raise HTTPException(status_code=404, detail=self.not_found)
+        if item.user_id != user_id:
+            raise HTTPException(status_code=403, detail=forbidden)
+        return item
+
+    async def create(self, db: AsyncSession, **values) -> T:
+        item = self.model(**values)
+        db.add(item)
+        await db.commit()
+        await db.refresh(item)
         return item
-    
-    async def update(self, id: int, item: T, db: Session = Depends(get_db)):
-        db_item = db.query(self.model).filter(self.model.id == id).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail="Item not found")
-        for key, value in item.dict().items():
-            setattr(db_item, key, value)
-        db.commit()
-        db.refresh(db_item)
-        return db_item
-    
-    async def delete(self, id: int, db: Session = Depends(get_db)):
-        db_item = db.query(self.model).filter(self.model.id == id).first()
-        if not db_item:
-            raise HTTPException(status_code=404, detail="Item not found")
-        db.delete(db_item)
-        db.commit()
-        return {"message": "Item deleted"}
+
+    async def update(self, db: AsyncSession, item: T, **values) -> T:
+        if hasattr(self.model, "updated_at"):
+            values.setdefault("updated_at", utcnow())
+        for key, value in values.items():
+            setattr(item, key, value)
+        await db.commit()
+        await db.refresh(item)
+        return item
+
+    async def delete(self, db: AsyncSession, item: T) -> None:
+        await db.delete(item)
+        await db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "queries": self.queries,
+            "shared": self.shared,
+            "loads_per_query": round(self.loads / self.queries, 2) if self.queries else 0.0,
+        }
+
+
+landmark_crud = CRUDController(Landmark, "Landmark")
+photo_crud = CRUDController(Photo, "Photo")
+rating_crud = CRUDController(Rating, "Rating")
+user_crud = CRUDController(User, "User")
+
+repositories = (landmark_crud, photo_crud, rating_crud, user_crud)
+
+
+def repository_stats() -> dict:
+    return {repository.name.lower(): repository.stats() for repository in repositories}
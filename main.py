@@ -1,21 +1,74 @@
+import os
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from config.createtables import create_tables
 
-# Создание таблиц
-create_tables()
+# Схема базы создаётся миграциями: alembic upgrade head (или python -m config.createtables).
+# Воркеры при старте схему не трогают; проверка один раз на развёртывание: python -m config.schemacheck
 
 from controllers.landmarkController import router as landmark_router
 from controllers.userController import router as user_router
 from controllers.photoControllers import router as photo_router
 from controllers.ratingController import router as rating_router
+from controllers.statsController import router as stats_router
+from controllers.exportController import router as export_router
+from controllers.metricsController import router as metrics_router
+from controllers.profilingController import router as profiling_router
+from controllers.healthController import router as health_router
+from config.database import engine, async_engine, read_async_engine, dispose_engines
+from services.metrics import instrument, instrument_engine
+from services import profiling
+from services.jobs import job_worker
+from services.readiness import readiness
+from services.responseCache import RESPONSE_CACHE_BACKEND
+from services.trending import trending_board
+import services.jobHandlers  # регистрирует обработчики фоновых задач
 
-app = FastAPI()
+# Фоновые задачи выполняются в процессе API; 0 - только отдельным воркером (python worker.py)
+JOB_WORKER_INPROCESS = os.getenv("JOB_WORKER_INPROCESS", "1") == "1"
+# Задачи отдельного воркера сбрасывают кэш ответов API только через общий Redis (см. worker.py)
+if not JOB_WORKER_INPROCESS and RESPONSE_CACHE_BACKEND != "redis":
+    raise RuntimeError("JOB_WORKER_INPROCESS=0 needs RESPONSE_CACHE_BACKEND=redis: jobs run in worker.py invalidate the response cache")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if JOB_WORKER_INPROCESS:
+        job_worker.start()
+    # Прогрев в фоне: запросы принимаются сразу, /health/ready отвечает 200 после прогрева
+    readiness.start()
+    # Запись накопленных прибавок популярности в базу (последняя - при остановке)
+    trending_board.start()
+    yield
+    await readiness.stop()
+    await trending_board.stop()
+    await job_worker.stop()
+    await dispose_engines()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(landmark_router, prefix="/landmarks", tags=["Landmarks"])
 app.include_router(user_router, prefix="/users", tags=["Users"])
 app.include_router(photo_router, prefix="/photos", tags=["Photos"])
 app.include_router(rating_router, prefix="/ratings", tags=["Ratings"])
+app.include_router(stats_router, prefix="/stats", tags=["Stats"])
+app.include_router(export_router, prefix="/export", tags=["Export"])
+app.include_router(metrics_router)
+app.include_router(health_router, prefix="/health", tags=["Health"])
+if profiling.PROFILING_ENABLED:
+    app.include_router(profiling_router, prefix="/profiling", tags=["Profiling"])
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Landmark API!"}
+
+
+# Метрики: время SQL по всем engine и middleware с заранее созданными метками маршрутов
+for instrumented in (engine, async_engine.sync_engine, read_async_engine.sync_engine):
+    instrument_engine(instrumented)
+    if profiling.PROFILING_ENABLED:
+        profiling.profile_engine(instrumented)
+# Профилирование (PROFILING=1): Server-Timing, медленные SQL, /profiling/flamegraph
+if profiling.PROFILING_ENABLED:
+    profiling.install(app)
+instrument(app)
@@ -2,19 +2,163 @@
 
 from fastapi import HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer
-import jwt
-from config.database import get_db
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import time
+from typing import Optional, Set
+from services.readRouting import get_async_db
+from sqlalchemy import select, event
+from sqlalchemy.ext.asyncio import AsyncSession
 from models.user import User
+from schemas.user import CurrentUser
+from services.cache import TTLCache
+from services.profiling import timed
 import os
 
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key")
 ALGORITHM = "HS256"
 
+# Класть id пользователя в токен (claim "uid"): тогда проверка токена не ходит в базу.
+# Такой токен принимается, пока пользователь не отозван (удалён или изменён после выдачи токена).
+# С AUTH_REVOCATION_BACKEND=memory об отзыве знает только воркер, который его сделал: остальные
+# принимают токен удалённого пользователя до конца его срока. Поэтому по умолчанию выключено,
+# а с несколькими воркерами включать только вместе с AUTH_REVOCATION_BACKEND=redis.
+JWT_EMBED_USER_ID = os.getenv("JWT_EMBED_USER_ID", "0") == "1"
+
+# Сколько помнить об изменении пользователя; должно быть не меньше времени жизни токена
+AUTH_REVOCATION_TTL = float(os.getenv("AUTH_REVOCATION_TTL", 3600))
+# Где хранятся отзывы: memory - в процессе, redis - общие для всех воркеров (нужен пакет redis)
+AUTH_REVOCATION_BACKEND = os.getenv("AUTH_REVOCATION_BACKEND", "memory")
+# С отзывами в памяти удаление пользователя или смена пароля сбрасывает кэш только своего воркера:
+# в остальных токен из кэша принимается до истечения записи. Поэтому там кэш живёт не дольше этого
+AUTH_MEMORY_CACHE_MAX_TTL = 5.0
+# Кэш проверенных токенов: token -> (CurrentUser, iat). С redis запись из кэша сверяется с общими отзывами
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 300 if AUTH_REVOCATION_BACKEND == "redis" else AUTH_MEMORY_CACHE_MAX_TTL))
+if AUTH_REVOCATION_BACKEND != "redis" and AUTH_CACHE_TTL > AUTH_MEMORY_CACHE_MAX_TTL:
+    raise RuntimeError(
+        f"AUTH_CACHE_TTL above {AUTH_MEMORY_CACHE_MAX_TTL:g}s requires AUTH_REVOCATION_BACKEND=redis: "
+        "other workers would accept tokens of deleted users from their caches"
+    )
+# Адрес Redis для отзывов; по умолчанию тот же, что у кэша ответов
+AUTH_REVOCATION_URL = os.getenv("AUTH_REVOCATION_URL", os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0"))
+
+logger = logging.getLogger(__name__)
+
+auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+# user_id -> время (unix) удаления/изменения пользователя, известное этому процессу
+revoked_users = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_REVOCATION_TTL)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="signin")
 
+
+# Общие для воркеров отзывы: ключ на пользователя с TTL, запись - при изменении пользователя,
+# чтение - при каждой проверке токена, которая не идёт в базу
+class RedisRevocations:
+    def __init__(self, url: str, ttl: float, prefix: str = "landmarks:revoked:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    async def revoke(self, user_id: int, revoked_at: float) -> None:
+        await self.client.set(f"{self.prefix}{user_id}", revoked_at, ex=self.ttl)
+
+    async def revoked_at(self, user_id: int) -> Optional[float]:
+        value = await self.client.get(f"{self.prefix}{user_id}")
+        return float(value) if value is not None else None
+
+
+shared_revocations = RedisRevocations(AUTH_REVOCATION_URL, AUTH_REVOCATION_TTL) if AUTH_REVOCATION_BACKEND == "redis" else None
+_publishing: Set[asyncio.Task] = set()
+
+
+async def _publish(user_id: int, revoked_at: float) -> None:
+    try:
+        await shared_revocations.revoke(user_id, revoked_at)
+    except Exception:
+        logger.exception("Failed to publish revocation of user %s", user_id)
+
+
+# Сбрасывает кэш для пользователя; токены, выданные раньше, снова проверяются по базе.
+# Синхронная (вызывается из событий ORM): запись в общее хранилище уходит фоновой задачей,
+# обработчики, которым важен порядок, дожидаются её через revoke_user.
+def invalidate_user(user_id: int) -> Optional[asyncio.Task]:
+    revoked_at = time.time()
+    revoked_users.set(user_id, revoked_at)
+    auth_cache.delete_where(lambda token, entry: entry[0].id == user_id)
+    if shared_revocations is None:
+        return None
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        # Синхронный код вне приложения (скрипты с engine): общий отзыв не записать
+        logger.warning("No event loop to publish revocation of user %s", user_id)
+        return None
+    task = loop.create_task(_publish(user_id, revoked_at))
+    _publishing.add(task)
+    task.add_done_callback(_publishing.discard)
+    return task
+
+
+async def revoke_user(user_id: int) -> None:
+    task = invalidate_user(user_id)
+    if task is not None:
+        await task
+
+
+# Любое изменение или удаление пользователя через ORM инвалидирует его токены в кэше
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    invalidate_user(target.id)
+
+
+# Отозван ли пользователь после выдачи токена. Общее хранилище недоступно - считаем отозванным:
+# токен тогда проверяется по базе
+async def _is_revoked(user_id: int, issued_at: float) -> bool:
+    revoked_at = revoked_users.get(user_id)
+    if revoked_at is not None and issued_at <= revoked_at:
+        return True
+    if shared_revocations is None:
+        return False
+    try:
+        revoked_at = await shared_revocations.revoked_at(user_id)
+    except Exception:
+        logger.exception("Failed to read revocation of user %s", user_id)
+        return True
+    return revoked_at is not None and issued_at <= revoked_at
+
+
+# Токен с uid можно принять без базы, если пользователь не менялся после выдачи токена
+async def _trusted_principal(payload: dict):
+    user_id = payload.get("uid")
+    if not JWT_EMBED_USER_ID or user_id is None:
+        return None
+    if await _is_revoked(user_id, payload.get("iat", 0)):
+        return None
+    return CurrentUser(id=user_id, username=payload["sub"])
+
+
+# Пользователь токена (если uid в токене не используется)
+def principal_statement(username: str):
+    return select(User).where(User.username == username)
+
+
 # Зависимость для извлечения и проверки токена
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@timed("auth")
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    cached = auth_cache.get(token)
+    if cached is not None:
+        principal, issued_at = cached
+        # Отзыв в другом воркере виден только через общее хранилище
+        if shared_revocations is None or not await _is_revoked(principal.id, issued_at):
+            return principal
+        auth_cache.delete(token)
+
+    import jwt  # PyJWT загружается при первой проверке токена, а не при импорте приложения
+
     try:
         # Декодируем токен и извлекаем информацию
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -22,13 +166,22 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid credentials")
-        
-        # Получаем пользователя из базы данных
-        user = db.query(User).filter(User.username == username).first()
-        
-        if user is None:
-            raise HTTPException(status_code=401, detail="User not found")
-        
-        return user
-    except jwt.JWTError:
+
+        principal = await _trusted_principal(payload)
+        if principal is None:
+            # Получаем пользователя из базы данных
+            result = await db.execute(principal_statement(username))
+            user = result.scalars().first()
+
+            if user is None:
+                raise HTTPException(status_code=401, detail="User not found")
+
+            principal = CurrentUser.model_validate(user)
+
+        # Запись в кэше живёт не дольше самого токена
+        expires_at = payload.get("exp")
+        ttl = expires_at - time.time() if expires_at else None
+        auth_cache.set(token, (principal, payload.get("iat", 0)), ttl=ttl)
+        return principal
+    except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Could not validate credentials")
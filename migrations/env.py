@@ -0,0 +1,71 @@
+from logging.config import fileConfig
+
+from alembic import context
+from config.database import engine, Base
+
+# Импортируем модели, чтобы они попали в Base.metadata (для --autogenerate)
+from models.user import User
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from models.job import Job
+from models.similarity import LandmarkSimilarity
+
+config = context.config
+
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+# Индексы, которые есть только в миграциях (зависят от диалекта) - autogenerate их не трогает
+MIGRATION_ONLY_INDEXES = {"ft_landmarks_text", "ix_landmarks_fulltext"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (type_ == "index" and name in MIGRATION_ONLY_INDEXES)
+
+
+# Генерация SQL без подключения к базе: alembic upgrade head --sql
+def run_migrations_offline() -> None:
+    context.configure(
+        url=engine.url.render_as_string(hide_password=False),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Можно передать готовое соединение через config.attributes (см. config/createtables.py)
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run_with_connection(connection)
+        return
+
+    with engine.connect() as connection:
+        _run_with_connection(connection)
+
+
+def _run_with_connection(connection) -> None:
+    # render_as_batch нужен для ALTER TABLE в SQLite
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True,
+        include_object=include_object,
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,84 @@
+"""Initial schema (как создавал Base.metadata.create_all)
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 10:00:00
+
+Для базы, уже созданной через create_all, выполните: alembic stamp 0001
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('username', sa.String(length=30), nullable=False),
+        sa.Column('email', sa.String(length=100), nullable=False),
+        sa.Column('password', sa.String(length=255), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email'),
+    )
+    op.create_index('ix_users_id', 'users', ['id'])
+
+    op.create_table(
+        'landmarks',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('location', sa.String(length=100), nullable=True),
+        sa.Column('country', sa.String(length=50), nullable=True),
+        sa.Column('image_url', sa.String(length=100), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_landmarks_id', 'landmarks', ['id'])
+
+    op.create_table(
+        'photos',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('image_url', sa.String(length=200), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('landmark_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['landmark_id'], ['landmarks.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_photos_id', 'photos', ['id'])
+
+    op.create_table(
+        'ratings',
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('rating', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('landmark_id', sa.Integer(), nullable=False),
+        sa.CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'),
+        sa.ForeignKeyConstraint(['landmark_id'], ['landmarks.id']),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_ratings_id', 'ratings', ['id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ratings_id', table_name='ratings')
+    op.drop_table('ratings')
+    op.drop_index('ix_photos_id', table_name='photos')
+    op.drop_table('photos')
+    op.drop_index('ix_landmarks_id', table_name='landmarks')
+    op.drop_table('landmarks')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
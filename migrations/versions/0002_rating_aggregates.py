@@ -0,0 +1,57 @@
+"""Rating aggregates on landmarks
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 10:10:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+AGGREGATE_COLUMNS = ['rating_count', 'rating_sum', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('landmarks') as batch_op:
+        for name in AGGREGATE_COLUMNS:
+            batch_op.add_column(sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('avg_rating', sa.Float(), nullable=False, server_default='0'))
+
+    # Повторные оценки одного пользователя запрещает уникальный индекс из 0003:
+    # оставляем самую позднюю, чтобы агрегаты сразу считались по итоговым данным
+    op.execute("""
+        DELETE FROM ratings WHERE id NOT IN (
+            SELECT id FROM (SELECT MAX(id) AS id FROM ratings GROUP BY landmark_id, user_id) AS latest
+        )
+    """)
+
+    # Заполняем агрегаты по уже существующим оценкам
+    star_counts = ",\n".join(
+        f"rating_{star} = (SELECT COUNT(*) FROM ratings r WHERE r.landmark_id = landmarks.id AND r.rating = {star})"
+        for star in range(1, 6)
+    )
+    op.execute(f"""
+        UPDATE landmarks SET
+            rating_count = (SELECT COUNT(*) FROM ratings r WHERE r.landmark_id = landmarks.id),
+            rating_sum = (SELECT COALESCE(SUM(r.rating), 0) FROM ratings r WHERE r.landmark_id = landmarks.id),
+            avg_rating = (SELECT COALESCE(AVG(r.rating), 0) FROM ratings r WHERE r.landmark_id = landmarks.id),
+            {star_counts}
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.drop_column('avg_rating')
+        for name in reversed(AGGREGATE_COLUMNS):
+            batch_op.drop_column(name)
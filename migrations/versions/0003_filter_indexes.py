@@ -0,0 +1,45 @@
+"""Indexes for filter columns used by controllers
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:20:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_users_username', 'users', ['username'])
+
+    op.create_index('ix_landmarks_user_id', 'landmarks', ['user_id'])
+    op.create_index('ix_landmarks_country_avg_rating', 'landmarks', ['country', 'avg_rating'])
+    op.create_index('ix_landmarks_avg_rating', 'landmarks', ['avg_rating'])
+
+    op.create_index('ix_photos_landmark_id', 'photos', ['landmark_id'])
+    op.create_index('ix_photos_user_id', 'photos', ['user_id'])
+
+    # Повторные оценки удалены в 0002, поэтому уникальный индекс создаётся без ошибок
+    op.create_index('ux_ratings_landmark_user', 'ratings', ['landmark_id', 'user_id'], unique=True)
+    op.create_index('ix_ratings_user_id', 'ratings', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_ratings_user_id', table_name='ratings')
+    op.drop_index('ux_ratings_landmark_user', table_name='ratings')
+    op.drop_index('ix_photos_user_id', table_name='photos')
+    op.drop_index('ix_photos_landmark_id', table_name='photos')
+    op.drop_index('ix_landmarks_avg_rating', table_name='landmarks')
+    op.drop_index('ix_landmarks_country_avg_rating', table_name='landmarks')
+    op.drop_index('ix_landmarks_user_id', table_name='landmarks')
+    op.drop_index('ix_users_username', table_name='users')
@@ -0,0 +1,44 @@
+"""Full-text index over landmark name, description and location
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 12:40:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Выражение должно совпадать с POSTGRES_DOCUMENT в services/search.py
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce(landmarks.name, '') || ' ' || "
+    "coalesce(landmarks.location, '') || ' ' || coalesce(landmarks.description, ''))"
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect in ('mysql', 'mariadb'):
+        op.create_index('ft_landmarks_text', 'landmarks', ['name', 'description', 'location'], mysql_prefix='FULLTEXT')
+    elif dialect == 'postgresql':
+        op.execute(f"CREATE INDEX ix_landmarks_fulltext ON landmarks USING gin ({POSTGRES_DOCUMENT})")
+    # В SQLite поиск идёт по индексу в памяти процесса (services/search.py)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect in ('mysql', 'mariadb'):
+        op.drop_index('ft_landmarks_text', table_name='landmarks')
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX ix_landmarks_fulltext")
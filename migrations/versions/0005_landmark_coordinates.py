@@ -0,0 +1,39 @@
+"""Landmark coordinates with a geohash index
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 13:30:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Колонки допускают NULL: у существующих достопримечательностей координат нет
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+
+    op.create_index('ix_landmarks_geohash', 'landmarks', ['geohash'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_landmarks_geohash', table_name='landmarks')
+
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,35 @@
+"""Uploaded photo files in the blob store
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 15:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # NULL - фотография по внешней ссылке image_url, как раньше
+    with op.batch_alter_table('photos') as batch_op:
+        batch_op.add_column(sa.Column('blob_key', sa.String(length=80), nullable=True))
+        batch_op.add_column(sa.Column('content_type', sa.String(length=50), nullable=True))
+        batch_op.add_column(sa.Column('size_bytes', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('photos') as batch_op:
+        batch_op.drop_column('size_bytes')
+        batch_op.drop_column('content_type')
+        batch_op.drop_column('blob_key')
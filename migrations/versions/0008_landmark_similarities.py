@@ -0,0 +1,53 @@
+"""Item-item landmark similarities and a dirty flag for incremental refresh
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 19:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'landmark_similarities',
+        sa.Column('landmark_id', sa.Integer(), nullable=False),
+        sa.Column('similar_id', sa.Integer(), nullable=False),
+        sa.Column('score', sa.Float(), nullable=False),
+        sa.Column('common', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['landmark_id'], ['landmarks.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['similar_id'], ['landmarks.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('landmark_id', 'similar_id'),
+    )
+    op.create_index('ix_landmark_similarities_landmark_score', 'landmark_similarities', ['landmark_id', 'score'])
+    op.create_index('ix_landmark_similarities_similar', 'landmark_similarities', ['similar_id'])
+
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.add_column(sa.Column('similarity_dirty', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_landmarks_similarity_dirty', 'landmarks', ['similarity_dirty'])
+
+    # Уже оценённые достопримечательности попадут в первый пересчёт (он же полная сборка модели)
+    landmarks = sa.table('landmarks', sa.column('rating_count', sa.Integer), sa.column('similarity_dirty', sa.Boolean))
+    op.execute(landmarks.update().where(landmarks.c.rating_count > 0).values(similarity_dirty=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_landmarks_similarity_dirty', table_name='landmarks')
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.drop_column('similarity_dirty')
+
+    op.drop_index('ix_landmark_similarities_similar', table_name='landmark_similarities')
+    op.drop_index('ix_landmark_similarities_landmark_score', table_name='landmark_similarities')
+    op.drop_table('landmark_similarities')
@@ -0,0 +1,59 @@
+"""Created/updated timestamps and a time-decayed trending score
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 21:00:00
+
+"""
+from datetime import datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TIMESTAMPED_TABLES = ('landmarks', 'photos', 'ratings')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Время существующих записей неизвестно: им ставится время миграции
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for table_name in TIMESTAMPED_TABLES:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+            batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        table = sa.table(table_name, sa.column('created_at', sa.DateTime), sa.column('updated_at', sa.DateTime))
+        op.execute(table.update().values(created_at=now, updated_at=now))
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+            batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_index('ix_ratings_created_at', 'ratings', ['created_at'])
+    op.create_index('ix_photos_created_at', 'photos', ['created_at'])
+
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.add_column(sa.Column('trending_score', sa.Float(precision=53), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('trending_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_landmarks_trending_at', 'landmarks', ['trending_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_landmarks_trending_at', table_name='landmarks')
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.drop_column('trending_at')
+        batch_op.drop_column('trending_score')
+
+    op.drop_index('ix_photos_created_at', table_name='photos')
+    op.drop_index('ix_ratings_created_at', table_name='ratings')
+    for table_name in TIMESTAMPED_TABLES:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('updated_at')
+            batch_op.drop_column('created_at')
@@ -0,0 +1,62 @@
+"""ON DELETE CASCADE for user and landmark children, soft delete columns
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 23:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Таблица -> (колонка, родительская таблица)
+FOREIGN_KEYS = {
+    'landmarks': (('user_id', 'users'),),
+    'photos': (('user_id', 'users'), ('landmark_id', 'landmarks')),
+    'ratings': (('user_id', 'users'), ('landmark_id', 'landmarks')),
+}
+# Ключи из 0001 созданы без имён: в SQLite batch-режим называет их по этому шаблону
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+SOFT_DELETE_TABLES = ('users', 'landmarks')
+
+
+# Пересоздаёт внешние ключи с нужным ON DELETE. Имена существующих ключей берутся из базы
+# (MySQL: photos_ibfk_1, PostgreSQL: photos_user_id_fkey); в SQLite их нет - тогда по шаблону.
+def _replace_foreign_keys(ondelete: Union[str, None]) -> None:
+    inspector = sa.inspect(op.get_bind())
+    for table_name, keys in FOREIGN_KEYS.items():
+        existing = {
+            (tuple(key['constrained_columns']), key['referred_table']): key['name']
+            for key in inspector.get_foreign_keys(table_name)
+        }
+        with op.batch_alter_table(table_name, naming_convention=NAMING_CONVENTION) as batch_op:
+            for column, referred in keys:
+                name = f"fk_{table_name}_{column}_{referred}"
+                batch_op.drop_constraint(existing.get(((column,), referred)) or name, type_='foreignkey')
+                batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    _replace_foreign_keys('CASCADE')
+    for table_name in SOFT_DELETE_TABLES:
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index(f'ix_{table_name}_deleted_at', table_name, ['deleted_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table_name in SOFT_DELETE_TABLES:
+        op.drop_index(f'ix_{table_name}_deleted_at', table_name=table_name)
+        with op.batch_alter_table(table_name) as batch_op:
+            batch_op.drop_column('deleted_at')
+    _replace_foreign_keys(None)
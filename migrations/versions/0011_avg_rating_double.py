@@ -0,0 +1,48 @@
+"""Double precision for landmarks.avg_rating (keyset cursor key)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.alter_column(
+            'avg_rating', existing_type=sa.Float(), type_=sa.Float(precision=53),
+            existing_nullable=False, existing_server_default='0',
+        )
+    # Значения, записанные в одинарной точности, пересчитываются из rating_sum / rating_count
+    landmarks = sa.table(
+        'landmarks',
+        sa.column('avg_rating', sa.Float(precision=53)),
+        sa.column('rating_sum', sa.Integer),
+        sa.column('rating_count', sa.Integer),
+    )
+    op.execute(
+        landmarks.update()
+        .where(landmarks.c.rating_count > 0)
+        .values(avg_rating=sa.cast(landmarks.c.rating_sum, sa.Float(precision=53)) / landmarks.c.rating_count)
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('landmarks') as batch_op:
+        batch_op.alter_column(
+            'avg_rating', existing_type=sa.Float(precision=53), type_=sa.Float(),
+            existing_nullable=False, existing_server_default='0',
+        )
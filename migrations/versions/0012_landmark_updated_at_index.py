@@ -0,0 +1,27 @@
+"""Index on landmarks.updated_at (sync of in-memory indexes between processes)
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-20 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0012'
+down_revision: Union[str, None] = '0011'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_landmarks_updated_at', 'landmarks', ['updated_at'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_landmarks_updated_at', table_name='landmarks')
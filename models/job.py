@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, SmallInteger, String, Text, DateTime, Index
+from config.database import Base
+
+# Фоновая задача (services/jobs.py). Задача добавляется в той же транзакции, что и основная
+# запись, поэтому не теряется ни при ошибке после commit, ни при перезапуске процесса.
+class Job(Base):
+    __tablename__ = 'jobs'
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(50), nullable=False)
+    payload = Column(Text, nullable=False)  # JSON
+    priority = Column(SmallInteger, nullable=False, default=0, server_default='0')  # больше - раньше
+    status = Column(String(10), nullable=False, default='queued', server_default='queued')  # queued / running / failed
+    attempts = Column(Integer, nullable=False, default=0, server_default='0')
+    max_attempts = Column(Integer, nullable=False, default=5, server_default='5')
+    # Время в UTC без часового пояса
+    created_at = Column(DateTime, nullable=False)
+    run_at = Column(DateTime, nullable=False)  # не раньше этого времени (отсрочка повтора)
+    started_at = Column(DateTime, nullable=True)
+    locked_until = Column(DateTime, nullable=True)  # аренда воркера; просроченная - задача возвращается в очередь
+    last_error = Column(Text, nullable=True)
+
+    __table_args__ = (
+        # Выбор следующей задачи: WHERE status = 'queued' AND run_at <= now ORDER BY priority DESC, run_at
+        Index('ix_jobs_claim', 'status', 'priority', 'run_at'),
+    )
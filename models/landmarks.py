@@ -1,8 +1,10 @@
-from sqlalchemy import Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, Float, Boolean, DateTime, ForeignKey, Index, event, false
 from sqlalchemy.orm import relationship
 from config.database import Base
+from models.timestamps import Timestamps, SoftDelete
+from services.geohash import encode_optional
 
-class Landmark(Base):
+class Landmark(Timestamps, SoftDelete, Base):
     __tablename__ = 'landmarks'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
@@ -11,8 +13,57 @@ class Landmark(Base):
     location = Column(String(100), nullable=True)
     country = Column(String(50), nullable=True)
     image_url = Column(String(100), nullable=True)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+
+    # Координаты (WGS84) и geohash от них: индекс по geohash служит пространственным индексом
+    # (см. services/geohash.py), заполняется автоматически при сохранении
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    geohash = Column(String(12), nullable=True, index=True)
+
+    # Агрегаты оценок: обновляются инкрементально при записи в ratings
+    # (см. services/ratingAggregates.py), чтение не трогает таблицу ratings
+    rating_count = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_sum = Column(Integer, nullable=False, default=0, server_default='0')
+    # Двойная точность: avg_rating - ключ курсора пагинации, а FLOAT MySQL (4 байта) возвращает
+    # округлённое значение, и сравнение с ним на границе страницы повторяет или пропускает строки
+    avg_rating = Column(Float(precision=53), nullable=False, default=0, server_default='0')
+    # Гистограмма по звёздам
+    rating_1 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_2 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_3 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_4 = Column(Integer, nullable=False, default=0, server_default='0')
+    rating_5 = Column(Integer, nullable=False, default=0, server_default='0')
+    # Оценки менялись после последнего пересчёта похожих (services/similarity.py):
+    # ставится тем же UPDATE, что сдвигает агрегаты, и снимается фоновой задачей
+    similarity_dirty = Column(Boolean, nullable=False, default=False, server_default=false())
+    # Популярность с затуханием (services/trending.py): сумма весов оценок и фото, приведённых
+    # к точке отсчёта отрезка, в который попадает trending_at - время последнего изменения счёта (по нему
+    # процессы подтягивают чужие изменения). Точка отсчёта сдвигается каждые 32 периода полураспада,
+    # поэтому счёт не больше w * 2^32
+    trending_score = Column(Float(precision=53), nullable=False, default=0, server_default='0')
+    trending_at = Column(DateTime, nullable=True)
     
     user = relationship('User', back_populates='landmarks')
-    photos = relationship('Photo', back_populates='landmark', cascade='all, delete-orphan')
-    ratings = relationship('Rating', back_populates='landmark', cascade='all, delete-orphan')  # Добавьте эту строку
+    # Фото и оценки удаляет база (ON DELETE CASCADE), ORM их для удаления не загружает
+    photos = relationship('Photo', back_populates='landmark', cascade='all, delete-orphan', passive_deletes=True)
+    ratings = relationship('Rating', back_populates='landmark', cascade='all, delete-orphan', passive_deletes=True)
+
+    __table_args__ = (
+        # Для фильтра по стране и "лучшие по стране" (сортировка по рейтингу внутри страны)
+        Index('ix_landmarks_country_avg_rating', 'country', 'avg_rating'),
+        Index('ix_landmarks_avg_rating', 'avg_rating'),
+        Index('ix_landmarks_similarity_dirty', 'similarity_dirty'),
+        Index('ix_landmarks_trending_at', 'trending_at'),
+        # Индексы в памяти других процессов подтягивают изменённые строки (services/memoryIndex.py)
+        Index('ix_landmarks_updated_at', 'updated_at'),
+        # Полнотекстовый индекс по name/description/location зависит от диалекта
+        # и создаётся только миграцией 0004
+    )
+
+
+# geohash всегда соответствует координатам (пакетные INSERT/UPDATE через Core заполняют его сами)
+@event.listens_for(Landmark, 'before_insert')
+@event.listens_for(Landmark, 'before_update')
+def _set_geohash(mapper, connection, target):
+    target.geohash = encode_optional(target.latitude, target.longitude)
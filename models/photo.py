@@ -1,14 +1,24 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from config.database import Base
+from models.timestamps import Timestamps
 
-class Photo(Base):
+class Photo(Timestamps, Base):
     __tablename__ = 'photos'
 
     id = Column(Integer, primary_key=True, index=True)
     image_url = Column(String(200), nullable=False)  # Добавлено поле image_url
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    landmark_id = Column(Integer, ForeignKey('landmarks.id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    landmark_id = Column(Integer, ForeignKey('landmarks.id', ondelete='CASCADE'), nullable=False, index=True)
+    # Загруженный файл в хранилище (services/blobStore.py); у фото по внешней ссылке - NULL
+    blob_key = Column(String(80), nullable=True)
+    content_type = Column(String(50), nullable=True)
+    size_bytes = Column(Integer, nullable=True)
 
     user = relationship('User', back_populates='photos')
     landmark = relationship('Landmark', back_populates='photos')
+
+    __table_args__ = (
+        # Пересчёт популярности по недавним событиям (services/trending.py)
+        Index('ix_photos_created_at', 'created_at'),
+    )
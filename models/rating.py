@@ -1,18 +1,57 @@
-from sqlalchemy import Column, Integer, ForeignKey, CheckConstraint
+from sqlalchemy import Column, Integer, ForeignKey, CheckConstraint, Index, event
 from sqlalchemy.orm import relationship
+from sqlalchemy.orm.attributes import get_history
 from config.database import Base
+from models.timestamps import Timestamps
+from services.ratingAggregates import rating_delta_statement
 
-class Rating(Base):
+class Rating(Timestamps, Base):
     __tablename__ = 'ratings'
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     rating = Column(Integer, nullable=False)
-    user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
-    landmark_id = Column(Integer, ForeignKey('landmarks.id'), nullable=False)
-    
+    user_id = Column(Integer, ForeignKey('users.id', ondelete='CASCADE'), nullable=False, index=True)
+    landmark_id = Column(Integer, ForeignKey('landmarks.id', ondelete='CASCADE'), nullable=False)
+
     user = relationship('User', back_populates='ratings')
     landmark = relationship('Landmark', back_populates='ratings')  # Обратная связь с Landmark
-    
+
     __table_args__ = (
         CheckConstraint('rating >= 1 AND rating <= 5', name='check_rating_range'),
+        # Одна оценка от пользователя на достопримечательность; заодно индекс для поиска по landmark_id
+        Index('ux_ratings_landmark_user', 'landmark_id', 'user_id', unique=True),
+        # Пересчёт популярности по недавним событиям (services/trending.py)
+        Index('ix_ratings_created_at', 'created_at'),
     )
+
+
+# Возвращает значение атрибута до изменения в текущем flush
+def _previous_value(target, key):
+    history = get_history(target, key)
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(target, key)
+
+
+# Инкрементальное обновление агрегатов Landmark в той же транзакции, что и запись оценки
+@event.listens_for(Rating, 'after_insert')
+def _rating_inserted(mapper, connection, target):
+    connection.execute(rating_delta_statement(target.landmark_id, new=target.rating))
+
+
+@event.listens_for(Rating, 'after_update')
+def _rating_updated(mapper, connection, target):
+    old_rating = _previous_value(target, 'rating')
+    old_landmark_id = _previous_value(target, 'landmark_id')
+
+    if old_landmark_id != target.landmark_id:
+        # Оценка перенесена на другую достопримечательность
+        connection.execute(rating_delta_statement(old_landmark_id, old=old_rating))
+        connection.execute(rating_delta_statement(target.landmark_id, new=target.rating))
+    elif old_rating != target.rating:
+        connection.execute(rating_delta_statement(target.landmark_id, old=old_rating, new=target.rating))
+
+
+@event.listens_for(Rating, 'after_delete')
+def _rating_deleted(mapper, connection, target):
+    connection.execute(rating_delta_statement(target.landmark_id, old=_previous_value(target, 'rating')))
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, Float, ForeignKey, Index
+from config.database import Base
+
+# Ближайшие соседи достопримечательности по оценкам пользователей (services/similarity.py):
+# не больше SIMILARITY_TOP_K строк на landmark_id. Таблица - готовый результат модели,
+# запросы /similar и /recommendations только читают её по индексу.
+class LandmarkSimilarity(Base):
+    __tablename__ = 'landmark_similarities'
+
+    landmark_id = Column(Integer, ForeignKey('landmarks.id', ondelete='CASCADE'), primary_key=True)
+    similar_id = Column(Integer, ForeignKey('landmarks.id', ondelete='CASCADE'), primary_key=True)
+    score = Column(Float, nullable=False)  # косинусная близость со штрафом за малое число общих оценок
+    common = Column(Integer, nullable=False)  # пользователей, оценивших обе
+
+    __table_args__ = (
+        # Соседи по убыванию близости
+        Index('ix_landmark_similarities_landmark_score', 'landmark_id', 'score'),
+        # Обратные ссылки: чьи списки содержат достопримечательность (инкрементальное обновление)
+        Index('ix_landmark_similarities_similar', 'similar_id'),
+    )
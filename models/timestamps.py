@@ -0,0 +1,22 @@
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime
+
+
+# Текущее время в UTC без часового пояса (как во всех колонках DateTime базы)
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Время создания и последнего изменения записи пользователем.
+# updated_at ставится явно там, где пользователь меняет запись (CRUDController.update,
+# services/bulk.update_rows, upsert оценки), а не через onupdate: служебные UPDATE
+# (агрегаты оценок, флаги пересчёта, счёт популярности) его не сдвигают.
+class Timestamps:
+    created_at = Column(DateTime, nullable=False, default=utcnow)
+    updated_at = Column(DateTime, nullable=False, default=utcnow)
+
+
+# Мягкое удаление (SOFT_DELETE=1, services/deletion.py): строка с deleted_at скрыта из запросов
+# обработчиков сразу, а удаляется вместе с зависимыми строками фоновой очисткой пачками
+class SoftDelete:
+    deleted_at = Column(DateTime, nullable=True, index=True)
@@ -1,29 +1,28 @@
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import relationship
 from config.database import Base
-from passlib.context import CryptContext
+from models.timestamps import SoftDelete
+from services.passwords import password_context  # Общий контекст хеширования (одна стоимость bcrypt)
 
-# Инициализация контекста для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
-class User(Base):
+class User(SoftDelete, Base):
     __tablename__ = 'users'
 
     # Поля таблицы пользователя
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    username = Column(String(30), nullable=False)  # Имя пользователя
+    username = Column(String(30), nullable=False, index=True)  # Имя пользователя
     email = Column(String(100), nullable=False, unique=True)  # Уникальный email
     password = Column(String(255), nullable=False)  # Пароль пользователя
 
-    # Связи с другими таблицами
-    photos = relationship('Photo', back_populates='user', cascade='all, delete-orphan')
-    ratings = relationship('Rating', back_populates='user', cascade='all, delete-orphan')
-    landmarks = relationship('Landmark', back_populates='user', cascade='all, delete-orphan')
+    # Связи с другими таблицами. Зависимые строки удаляет сама база (ON DELETE CASCADE):
+    # passive_deletes - при удалении пользователя ORM не загружает их и не удаляет по одной
+    photos = relationship('Photo', back_populates='user', cascade='all, delete-orphan', passive_deletes=True)
+    ratings = relationship('Rating', back_populates='user', cascade='all, delete-orphan', passive_deletes=True)
+    landmarks = relationship('Landmark', back_populates='user', cascade='all, delete-orphan', passive_deletes=True)
 
     # Метод для хеширования пароля
     def set_password(self, password: str):
-        self.password = pwd_context.hash(password)
+        self.password = password_context().hash(password)
     
     # Метод для проверки пароля
     def verify_password(self, password: str) -> bool:
-        return pwd_context.verify(password, self.password)
+        return password_context().verify(password, self.password)
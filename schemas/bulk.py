@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Any, List
+
+
+# Ошибка по одному элементу пакета (index - позиция во входном массиве/потоке)
+class BulkError(BaseModel):
+    index: int
+    status_code: int
+    detail: Any
+
+
+# Результат пакетной операции
+class BulkResponse(BaseModel):
+    processed: int
+    failed: int
+    ids: List[int]  # id созданных строк (если диалект поддерживает RETURNING)
+    errors: List[BulkError]
@@ -1,4 +1,9 @@
-from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from schemas.photo import PhotoEmbed
+from schemas.rating import RatingSummary
+from schemas.user import UserPublic
 
 # Схема для создания достопримечательности
 class LandmarkCreate(BaseModel):
@@ -7,12 +12,111 @@ class LandmarkCreate(BaseModel):
     location: str
     country: str
     image_url: str
+    latitude: Optional[float] = Field(None, ge=-90, le=90)
+    longitude: Optional[float] = Field(None, ge=-180, le=180)
+
+    # Координаты задаются только парой
+    @model_validator(mode="after")
+    def check_coordinates(self):
+        if (self.latitude is None) != (self.longitude is None):
+            raise ValueError("latitude and longitude must be set together")
+        return self
 
 
 # Схема для вывода достопримечательности
 class LandmarkBase(LandmarkCreate):
     id: int  # ID записи в базе данных
+    avg_rating: float = 0  # Средняя оценка (хранится в landmarks)
+    rating_count: int = 0  # Количество оценок
+    created_at: Optional[datetime] = None  # UTC
+    updated_at: Optional[datetime] = None  # UTC, последнее изменение владельцем
 
     model_config = {
         "from_attributes": True
     }
+
+
+# Элемент пакетного обновления
+class LandmarkUpdateItem(LandmarkCreate):
+    id: int
+
+
+# Достопримечательность со вложенными данными по ?include=photos,rating_summary,owner.
+# Незапрошенные части в ответ не попадают.
+class LandmarkDetail(LandmarkBase):
+    photos: Optional[List[PhotoEmbed]] = None
+    rating_summary: Optional[RatingSummary] = None
+    owner: Optional[UserPublic] = None
+
+
+# Результат полнотекстового поиска
+class LandmarkSearchHit(BaseModel):
+    id: int
+    name: str
+    location: str
+    country: str
+    score: float  # Релевантность, чем больше - тем выше в выдаче
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+# Достопримечательность рядом с точкой
+class LandmarkNearby(BaseModel):
+    id: int
+    name: str
+    location: str
+    country: str
+    latitude: float
+    longitude: float
+    distance_km: Optional[float] = None  # Только для поиска ближайших
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+# Кластер точек на карте: ячейка geohash, число точек и их центр
+class GeoCluster(BaseModel):
+    cell: str
+    count: int
+    latitude: float
+    longitude: float
+    landmark_id: Optional[int] = None  # Если в кластере одна точка
+
+
+# Похожая достопримечательность (по оценкам пользователей)
+class SimilarLandmark(BaseModel):
+    id: int
+    name: str
+    location: str
+    country: str
+    image_url: str
+    avg_rating: float
+    rating_count: int
+    score: float  # Близость 0..1
+    common: int  # Пользователей, оценивших обе
+
+
+# Рекомендация пользователю
+class LandmarkRecommendation(BaseModel):
+    id: int
+    name: str
+    location: str
+    country: str
+    image_url: str
+    avg_rating: float
+    rating_count: int
+    score: float  # Вес рекомендации, чем больше - тем выше в выдаче
+    predicted_rating: float  # Ожидаемая оценка пользователя
+
+
+
+# Популярная достопримечательность: счёт затухает вдвое за TRENDING_HALF_LIFE_HOURS
+class TrendingLandmark(BaseModel):
+    id: int
+    name: str
+    location: Optional[str] = None
+    country: Optional[str] = None
+    trending_score: float
@@ -1,3 +1,4 @@
+from typing import Dict
 from pydantic import BaseModel
 
 class PhotoCreate(BaseModel):
@@ -12,3 +13,30 @@ class PhotoBase():
     model_config = {
         "from_attributes": True  
     }
+
+
+# Элемент пакетного обновления
+class PhotoUpdateItem(PhotoCreate):
+    id: int
+
+
+# Фотография внутри ответа о достопримечательности (?include=photos)
+class PhotoEmbed(BaseModel):
+    id: int
+    user_id: int
+    image_url: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+
+# Ответ на загрузку файла: ссылки на оригинал и миниатюры (размер -> URL)
+class PhotoUploaded(BaseModel):
+    id: int
+    user_id: int
+    landmark_id: int
+    image_url: str
+    content_type: str
+    size_bytes: int
+    thumbnails: Dict[int, str]
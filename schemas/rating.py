@@ -1,10 +1,43 @@
-from pydantic import BaseModel
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Dict, Optional
 
 class RatingBase(BaseModel):
     rating: int
     user_id: int
     landmark_id: int
+    created_at: Optional[datetime] = None  # UTC
+    updated_at: Optional[datetime] = None  # UTC
 
     model_config = {
         "from_attributes": True
     }
+
+
+# Сводка оценок достопримечательности (из хранимых агрегатов)
+class RatingSummary(BaseModel):
+    landmark_id: int
+    rating_count: int
+    avg_rating: float
+    histogram: Dict[int, int]  # количество оценок по звёздам 1..5
+
+
+# Схема для создания оценки
+class RatingCreate(BaseModel):
+    landmark_id: int
+    rating: int = Field(ge=1, le=5)
+
+
+# Элемент пакетного обновления
+class RatingUpdateItem(BaseModel):
+    id: int
+    rating: int = Field(ge=1, le=5)
+
+
+# Результат записи оценки (POST /ratings/, PUT /ratings/{id})
+class RatingWritten(BaseModel):
+    id: int
+    rating: int
+    user_id: int
+    landmark_id: int
+    created: bool  # False - изменена существующая оценка пользователя
@@ -6,4 +6,22 @@ class UserBase(BaseModel):
 
     model_config = {
         "from_attributes": True
-    }
\ No newline at end of file
+    }
+
+# Проверенный пользователь из токена (то, что отдаёт get_current_user)
+class CurrentUser(BaseModel):
+    id: int
+    username: str
+
+    model_config = {
+        "from_attributes": True
+    }
+
+# Владелец внутри ответа о достопримечательности (без email)
+class UserPublic(BaseModel):
+    id: int
+    username: str
+
+    model_config = {
+        "from_attributes": True
+    }
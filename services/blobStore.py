@@ -0,0 +1,194 @@
+import hashlib
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+from starlette.concurrency import run_in_threadpool
+
+BLOB_BACKEND = os.getenv("BLOB_BACKEND", "filesystem")
+BLOB_ROOT = os.getenv("BLOB_ROOT", "media")
+S3_BUCKET = os.getenv("S3_BUCKET", "landmarks")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL")  # MinIO, LocalStack и т.п.; пусто - AWS
+S3_PRESIGN_TTL = int(os.getenv("S3_PRESIGN_TTL", 3600))
+
+# Объекты неизменяемы, поэтому клиенты и CDN могут держать их в кэше без перепроверки
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Сколько байт копить в памяти перед записью в файл
+WRITE_BUFFER_SIZE = 1 << 20
+
+
+# Хранилище файлов с адресацией по содержимому: ключ - sha256 содержимого плюс расширение,
+# поэтому одинаковые файлы хранятся один раз, а объект по ключу никогда не меняется.
+# Методы повторяют операции S3 (head_object, upload_file, download_file, presigned URL),
+# чтобы файловое хранилище и любой S3-совместимый сервер были взаимозаменяемы.
+class BlobStore:
+    async def head_object(self, key: str) -> Optional[int]:
+        raise NotImplementedError
+
+    # Переносит готовый файл path в хранилище под ключом key; path после вызова не существует
+    async def upload_file(self, path: str, key: str, content_type: str) -> None:
+        raise NotImplementedError
+
+    # Локальный файл с содержимым объекта на время блока (для обработки, например миниатюр)
+    def local_copy(self, key: str):
+        raise NotImplementedError
+
+    # Путь для отдачи файла напрямую с диска (sendfile); None - хранилище не локальное
+    def local_path(self, key: str) -> Optional[str]:
+        return None
+
+    def presigned_url(self, key: str) -> str:
+        raise NotImplementedError
+
+    # Каталог для временных файлов загрузки: на том же диске, чтобы перенос был os.replace
+    def temp_dir(self) -> str:
+        return tempfile.gettempdir()
+
+
+# Файлы в каталоге BLOB_ROOT, разложенные по подкаталогам ab/cd/ по началу хеша
+class FilesystemBlobStore(BlobStore):
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self._tmp = os.path.join(self.root, "tmp")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    async def head_object(self, key: str) -> Optional[int]:
+        try:
+            return (await run_in_threadpool(os.stat, self._path(key))).st_size
+        except FileNotFoundError:
+            return None
+
+    async def upload_file(self, path: str, key: str, content_type: str) -> None:
+        def move():
+            target = self._path(key)
+            if os.path.exists(target):
+                # Такой файл уже есть: содержимое то же самое
+                os.unlink(path)
+                return
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(path, target)
+
+        await run_in_threadpool(move)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        yield self._path(key)
+
+    def local_path(self, key: str) -> Optional[str]:
+        path = self._path(key)
+        return path if os.path.isfile(path) else None
+
+    def temp_dir(self) -> str:
+        os.makedirs(self._tmp, exist_ok=True)
+        return self._tmp
+
+
+# S3 или совместимый сервер (MinIO, Ceph, LocalStack). Нужен пакет boto3;
+# клиент создаётся только если выбран этот backend. Учётные данные - стандартные AWS_*.
+class S3BlobStore(BlobStore):
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+
+    async def head_object(self, key: str) -> Optional[int]:
+        from botocore.exceptions import ClientError
+
+        try:
+            head = await run_in_threadpool(self.client.head_object, Bucket=self.bucket, Key=key)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return head["ContentLength"]
+
+    async def upload_file(self, path: str, key: str, content_type: str) -> None:
+        try:
+            if await self.head_object(key) is None:
+                await run_in_threadpool(
+                    self.client.upload_file, path, self.bucket, key,
+                    ExtraArgs={"ContentType": content_type, "CacheControl": IMMUTABLE_CACHE_CONTROL},
+                )
+        finally:
+            os.unlink(path)
+
+    @asynccontextmanager
+    async def local_copy(self, key: str) -> AsyncIterator[str]:
+        handle, path = tempfile.mkstemp(prefix="blob-")
+        os.close(handle)
+        try:
+            await run_in_threadpool(self.client.download_file, self.bucket, key, path)
+            yield path
+        finally:
+            os.unlink(path)
+
+    def presigned_url(self, key: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=S3_PRESIGN_TTL,
+        )
+
+
+# Потоковая запись во временный файл с подсчётом sha256 и размера.
+# Данные копятся в буфере и сбрасываются на диск в пуле потоков, не блокируя цикл событий.
+class BlobWriter:
+    def __init__(self, store: BlobStore, max_size: int):
+        self.store = store
+        self.max_size = max_size
+        self.size = 0
+        self.head = b""
+        self._hash = hashlib.sha256()
+        self._buffer = bytearray()
+        handle, self.path = tempfile.mkstemp(prefix="upload-", dir=store.temp_dir())
+        self._file = os.fdopen(handle, "wb")
+
+    @property
+    def too_large(self) -> bool:
+        return self.size > self.max_size
+
+    # Вызывается синхронно из парсера; на диск пишет flush()
+    def feed(self, data: bytes) -> None:
+        if len(self.head) < 16:
+            self.head += data[:16 - len(self.head)]
+        self.size += len(data)
+        if not self.too_large:
+            self._buffer += data
+
+    def _write(self, data: bytes) -> None:
+        self._hash.update(data)
+        self._file.write(data)
+
+    async def flush(self, force: bool = False) -> None:
+        if self._buffer and (force or len(self._buffer) >= WRITE_BUFFER_SIZE):
+            data, self._buffer = bytes(self._buffer), bytearray()
+            await run_in_threadpool(self._write, data)
+
+    # Дописывает остаток, закрывает файл и переносит его в хранилище под ключом хеша
+    async def commit(self, extension: str, content_type: str) -> str:
+        await self.flush(force=True)
+        await run_in_threadpool(self._file.close)
+        key = f"{self._hash.hexdigest()}.{extension}"
+        await self.store.upload_file(self.path, key, content_type)
+        return key
+
+    async def discard(self) -> None:
+        def remove():
+            self._file.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+        await run_in_threadpool(remove)
+
+
+def create_blob_store() -> BlobStore:
+    if BLOB_BACKEND == "s3":
+        return S3BlobStore(S3_BUCKET, endpoint_url=S3_ENDPOINT_URL)
+    return FilesystemBlobStore(BLOB_ROOT)
+
+
+blob_store = create_blob_store()
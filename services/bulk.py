@@ -0,0 +1,206 @@
+import importlib
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List, Sequence, Tuple
+from fastapi import HTTPException, Query, Request
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import insert, update, select, bindparam, text
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.timestamps import utcnow
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", 1000))
+MAX_BULK_CHUNK_SIZE = 10000
+
+# Типы содержимого, которые читаются построчно как NDJSON
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+
+# Размер пачки для одного многострочного INSERT/UPDATE
+def chunk_size_param(chunk_size: int = Query(BULK_CHUNK_SIZE, ge=1, le=MAX_BULK_CHUNK_SIZE)) -> int:
+    return chunk_size
+
+
+# Итог пакетной операции с ошибками по каждому элементу (index - позиция во входных данных)
+class BulkResult:
+    def __init__(self):
+        self.processed = 0
+        self.ids: List[int] = []
+        self.errors: List[Dict[str, Any]] = []
+
+    def fail(self, index: int, status_code: int, detail: Any) -> None:
+        self.errors.append({"index": index, "status_code": status_code, "detail": detail})
+
+    def as_dict(self) -> dict:
+        return {"processed": self.processed, "failed": len(self.errors), "ids": self.ids, "errors": self.errors}
+
+
+# Описание тела запроса для OpenAPI (тело читается вручную, чтобы поддержать NDJSON)
+def bulk_openapi(schema) -> dict:
+    item_schema = TypeAdapter(schema).json_schema()
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {
+                "application/json": {"schema": {"type": "array", "items": item_schema}},
+                "application/x-ndjson": {"schema": item_schema},
+            },
+        }
+    }
+
+
+# Сырые элементы тела: JSON-массив целиком или NDJSON по мере поступления строк
+async def _iter_raw(request: Request) -> AsyncIterator[Tuple[int, Any, bool]]:
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if content_type in NDJSON_CONTENT_TYPES:
+        index = 0
+        buffer = b""
+        async for part in request.stream():
+            buffer += part
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield index, line, True
+                    index += 1
+        if buffer.strip():
+            yield index, buffer, True
+        return
+
+    try:
+        data = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    if not isinstance(data, list):
+        raise HTTPException(status_code=400, detail="Body must be a JSON array or NDJSON")
+    for index, value in enumerate(data):
+        yield index, value, False
+
+
+# Разбивает тело на пачки валидных элементов; невалидные сразу попадают в result.errors
+async def iter_chunks(request: Request, schema, chunk_size: int, result: BulkResult) -> AsyncIterator[List[Tuple[int, Any]]]:
+    adapter = TypeAdapter(schema)
+    chunk = []
+    async for index, raw, is_line in _iter_raw(request):
+        try:
+            item = adapter.validate_json(raw) if is_line else adapter.validate_python(raw)
+        except ValidationError as e:
+            result.fail(index, 422, e.errors(include_url=False, include_context=False))
+            continue
+        chunk.append((index, item))
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Многострочный INSERT одной командой, возвращает id строк в порядке rows.
+# С RETURNING для executemany (SQLite, PostgreSQL) id приходят из базы. Без него (MySQL) - один
+# многострочный INSERT: его строки получают id подряд с шагом auto_increment_increment, начиная
+# с lastrowid (InnoDB выделяет их одним блоком при любом innodb_autoinc_lock_mode).
+async def insert_rows(db: AsyncSession, model, rows: Sequence[dict]) -> List[int]:
+    if not rows:
+        return []
+    dialect = db.get_bind().dialect
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = await db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), list(rows))
+        return list(result.scalars().all())
+    result = await db.execute(insert(model).values(list(rows)))
+    step = (await db.execute(text("SELECT @@auto_increment_increment"))).scalar()
+    first = result.lastrowid
+    return list(range(first, first + len(rows) * step, step))
+
+
+# INSERT строк, которых ещё нет по уникальному ключу unique: строка, которую между проверкой
+# и вставкой записал параллельный запрос, пропускается, а не роняет всю пачку.
+# Возвращает {значения unique: id} только для вставленных строк.
+# PostgreSQL и SQLite - ON CONFLICT DO NOTHING с RETURNING. MySQL - многострочный INSERT, а при
+# дубликате - повтор по одной строке: упавшая команда откатывается одна, транзакция продолжается.
+async def insert_new_rows(db: AsyncSession, model, rows: Sequence[dict], unique: Sequence[str]) -> Dict[tuple, int]:
+    if not rows:
+        return {}
+    key_of = lambda row: tuple(row[name] for name in unique)
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name in ("postgresql", "sqlite"):
+        columns = [model.__table__.c[name] for name in unique]
+        statement = (
+            importlib.import_module(f"sqlalchemy.dialects.{dialect_name}").insert(model)
+            .on_conflict_do_nothing(index_elements=columns)
+            .returning(model.id, *columns)
+        )
+        result = await db.execute(statement, list(rows))
+        return {tuple(key): row_id for row_id, *key in result.all()}
+
+    try:
+        return dict(zip(map(key_of, rows), await insert_rows(db, model, rows)))
+    except IntegrityError:
+        pass
+    inserted = {}
+    for row in rows:
+        try:
+            inserted[key_of(row)] = (await insert_rows(db, model, [row]))[0]
+        except IntegrityError:
+            continue
+    return inserted
+
+
+# UPDATE по id для многих строк одной командой (executemany).
+# В rows у каждого словаря есть "id" и одинаковый набор изменяемых колонок.
+# updated_at (если есть у таблицы и не передан) ставится текущим временем.
+async def update_rows(db: AsyncSession, model, rows: Sequence[dict]) -> None:
+    if not rows:
+        return
+    if "updated_at" in model.__table__.c and "updated_at" not in rows[0]:
+        now = utcnow()
+        rows = [{**row, "updated_at": now} for row in rows]
+    columns = [name for name in rows[0] if name != "id"]
+    statement = (
+        update(model.__table__)
+        .where(model.__table__.c.id == bindparam("_id"))
+        .values({name: bindparam(f"_{name}") for name in columns})
+    )
+    params = [{f"_{name}": value for name, value in row.items()} for row in rows]
+    await db.execute(statement, params)
+
+
+# Общий каркас пакетного эндпоинта: читает тело пачками, для каждой вызывает
+# handle_chunk(chunk, result) и фиксирует всё одной транзакцией.
+async def run_bulk(request: Request, db: AsyncSession, schema, chunk_size: int, handle_chunk) -> BulkResult:
+    result = BulkResult()
+    try:
+        async for chunk in iter_chunks(request, schema, chunk_size, result):
+            await handle_chunk(chunk, result)
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    result.errors.sort(key=lambda error: error["index"])
+    return result
+
+
+# Проверка владельца для пачки id одним запросом.
+# Возвращает id, которые можно менять; для остальных пишет 404/403 в result.
+async def owned_ids(db: AsyncSession, model, chunk: Sequence[Tuple[int, Any]], get_id, user_id: int, result: BulkResult) -> set:
+    ids = {get_id(item) for _, item in chunk}
+    rows = await db.execute(select(model.id, model.user_id).where(model.id.in_(ids)))
+    owners = dict(rows.all())
+
+    allowed = set()
+    for index, item in chunk:
+        item_id = get_id(item)
+        if item_id not in owners:
+            result.fail(index, 404, f"{model.__name__} {item_id} not found")
+        elif owners[item_id] != user_id:
+            result.fail(index, 403, f"You are not authorized to modify {model.__name__.lower()} {item_id}")
+        else:
+            allowed.add(item_id)
+    return allowed
+
+
+# Какие из landmark_id существуют (один запрос на пачку)
+async def existing_ids(db: AsyncSession, model, ids) -> set:
+    if not ids:
+        return set()
+    rows = await db.execute(select(model.id).where(model.id.in_(set(ids))))
+    return set(rows.scalars().all())
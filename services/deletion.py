@@ -0,0 +1,292 @@
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import select, update, delete, event, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, with_loader_criteria
+from config.database import AsyncSessionLocal
+from models.user import User
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from models.similarity import LandmarkSimilarity
+from models.timestamps import utcnow
+from services.jobs import enqueue
+from services.ratingAggregates import AggregateDelta
+from services.similarity import schedule_refresh
+
+logger = logging.getLogger(__name__)
+
+# 1 - пользователи и достопримечательности удаляются мягко: отметка deleted_at скрывает их
+# (и всё, что к ним относится) из запросов сразу, строки удаляет фоновая очистка пачками.
+# 0 - один DELETE, зависимые строки удаляет база (ON DELETE CASCADE) в той же транзакции.
+# Перед выключением дождитесь конца очистки (или python -m config.purge): иначе отмеченное снова видно.
+SOFT_DELETE = os.getenv("SOFT_DELETE", "0") == "1"
+# Строк в одной транзакции очистки: столько держится блокировок за раз
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", 500))
+# Пауза между пачками, секунды: пропускает запросы, ждущие тех же строк
+PURGE_PAUSE = float(os.getenv("PURGE_PAUSE", 0.01))
+# Сколько работает одна задача очистки (меньше JOB_TIMEOUT); остаток продолжит следующая
+PURGE_JOB_SECONDS = float(os.getenv("PURGE_JOB_SECONDS", 60))
+
+_users = User.__table__
+_landmarks = Landmark.__table__
+
+
+# Подзапросы по таблицам (Core): критерии видимости к ним не применяются
+def _deleted_users():
+    return select(_users.c.id).where(_users.c.deleted_at.is_not(None))
+
+
+# Две части по своим индексам (deleted_at и user_id): с OR база проходила бы всю таблицу landmarks
+def _hidden_landmarks():
+    return union_all(
+        select(_landmarks.c.id).where(_landmarks.c.deleted_at.is_not(None)),
+        select(_landmarks.c.id).where(_landmarks.c.user_id.in_(_deleted_users())),
+    )
+
+
+# Достопримечательности, скрытые начиная с since (своей отметкой или отметкой владельца):
+# индексы в памяти других процессов убирают их при синхронизации
+def hidden_landmarks_since(since):
+    return union_all(
+        select(_landmarks.c.id).where(_landmarks.c.deleted_at >= since),
+        select(_landmarks.c.id).where(_landmarks.c.user_id.in_(select(_users.c.id).where(_users.c.deleted_at >= since))),
+    )
+
+
+# Отмеченные строки и всё, что от них зависит (достопримечательности удалённого пользователя,
+# фото и оценки удалённых достопримечательностей), не видны ORM-запросам. Отмеченных немного,
+# поэтому NOT IN по индексу deleted_at дешевле, чем проставлять отметку всем зависимым строкам.
+VISIBILITY_CRITERIA = (
+    with_loader_criteria(User, lambda cls: cls.deleted_at.is_(None), include_aliases=True),
+    with_loader_criteria(
+        Landmark, lambda cls: cls.deleted_at.is_(None) & cls.user_id.not_in(_deleted_users()), include_aliases=True
+    ),
+    with_loader_criteria(
+        Photo, lambda cls: cls.user_id.not_in(_deleted_users()) & cls.landmark_id.not_in(_hidden_landmarks()), include_aliases=True
+    ),
+    with_loader_criteria(
+        Rating, lambda cls: cls.user_id.not_in(_deleted_users()) & cls.landmark_id.not_in(_hidden_landmarks()), include_aliases=True
+    ),
+)
+
+
+# Те же условия для запросов, к которым критерии ORM не применяются (Core на соединении engine,
+# например python -m config.export). Без SOFT_DELETE отмеченных строк нет - условий нет.
+def visibility_conditions(model) -> list:
+    if not SOFT_DELETE:
+        return []
+    if model is User:
+        return [User.deleted_at.is_(None)]
+    if model is Landmark:
+        return [Landmark.deleted_at.is_(None), Landmark.user_id.not_in(_deleted_users())]
+    return [model.user_id.not_in(_deleted_users()), model.landmark_id.not_in(_hidden_landmarks())]
+
+
+# Критерии добавляются ко всем SELECT через ORM (обработчики, индексы в памяти, общие чтения
+# CRUDController), кроме подгрузки колонок уже загруженных объектов. Очистке и проверкам
+# уникальности отмеченные строки нужны: include_deleted в execution_options или в info сессии.
+def _hide_deleted(orm_execute_state) -> None:
+    if (
+        orm_execute_state.is_select
+        and not orm_execute_state.is_column_load
+        and not orm_execute_state.execution_options.get("include_deleted", False)
+        and not orm_execute_state.session.info.get("include_deleted", False)
+    ):
+        orm_execute_state.statement = orm_execute_state.statement.options(*VISIBILITY_CRITERIA)
+
+
+if SOFT_DELETE:
+    event.listen(Session, "do_orm_execute", _hide_deleted)
+
+
+def enqueue_purge(db: AsyncSession) -> None:
+    if not db.sync_session.info.get("purge_enqueued"):
+        db.sync_session.info["purge_enqueued"] = True
+        enqueue(db, "purge_deleted", {})
+
+
+# Вычитает оценки (landmark_id, rating) из агрегатов. Строки landmarks - по возрастанию id,
+# как и в других записях, затрагивающих несколько достопримечательностей.
+async def _subtract_ratings(db: AsyncSession, rows: Iterable[Tuple[int, int]]) -> None:
+    deltas: Dict[int, AggregateDelta] = defaultdict(AggregateDelta)
+    for landmark_id, value in rows:
+        deltas[landmark_id].add(old=value)
+    for landmark_id in sorted(deltas):
+        await db.execute(deltas[landmark_id].statement(landmark_id), execution_options={"synchronize_session": False})
+    if deltas:
+        schedule_refresh(db)
+
+
+# Удаление достопримечательностей в транзакции db (commit - у вызывающего)
+async def delete_landmarks(db: AsyncSession, landmark_ids: Sequence[int]) -> None:
+    if not landmark_ids:
+        return
+    if SOFT_DELETE:
+        await db.execute(
+            update(Landmark).where(Landmark.id.in_(landmark_ids)).values(deleted_at=utcnow()),
+            execution_options={"synchronize_session": False},
+        )
+        enqueue_purge(db)
+    else:
+        await db.execute(delete(Landmark).where(Landmark.id.in_(landmark_ids)), execution_options={"synchronize_session": False})
+
+
+# Удаление пользователя вместе с его достопримечательностями, фото и оценками (commit - у вызывающего).
+# Возвращает id его достопримечательностей (для индексов в памяти). Его оценки чужих
+# достопримечательностей вычитаются из агрегатов: сразу при жёстком удалении, при очистке - при мягком.
+async def delete_user(db: AsyncSession, user_id: int) -> List[int]:
+    landmark_ids = list((await db.execute(select(Landmark.id).where(Landmark.user_id == user_id))).scalars().all())
+    if SOFT_DELETE:
+        await db.execute(
+            update(User).where(User.id == user_id).values(deleted_at=utcnow()),
+            execution_options={"synchronize_session": False},
+        )
+        enqueue_purge(db)
+        return landmark_ids
+
+    rated = await db.execute(
+        select(Rating.landmark_id, Rating.rating).where(
+            Rating.user_id == user_id,
+            Rating.landmark_id.not_in(select(_landmarks.c.id).where(_landmarks.c.user_id == user_id)),
+        )
+    )
+    await _subtract_ratings(db, rated.all())
+    await db.execute(delete(User).where(User.id == user_id), execution_options={"synchronize_session": False})
+    return landmark_ids
+
+
+def _purge_session() -> AsyncSession:
+    db = AsyncSessionLocal()
+    db.sync_session.info["include_deleted"] = True
+    return db
+
+
+# Пачка: до PURGE_BATCH_SIZE строк model по условию
+def _delete_ids(model, condition):
+    async def step(db: AsyncSession) -> int:
+        ids = (await db.execute(select(model.id).where(condition).limit(PURGE_BATCH_SIZE))).scalars().all()
+        if ids:
+            await db.execute(delete(model).where(model.id.in_(ids)), execution_options={"synchronize_session": False})
+        return len(ids)
+    return step
+
+
+# Пачка оценок пользователя: сначала сдвиг агрегатов (блокировки landmarks), затем удаление
+def _delete_user_ratings(user_id: int):
+    async def step(db: AsyncSession) -> int:
+        rows = (await db.execute(
+            select(Rating.id, Rating.landmark_id, Rating.rating).where(Rating.user_id == user_id).order_by(Rating.id).limit(PURGE_BATCH_SIZE)
+        )).all()
+        if rows:
+            await _subtract_ratings(db, [(row.landmark_id, row.rating) for row in rows])
+            await db.execute(delete(Rating).where(Rating.id.in_([row.id for row in rows])), execution_options={"synchronize_session": False})
+        return len(rows)
+    return step
+
+
+# Пачка чужих списков похожих, где есть достопримечательность (свой список - не больше SIMILARITY_TOP_K строк)
+def _delete_reverse_similarities(landmark_id: int):
+    async def step(db: AsyncSession) -> int:
+        owners = (await db.execute(
+            select(LandmarkSimilarity.landmark_id).where(LandmarkSimilarity.similar_id == landmark_id).limit(PURGE_BATCH_SIZE)
+        )).scalars().all()
+        if owners:
+            await db.execute(
+                delete(LandmarkSimilarity).where(LandmarkSimilarity.similar_id == landmark_id, LandmarkSimilarity.landmark_id.in_(owners)),
+                execution_options={"synchronize_session": False},
+            )
+        return len(owners)
+    return step
+
+
+# Очистка отмеченных строк пачками. Каждая пачка - своя короткая транзакция, которая начинается
+# с UPDATE строки-родителя самой на себя: очистка одного родителя в разных процессах идёт по очереди,
+# а SQLite сразу берёт блокировку записи. Последним удаляется сам родитель (каскад уже почти пуст).
+class Purge:
+    def __init__(self, seconds: float = PURGE_JOB_SECONDS):
+        self.deadline = time.monotonic() + seconds
+        self.rows = 0
+        self.batches = 0
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    async def _batches(self, claim, step) -> bool:
+        while not self.expired:
+            async with _purge_session() as db:
+                await db.execute(claim, execution_options={"synchronize_session": False})
+                deleted = await step(db)
+                await db.commit()
+            self.batches += 1
+            self.rows += deleted
+            if deleted < PURGE_BATCH_SIZE:
+                return True
+            await asyncio.sleep(PURGE_PAUSE)
+        return False
+
+    async def _finish(self, claim, statement) -> None:
+        async with _purge_session() as db:
+            await db.execute(claim, execution_options={"synchronize_session": False})
+            await db.execute(statement, execution_options={"synchronize_session": False})
+            await db.commit()
+        self.rows += 1
+
+    async def landmark(self, landmark_id: int) -> bool:
+        claim = update(Landmark).where(Landmark.id == landmark_id).values(deleted_at=Landmark.deleted_at)
+        for step in (
+            _delete_ids(Photo, Photo.landmark_id == landmark_id),
+            _delete_ids(Rating, Rating.landmark_id == landmark_id),
+            _delete_reverse_similarities(landmark_id),
+        ):
+            if not await self._batches(claim, step):
+                return False
+        await self._finish(claim, delete(Landmark).where(Landmark.id == landmark_id))
+        return True
+
+    async def user(self, user_id: int) -> bool:
+        async with _purge_session() as db:
+            landmark_ids = (await db.execute(select(Landmark.id).where(Landmark.user_id == user_id).order_by(Landmark.id))).scalars().all()
+        for landmark_id in landmark_ids:
+            if not await self.landmark(landmark_id):
+                return False
+
+        claim = update(User).where(User.id == user_id).values(deleted_at=User.deleted_at)
+        for step in (_delete_user_ratings(user_id), _delete_ids(Photo, Photo.user_id == user_id)):
+            if not await self._batches(claim, step):
+                return False
+        await self._finish(claim, delete(User).where(User.id == user_id))
+        return True
+
+    async def run(self) -> bool:
+        async with _purge_session() as db:
+            user_ids = (await db.execute(select(User.id).where(User.deleted_at.is_not(None)).order_by(User.id))).scalars().all()
+            landmark_ids = (await db.execute(
+                select(Landmark.id).where(Landmark.deleted_at.is_not(None)).order_by(Landmark.id)
+            )).scalars().all()
+        for user_id in user_ids:
+            if not await self.user(user_id):
+                return False
+        for landmark_id in landmark_ids:
+            if not await self.landmark(landmark_id):
+                return False
+        return True
+
+
+# Одна очистка за раз в процессе: задачи, поставленные несколькими удалениями, не толкаются на одних строках
+_purge_lock = asyncio.Lock()
+
+
+async def purge_deleted(seconds: float = PURGE_JOB_SECONDS) -> dict:
+    async with _purge_lock:
+        started = time.perf_counter()
+        purge = Purge(seconds)
+        done = await purge.run()
+        result = {"done": done, "rows": purge.rows, "batches": purge.batches, "seconds": round(time.perf_counter() - started, 3)}
+        logger.info("Purge of deleted rows: %s", result)
+        return result
@@ -0,0 +1,56 @@
+from typing import Optional, Set
+from fastapi import HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, selectinload, raiseload
+from models.landmarks import Landmark
+from schemas.landmarks import LandmarkBase
+from services.ratingAggregates import rating_summary
+
+# Что можно встроить в ответ о достопримечательности
+LANDMARK_INCLUDES = ("photos", "rating_summary", "owner")
+
+LANDMARK_COLUMNS = list(LandmarkBase.model_fields)
+
+
+# ?include=photos,rating_summary,owner
+class IncludeParams:
+    def __init__(
+        self,
+        include: Optional[str] = Query(None, description="Через запятую: " + ",".join(LANDMARK_INCLUDES)),
+    ):
+        self.include: Set[str] = set()
+        if include:
+            self.include = {name.strip() for name in include.split(",") if name.strip()}
+        unknown = sorted(self.include - set(LANDMARK_INCLUDES))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown include: {', '.join(unknown)}")
+
+
+# Опции загрузки: число запросов не зависит от размера страницы.
+# owner - JOIN в том же запросе, photos - один SELECT ... WHERE landmark_id IN (...) на страницу,
+# rating_summary берётся из колонок-агрегатов и запросов не добавляет.
+# raiseload("*") превращает любую незапрошенную ленивую загрузку в ошибку вместо скрытого N+1.
+def landmark_load_options(include: Set[str]) -> list:
+    options = []
+    if "owner" in include:
+        options.append(joinedload(Landmark.user))
+    if "photos" in include:
+        options.append(selectinload(Landmark.photos))
+    options.append(raiseload("*"))
+    return options
+
+
+# Одна достопримечательность с опциями загрузки (GET /landmarks/{id}/detail)
+def landmark_detail_statement(landmark_id: int, include: Set[str]):
+    return select(Landmark).where(Landmark.id == landmark_id).options(*landmark_load_options(include))
+
+
+def landmark_with_embeds(landmark: Landmark, include: Set[str]) -> dict:
+    data = {name: getattr(landmark, name) for name in LANDMARK_COLUMNS}
+    if "photos" in include:
+        data["photos"] = sorted(landmark.photos, key=lambda photo: photo.id)
+    if "rating_summary" in include:
+        data["rating_summary"] = rating_summary(landmark)
+    if "owner" in include:
+        data["owner"] = landmark.user
+    return data
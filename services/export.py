@@ -0,0 +1,153 @@
+import csv
+import io
+import json
+import os
+import zlib
+from typing import AsyncIterator, Iterable, Iterator, Sequence
+from sqlalchemy import select, func
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from services.deletion import visibility_conditions
+
+# Сколько строк читать с сервера за раз (server-side cursor)
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+
+FORMATS = ("ndjson", "csv")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+# Достопримечательности вместе с агрегатами оценок и числом фото - одним запросом.
+# Мягко удалённое отфильтровано явно (visibility_conditions): CLI читает через соединение engine,
+# где критерии ORM не действуют
+def landmarks_query():
+    photo_counts = (
+        select(Photo.landmark_id, func.count(Photo.id).label("photo_count"))
+        .where(*visibility_conditions(Photo))
+        .group_by(Photo.landmark_id)
+        .subquery()
+    )
+    return (
+        select(
+            Landmark.id,
+            Landmark.name,
+            Landmark.description,
+            Landmark.location,
+            Landmark.country,
+            Landmark.image_url,
+            Landmark.latitude,
+            Landmark.longitude,
+            Landmark.user_id,
+            Landmark.rating_count,
+            Landmark.avg_rating,
+            Landmark.rating_1,
+            Landmark.rating_2,
+            Landmark.rating_3,
+            Landmark.rating_4,
+            Landmark.rating_5,
+            func.coalesce(photo_counts.c.photo_count, 0).label("photo_count"),
+        )
+        .outerjoin(photo_counts, photo_counts.c.landmark_id == Landmark.id)
+        .where(*visibility_conditions(Landmark))
+        .order_by(Landmark.id)
+    )
+
+
+def photos_query():
+    return (
+        select(Photo.id, Photo.landmark_id, Photo.user_id, Photo.image_url)
+        .where(*visibility_conditions(Photo))
+        .order_by(Photo.id)
+    )
+
+
+def ratings_query():
+    return (
+        select(Rating.id, Rating.landmark_id, Rating.user_id, Rating.rating)
+        .where(*visibility_conditions(Rating))
+        .order_by(Rating.id)
+    )
+
+
+EXPORTS = {
+    "landmarks": landmarks_query,
+    "photos": photos_query,
+    "ratings": ratings_query,
+}
+
+
+# Готовый к потоковому чтению запрос: строки приходят пачками, без загрузки всей таблицы.
+# include_deleted: в сессии API критерии ORM повторили бы уже добавленные условия
+def export_statement(name: str):
+    return EXPORTS[name]().execution_options(stream_results=True, yield_per=EXPORT_BATCH_SIZE, include_deleted=True)
+
+
+# Форматирование одной пачки строк в байты
+class RowEncoder:
+    def __init__(self, fmt: str, columns: Sequence[str]):
+        self.fmt = fmt
+        self.columns = list(columns)
+
+    def header(self) -> bytes:
+        if self.fmt != "csv":
+            return b""
+        return self._csv([self.columns])
+
+    def encode(self, rows: Iterable[Sequence]) -> bytes:
+        if self.fmt == "csv":
+            return self._csv(rows)
+        lines = [json.dumps(dict(zip(self.columns, row)), ensure_ascii=False, default=str) for row in rows]
+        return ("\n".join(lines) + "\n").encode("utf-8") if lines else b""
+
+    @staticmethod
+    def _csv(rows) -> bytes:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode("utf-8")
+
+
+# Сжатие gzip на лету: каждая пачка сжимается по мере готовности
+class GzipStream:
+    def __init__(self):
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) if data else b""
+
+    def flush(self) -> bytes:
+        return self._compressor.flush()
+
+
+# Синхронный экспорт (для CLI): соединение из sync engine
+def iter_export(connection, name: str, fmt: str, gzip: bool = False) -> Iterator[bytes]:
+    result = connection.execute(export_statement(name))
+    encoder = RowEncoder(fmt, result.keys())
+    compressor = GzipStream() if gzip else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    yield emit(encoder.header())
+    for partition in result.partitions():
+        yield emit(encoder.encode(partition))
+    if compressor:
+        yield compressor.flush()
+
+
+# Асинхронный экспорт (для StreamingResponse): сессия живёт, пока идёт поток
+async def aiter_export(session_factory, name: str, fmt: str, gzip: bool = False) -> AsyncIterator[bytes]:
+    async with session_factory() as db:
+        result = await db.stream(export_statement(name))
+        encoder = RowEncoder(fmt, result.keys())
+        compressor = GzipStream() if gzip else None
+
+        def emit(data: bytes) -> bytes:
+            return compressor.compress(data) if compressor else data
+
+        yield emit(encoder.header())
+        async for partition in result.partitions():
+            chunk = emit(encoder.encode(partition))
+            if chunk:
+                yield chunk
+        if compressor:
+            yield compressor.flush()
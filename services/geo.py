@@ -0,0 +1,350 @@
+import heapq
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from fastapi import HTTPException, Query
+from sqlalchemy import select, func, and_, or_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.landmarks import Landmark
+from services.geohash import (
+    BASE32, BBox, bounds, cover, cover_count, cover_precision, cell_ranges,
+    radius_bboxes, haversine_km, min_distance_km, in_bbox, encode,
+)
+from services.deletion import hidden_landmarks_since
+from services.memoryIndex import LazyMemoryIndex
+
+# database - запросы по индексу geohash в базе, memory - индекс в памяти процесса
+GEO_BACKEND = os.getenv("GEO_BACKEND", "database")
+# Сколько ячеек geohash максимум в одном покрытии прямоугольника (число диапазонов в WHERE)
+MAX_COVER_CELLS = 32
+# Сколько кластеров максимум возвращается для одного окна карты
+MAX_CLUSTER_CELLS = 1024
+# Начальный радиус поиска ближайших в базе; растёт в NEAREST_GROWTH раз, пока не наберётся k
+NEAREST_START_KM = 1.0
+NEAREST_GROWTH = 4
+# Половина окружности Земли - дальше точек не бывает
+MAX_DISTANCE_KM = 20038.0
+
+# Самая мелкая ячейка индекса в памяти (~150 м) и точность кластеров
+INDEX_PRECISION = 7
+
+NEARBY_COLUMNS = (Landmark.id, Landmark.name, Landmark.location, Landmark.country, Landmark.latitude, Landmark.longitude)
+
+
+# Прямоугольник карты: общая зависимость для bbox и кластеров
+class BBoxParams:
+    def __init__(
+        self,
+        min_lat: float = Query(..., ge=-90, le=90),
+        min_lon: float = Query(..., ge=-180, le=180),
+        max_lat: float = Query(..., ge=-90, le=90),
+        max_lon: float = Query(..., ge=-180, le=180),
+    ):
+        if min_lat > max_lat or min_lon > max_lon:
+            # Окно через антимеридиан клиент запрашивает двумя прямоугольниками
+            raise HTTPException(status_code=400, detail="min_lat/min_lon must not exceed max_lat/max_lon")
+        self.bbox: BBox = (min_lat, min_lon, max_lat, max_lon)
+
+
+# Пространственный индекс в памяти: дерево ячеек geohash.
+# На каждом уровне 1..INDEX_PRECISION хранится число точек и сумма координат ячейки
+# (для кластеров и обхода), id точек - только в самых мелких ячейках.
+class GeoIndex:
+    def __init__(self):
+        self.points: Dict[int, Tuple[float, float, str]] = {}  # id -> (lat, lon, geohash)
+        self.docs: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}  # id -> (name, location, country)
+        self.cells: Dict[str, Set[int]] = {}  # ячейка INDEX_PRECISION -> id
+        # ячейка любого уровня -> [count, sum_lat, sum_lon]
+        self.stats: Dict[str, List[float]] = {}
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, landmark_id: int, latitude: float, longitude: float, name: str, location: Optional[str], country: Optional[str]) -> None:
+        self.remove(landmark_id)
+        cell = encode(latitude, longitude, INDEX_PRECISION)
+        self.points[landmark_id] = (latitude, longitude, cell)
+        self.docs[landmark_id] = (name, location, country)
+        self.cells.setdefault(cell, set()).add(landmark_id)
+        for precision in range(1, INDEX_PRECISION + 1):
+            stats = self.stats.setdefault(cell[:precision], [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += latitude
+            stats[2] += longitude
+
+    def remove(self, landmark_id: int) -> None:
+        point = self.points.pop(landmark_id, None)
+        if point is None:
+            return
+        latitude, longitude, cell = point
+        self.docs.pop(landmark_id, None)
+        ids = self.cells[cell]
+        ids.discard(landmark_id)
+        if not ids:
+            del self.cells[cell]
+        for precision in range(1, INDEX_PRECISION + 1):
+            prefix = cell[:precision]
+            stats = self.stats[prefix]
+            stats[0] -= 1
+            stats[1] -= latitude
+            stats[2] -= longitude
+            if not stats[0]:
+                del self.stats[prefix]
+
+    def _children(self, cell: str) -> Iterator[str]:
+        for char in BASE32:
+            child = cell + char
+            if child in self.stats:
+                yield child
+
+    # k ближайших точек: обход дерева ячеек по возрастанию нижней оценки расстояния.
+    # Точка извлекается из очереди только когда ни одна необработанная ячейка не может быть ближе.
+    def nearest(self, latitude: float, longitude: float, k: int, max_km: Optional[float] = None) -> List[Tuple[int, float]]:
+        queue: List[Tuple[float, int, str, int]] = []  # (расстояние, 0 - ячейка / 1 - точка, ячейка, id)
+        for char in BASE32:
+            if char in self.stats:
+                queue.append((min_distance_km(latitude, longitude, bounds(char)), 0, char, 0))
+        heapq.heapify(queue)
+
+        found: List[Tuple[int, float]] = []
+        while queue and len(found) < k:
+            distance, is_point, cell, landmark_id = heapq.heappop(queue)
+            if max_km is not None and distance > max_km:
+                break
+            if is_point:
+                found.append((landmark_id, distance))
+            elif len(cell) < INDEX_PRECISION:
+                for child in self._children(cell):
+                    heapq.heappush(queue, (min_distance_km(latitude, longitude, bounds(child)), 0, child, 0))
+            else:
+                for point_id in self.cells[cell]:
+                    point_lat, point_lon, _ = self.points[point_id]
+                    heapq.heappush(queue, (haversine_km(latitude, longitude, point_lat, point_lon), 1, "", point_id))
+        return found
+
+    # Точки внутри прямоугольника, по ячейкам в порядке geohash
+    def within(self, bbox: BBox, limit: int) -> List[int]:
+        precision = cover_precision(bbox, MAX_COVER_CELLS, INDEX_PRECISION)
+        found: List[int] = []
+        stack = [cell for cell in reversed(cover(bbox, precision)) if cell in self.stats]
+        while stack and len(found) < limit:
+            cell = stack.pop()
+            if not _intersects(bounds(cell), bbox):
+                continue
+            if len(cell) < INDEX_PRECISION:
+                stack.extend(reversed(list(self._children(cell))))
+                continue
+            matches = []
+            for landmark_id in self.cells[cell]:
+                point_lat, point_lon, _ = self.points[landmark_id]
+                if in_bbox(point_lat, point_lon, bbox):
+                    matches.append(landmark_id)
+            found.extend(sorted(matches))
+        return found[:limit]
+
+    # Кластеры: ячейки точности precision, пересекающие прямоугольник, с числом точек и центром
+    def clusters(self, bbox: BBox, precision: int) -> List[dict]:
+        result = []
+        for cell in cover(bbox, precision):
+            stats = self.stats.get(cell)
+            if not stats:
+                continue
+            count, sum_lat, sum_lon = stats
+            cluster = {"cell": cell, "count": int(count), "latitude": sum_lat / count, "longitude": sum_lon / count}
+            if count == 1:
+                cluster["landmark_id"] = self._single(cell)
+            result.append(cluster)
+        return result
+
+    # id единственной точки ячейки: спуск по непустым дочерним ячейкам
+    def _single(self, cell: str) -> int:
+        while len(cell) < INDEX_PRECISION:
+            cell = next(self._children(cell))
+        return next(iter(self.cells[cell]))
+
+
+# Геозапросы с выбором реализации: индекс geohash в базе или индекс в памяти
+class LandmarkGeo(LazyMemoryIndex):
+    def __init__(self, backend: str = GEO_BACKEND):
+        super().__init__()
+        self.backend = backend
+        self.index = GeoIndex()
+
+    @property
+    def uses_memory(self) -> bool:
+        return self.backend == "memory"
+
+    def load_statement(self):
+        return select(*NEARBY_COLUMNS).where(Landmark.latitude.is_not(None), Landmark.longitude.is_not(None))
+
+    # Строки синхронизации могут быть и без координат (их убрали) - тогда точка удаляется
+    def load_row(self, row) -> None:
+        if row.latitude is None or row.longitude is None:
+            self.index.remove(row.id)
+        else:
+            self.index.add(row.id, row.latitude, row.longitude, row.name, row.location, row.country)
+
+    # Созданные и изменённые другими процессами (по индексу ix_landmarks_updated_at)
+    def changed_statement(self, since):
+        return select(*NEARBY_COLUMNS).where(Landmark.updated_at >= since)
+
+    def removed_statement(self, since):
+        return hidden_landmarks_since(since)
+
+    # Инкрементальные обновления из обработчиков create/update/delete
+    def add(self, landmark) -> None:
+        if not self.touch(landmark.id):
+            return
+        if landmark.latitude is None or landmark.longitude is None:
+            self.index.remove(landmark.id)
+        else:
+            self.index.add(landmark.id, landmark.latitude, landmark.longitude, landmark.name, landmark.location, landmark.country)
+
+    def add_many(self, landmarks: Iterable) -> None:
+        for landmark in landmarks:
+            self.add(landmark)
+
+    def remove(self, landmark_id: int) -> None:
+        if self.touch(landmark_id):
+            self.index.remove(landmark_id)
+
+    def remove_many(self, landmark_ids: Iterable[int]) -> None:
+        for landmark_id in landmark_ids:
+            self.remove(landmark_id)
+
+    def _hit(self, landmark_id: int, distance: Optional[float] = None) -> dict:
+        latitude, longitude, _ = self.index.points[landmark_id]
+        name, location, country = self.index.docs[landmark_id]
+        hit = {"id": landmark_id, "name": name, "location": location, "country": country, "latitude": latitude, "longitude": longitude}
+        if distance is not None:
+            hit["distance_km"] = round(distance, 4)
+        return hit
+
+    async def nearest(self, db: AsyncSession, latitude: float, longitude: float, k: int, max_km: Optional[float] = None) -> List[dict]:
+        if self.uses_memory:
+            await self.ensure_built(db)
+            found = self.index.nearest(latitude, longitude, k, max_km)
+            # Удалённые другими процессами убираются, и поиск повторяется
+            while await self.drop_missing(db, Landmark, [landmark_id for landmark_id, _ in found]):
+                found = self.index.nearest(latitude, longitude, k, max_km)
+            return [self._hit(landmark_id, distance) for landmark_id, distance in found]
+
+        # В базе: расширяющийся круг. Все точки в радиусе r лежат в его описанном
+        # прямоугольнике, поэтому как только в круге набралось k точек, ответ точный.
+        limit_km = min(max_km, MAX_DISTANCE_KM) if max_km is not None else MAX_DISTANCE_KM
+        radius = min(NEAREST_START_KM, limit_km)
+        while True:
+            rows = await db.execute(nearest_statement(latitude, longitude, radius))
+            hits = []
+            for row in rows:
+                distance = haversine_km(latitude, longitude, row.latitude, row.longitude)
+                if distance <= radius:
+                    hits.append({**row._mapping, "distance_km": round(distance, 4)})
+            if len(hits) >= k or radius >= limit_km:
+                return heapq.nsmallest(k, hits, key=lambda hit: (hit["distance_km"], hit["id"]))
+            radius = min(radius * NEAREST_GROWTH, limit_km)
+
+    async def within(self, db: AsyncSession, bbox: BBox, limit: int) -> List[dict]:
+        if self.uses_memory:
+            await self.ensure_built(db)
+            found = self.index.within(bbox, limit)
+            while await self.drop_missing(db, Landmark, found):
+                found = self.index.within(bbox, limit)
+            return [self._hit(landmark_id) for landmark_id in found]
+
+        rows = await db.execute(within_statement(bbox, limit))
+        return [dict(row._mapping) for row in rows]
+
+    async def clusters(self, db: AsyncSession, bbox: BBox, precision: int) -> List[dict]:
+        # Слишком мелкие ячейки для большого окна укрупняются
+        while precision > 1 and cover_count(bbox, precision) > MAX_CLUSTER_CELLS:
+            precision -= 1
+
+        if self.uses_memory:
+            await self.ensure_built(db)
+            return self.index.clusters(bbox, precision)
+
+        statement = clusters_statement(bbox, precision)
+        clusters = []
+        for row in await db.execute(statement):
+            cluster = dict(row._mapping)
+            # Кластер - вся ячейка, даже если она выходит за окно (как тайлы карты)
+            if not _intersects(bounds(cluster["cell"]), bbox):
+                continue
+            if cluster["count"] != 1:
+                cluster["landmark_id"] = None
+            clusters.append(cluster)
+        return clusters
+
+
+def _intersects(first: BBox, second: BBox) -> bool:
+    return not (first[0] > second[2] or first[2] < second[0] or first[1] > second[3] or first[3] < second[1])
+
+
+def _range_condition(start: str, end: Optional[str]):
+    if end is None:
+        return Landmark.geohash >= start
+    return and_(Landmark.geohash >= start, Landmark.geohash < end)
+
+
+# geohash >= start AND geohash < end для каждого диапазона покрытия
+def _ranges_condition(cells: List[str]):
+    return or_(*[_range_condition(start, end) for start, end in cell_ranges(cells)])
+
+
+# Точки внутри прямоугольника: диапазоны по индексу geohash + точная проверка координат
+def _within_statement(bbox: BBox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    cells = cover(bbox, cover_precision(bbox, MAX_COVER_CELLS))
+    return select(*NEARBY_COLUMNS).where(
+        _ranges_condition(cells),
+        Landmark.latitude.between(min_lat, max_lat),
+        Landmark.longitude.between(min_lon, max_lon),
+    )
+
+
+# Запросы пути через базу; tests/test_query_plans.py проверяет их планы
+def nearest_statement(latitude: float, longitude: float, radius_km: float):
+    parts = [_within_statement(bbox) for bbox in radius_bboxes(latitude, longitude, radius_km)]
+    # Круг через антимеридиан - два прямоугольника; долготы у них не пересекаются, дублей нет
+    return parts[0] if len(parts) == 1 else union_all(*parts)
+
+
+# Окно карты в порядке geohash. Каждый диапазон покрытия - свой подзапрос с ORDER BY и LIMIT:
+# он читается поиском по диапазону индекса, и оптимизатор не может ради порядка ORDER BY ... LIMIT
+# заменить OR диапазонов проходом по всему индексу geohash (MySQL выбирал type=index)
+def within_statement(bbox: BBox, limit: int):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    parts = []
+    for start, end in cell_ranges(cover(bbox, cover_precision(bbox, MAX_COVER_CELLS))):
+        part = (
+            select(*NEARBY_COLUMNS, Landmark.geohash)
+            .where(
+                _range_condition(start, end),
+                Landmark.latitude.between(min_lat, max_lat),
+                Landmark.longitude.between(min_lon, max_lon),
+            )
+            .order_by(Landmark.geohash, Landmark.id)
+            .limit(limit)
+        )
+        parts.append(select(part.subquery()))
+    rows = union_all(*parts).subquery()
+    return select(*[rows.c[column.key] for column in NEARBY_COLUMNS]).order_by(rows.c.geohash, rows.c.id).limit(limit)
+
+
+def clusters_statement(bbox: BBox, precision: int):
+    cell = func.substr(Landmark.geohash, 1, precision).label("cell")
+    return (
+        select(
+            cell,
+            func.count(Landmark.id).label("count"),
+            func.avg(Landmark.latitude).label("latitude"),
+            func.avg(Landmark.longitude).label("longitude"),
+            func.min(Landmark.id).label("landmark_id"),
+        )
+        .where(_ranges_condition(cover(bbox, min(precision, cover_precision(bbox, MAX_COVER_CELLS)))))
+        .group_by(cell)
+        .order_by(cell)
+    )
+
+
+landmark_geo = LandmarkGeo()
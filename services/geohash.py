@@ -0,0 +1,204 @@
+import math
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# Geohash: ячейка кодируется строкой, у вложенных ячеек общий префикс, а соседние ячейки
+# одной точности идут подряд при сортировке строк. Поэтому обычный B-tree индекс по строке
+# geohash работает как пространственный индекс в MySQL, PostgreSQL и SQLite.
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_DECODE = {char: index for index, char in enumerate(BASE32)}
+
+# Точность, с которой geohash хранится в landmarks.geohash (~1.2 м)
+GEOHASH_PRECISION = 10
+EARTH_RADIUS_KM = 6371.0088
+
+# Прямоугольник: (min_lat, min_lon, max_lat, max_lon)
+BBox = Tuple[float, float, float, float]
+
+
+def encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True  # чётные биты - долгота
+    while len(chars) < precision:
+        target, current = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (target[0] + target[1]) / 2
+        if current >= middle:
+            value = (value << 1) | 1
+            target[0] = middle
+        else:
+            value <<= 1
+            target[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
+
+
+def encode_optional(latitude: Optional[float], longitude: Optional[float]) -> Optional[str]:
+    if latitude is None or longitude is None:
+        return None
+    return encode(latitude, longitude)
+
+
+# Границы ячейки: (min_lat, min_lon, max_lat, max_lon). Кэш: поиск ближайших много раз
+# обходит одни и те же ячейки
+@lru_cache(maxsize=1 << 17)
+def bounds(cell: str) -> BBox:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _DECODE[char]
+        for shift in range(4, -1, -1):
+            target = lon_range if even else lat_range
+            middle = (target[0] + target[1]) / 2
+            if (value >> shift) & 1:
+                target[0] = middle
+            else:
+                target[1] = middle
+            even = not even
+    return lat_range[0], lon_range[0], lat_range[1], lon_range[1]
+
+
+# Размер ячейки в градусах (высота, ширина) для данной точности
+def cell_size(precision: int) -> Tuple[float, float]:
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+# Следующая ячейка той же точности в порядке сортировки (None - это была последняя)
+def successor(cell: str) -> Optional[str]:
+    chars = list(cell)
+    for position in range(len(chars) - 1, -1, -1):
+        index = _DECODE[chars[position]]
+        if index + 1 < len(BASE32):
+            chars[position] = BASE32[index + 1]
+            return "".join(chars)
+        chars[position] = BASE32[0]
+    return None
+
+
+# Сколько ячеек данной точности покрывают прямоугольник
+def cover_count(bbox: BBox, precision: int) -> int:
+    height, width = cell_size(precision)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    rows = math.floor((max_lat + 90) / height) - math.floor((min_lat + 90) / height) + 1
+    columns = math.floor((max_lon + 180) / width) - math.floor((min_lon + 180) / width) + 1
+    return rows * columns
+
+
+# Самая точная точность (не больше max_precision), при которой покрытие не больше max_cells ячеек
+def cover_precision(bbox: BBox, max_cells: int, max_precision: int = GEOHASH_PRECISION) -> int:
+    precision = 1
+    while precision < max_precision and cover_count(bbox, precision + 1) <= max_cells:
+        precision += 1
+    return precision
+
+
+# Ячейки точности precision, пересекающие прямоугольник (отсортированы)
+def cover(bbox: BBox, precision: int) -> List[str]:
+    height, width = cell_size(precision)
+    min_lat, min_lon, max_lat, max_lon = bbox
+    cells = set()
+    # Центры ячеек по сетке; min() не даёт выйти за +90/+180
+    first_row = math.floor((min_lat + 90) / height)
+    last_row = math.floor((max_lat + 90) / height)
+    first_column = math.floor((min_lon + 180) / width)
+    last_column = math.floor((max_lon + 180) / width)
+    for row in range(first_row, last_row + 1):
+        latitude = min(-90 + (row + 0.5) * height, 90 - height / 2)
+        for column in range(first_column, last_column + 1):
+            longitude = min(-180 + (column + 0.5) * width, 180 - width / 2)
+            cells.add(encode(latitude, longitude, precision))
+    return sorted(cells)
+
+
+# Склеивает идущие подряд ячейки в полуинтервалы [start, end) для WHERE geohash >= start AND geohash < end.
+# end = None - до конца диапазона.
+def cell_ranges(cells: List[str]) -> List[Tuple[str, Optional[str]]]:
+    ranges: List[Tuple[str, Optional[str]]] = []
+    for cell in cells:
+        end = successor(cell)
+        if ranges and ranges[-1][1] == cell:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((cell, end))
+    return ranges
+
+
+# Прямоугольники, гарантированно содержащие круг радиуса radius_km вокруг точки. Круг, который
+# пересекает антимеридиан (±180°), покрывается двумя прямоугольниками - по обе стороны от него
+def radius_bboxes(latitude: float, longitude: float, radius_km: float) -> List[BBox]:
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat = max(-90.0, latitude - lat_delta)
+    max_lat = min(90.0, latitude + lat_delta)
+    # У полюса круг захватывает все долготы
+    widest = max(abs(min_lat), abs(max_lat))
+    if widest >= 89.9 or lat_delta >= 90:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    lon_delta = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(widest))))
+    if lon_delta >= 180:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+    min_lon = longitude - lon_delta
+    max_lon = longitude + lon_delta
+    if min_lon < -180.0:
+        return [(min_lat, min_lon + 360.0, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon)]
+    if max_lon > 180.0:
+        return [(min_lat, min_lon, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lon - 360.0)]
+    return [(min_lat, min_lon, max_lat, max_lon)]
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+# Кратчайшее расстояние от точки до прямоугольника (0 - точка внутри).
+# Ближайшая точка на меридиане-границе - основание перпендикуляра к большому кругу.
+def min_distance_km(latitude: float, longitude: float, bbox: BBox) -> float:
+    min_lat, min_lon, max_lat, max_lon = bbox
+    if min_lon <= longitude <= max_lon:
+        if latitude < min_lat:
+            return math.radians(min_lat - latitude) * EARTH_RADIUS_KM
+        if latitude > max_lat:
+            return math.radians(latitude - max_lat) * EARTH_RADIUS_KM
+        return 0.0
+
+    best = math.inf
+    for edge in (min_lon, max_lon):
+        delta = math.radians((longitude - edge + 180) % 360 - 180)
+        if abs(delta) < math.pi / 2:
+            closest = math.degrees(math.atan(math.tan(math.radians(latitude)) / math.cos(delta)))
+            candidates = (min(max(closest, min_lat), max_lat),)
+        else:
+            # Перпендикуляр падает за полюс - ближе один из концов отрезка
+            candidates = (min_lat, max_lat)
+        for candidate in candidates:
+            best = min(best, haversine_km(latitude, longitude, candidate, edge))
+    return best
+
+
+def in_bbox(latitude: float, longitude: float, bbox: BBox) -> bool:
+    return bbox[0] <= latitude <= bbox[2] and bbox[1] <= longitude <= bbox[3]
+
+
+# Точность ячеек (1..7) для кластеризации на уровне масштаба карты (zoom 0..20):
+# на тайл приходится примерно 4-8 кластеров по ширине
+ZOOM_THRESHOLDS = (2, 5, 8, 10, 13, 15)
+
+
+def cluster_precision(zoom: int) -> int:
+    return 1 + sum(1 for threshold in ZOOM_THRESHOLDS if zoom >= threshold)
@@ -0,0 +1,75 @@
+import asyncio
+from sqlalchemy import select
+from config.database import AsyncSessionLocal
+from models.landmarks import Landmark
+from services.deletion import purge_deleted, enqueue_purge
+from services.jobs import job_handler, job_worker
+from services.ratingAggregates import recalculate_statement
+from services.responseCache import response_cache
+from services.similarity import similarity_model, collect_dirty
+from services.thumbnails import thumbnails, THUMBNAIL_SIZES
+
+# Обработчики фоновых задач. Импорт модуля регистрирует их в services.jobs.HANDLERS
+# (делают main.py и worker.py). Все обработчики идемпотентны.
+
+
+# Миниатюры загруженной фотографии; уже построенные пропускаются
+@job_handler("photo_thumbnails")
+async def render_photo_thumbnails(payload: dict) -> None:
+    for size in THUMBNAIL_SIZES:
+        await thumbnails.ensure(payload["key"], size)
+
+
+# Пересчёт агрегатов оценок после пакетной записи в ratings. Пересчёт, а не сдвиг на дельту,
+# поэтому повтор задачи безопасен. Строки landmarks блокируются до пересчёта: одиночная
+# запись оценки (сдвиг агрегатов в своей транзакции) либо закончится раньше и попадёт
+# в пересчёт, либо дождётся его и сдвинет уже пересчитанные значения.
+@job_handler("rating_aggregates")
+async def recalculate_rating_aggregates(payload: dict) -> None:
+    landmark_ids = sorted(payload["landmark_ids"])
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            select(Landmark.id).where(Landmark.id.in_(landmark_ids)).order_by(Landmark.id).with_for_update()
+        )
+        await db.execute(recalculate_statement(landmark_ids), execution_options={"synchronize_session": False})
+        await db.commit()
+    await response_cache.invalidate("landmarks")
+
+
+# Похожие достопримечательности. Без landmark_ids - сбор отмеченных достопримечательностей
+# в задачи пересчёта (ставится записью оценок не чаще SIMILARITY_REFRESH_INTERVAL);
+# с landmark_ids - инкрементальный пересчёт их соседей. Оба шага повторяемы.
+@job_handler("similarity_refresh")
+async def refresh_similarities(payload: dict) -> None:
+    if "landmark_ids" not in payload:
+        async with AsyncSessionLocal() as db:
+            collected = await collect_dirty(db)
+            await db.commit()
+        if collected:
+            job_worker.notify()
+        return
+    await asyncio.to_thread(similarity_model.refresh, payload["landmark_ids"])
+    await response_cache.invalidate("landmarks")
+
+
+# Полная сборка модели похожих. На больших данных её лучше запускать отдельно
+# (python -m config.similarity) - расчёт может занять больше JOB_TIMEOUT.
+@job_handler("similarity_rebuild")
+async def rebuild_similarities(payload: dict) -> None:
+    await asyncio.to_thread(similarity_model.rebuild)
+    await response_cache.invalidate("landmarks")
+
+
+# Очистка мягко удалённых строк пачками (services/deletion.py). Не успела за PURGE_JOB_SECONDS -
+# ставит себя заново; удалённое в прошлых задачах уже не выбирается, поэтому повтор безопасен.
+@job_handler("purge_deleted")
+async def purge_deleted_rows(payload: dict) -> None:
+    result = await purge_deleted()
+    if result["rows"]:
+        await response_cache.invalidate("landmarks")
+        await response_cache.invalidate("photos")
+    if not result["done"]:
+        async with AsyncSessionLocal() as db:
+            enqueue_purge(db)
+            await db.commit()
+        job_worker.notify()
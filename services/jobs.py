@@ -0,0 +1,266 @@
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import AsyncSessionLocal
+from models.job import Job
+from services.latency import LatencyWindow
+
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", 4))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1.0))
+JOB_TIMEOUT = float(os.getenv("JOB_TIMEOUT", 300))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BASE = float(os.getenv("JOB_RETRY_BASE", 2))
+JOB_RETRY_MAX = float(os.getenv("JOB_RETRY_MAX", 600))
+
+# Приоритеты: больше - раньше
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = -10
+
+# Аренда с запасом сверх таймаута: если воркер умер, задача вернётся в очередь после неё
+LEASE_SECONDS = JOB_TIMEOUT + 60
+RECOVER_INTERVAL = 30.0
+
+logger = logging.getLogger(__name__)
+
+JobHandler = Callable[[dict], Awaitable[None]]
+HANDLERS: Dict[str, JobHandler] = {}
+
+
+# Регистрирует обработчик вида задачи. Обработчик должен быть идемпотентным:
+# после сбоя воркера задача может выполниться повторно.
+def job_handler(kind: str):
+    def register(handler: JobHandler) -> JobHandler:
+        HANDLERS[kind] = handler
+        return handler
+    return register
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+# Добавляет задачу в текущую транзакцию: она станет видна воркеру вместе с основной записью.
+# После commit стоит вызвать job_worker.notify(), чтобы воркер в этом процессе не ждал опроса.
+def enqueue(db: AsyncSession, kind: str, payload: dict, priority: int = PRIORITY_NORMAL,
+            delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Job:
+    now = utcnow()
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload, separators=(",", ":")),
+        priority=priority,
+        status="queued",
+        attempts=0,
+        max_attempts=max_attempts,
+        created_at=now,
+        run_at=now + timedelta(seconds=delay) if delay else now,
+    )
+    db.add(job)
+    return job
+
+
+# Экспоненциальная отсрочка с разбросом, чтобы повторы не шли пачкой
+def retry_delay(attempts: int) -> float:
+    return min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+
+
+# Счётчики одного вида задач в этом процессе
+class KindMetrics:
+    def __init__(self):
+        self.succeeded = 0
+        self.retried = 0
+        self.failed = 0
+        self.wait = LatencyWindow()  # от run_at до начала выполнения
+        self.run = LatencyWindow()  # длительность выполнения
+
+    def stats(self) -> dict:
+        return {
+            "succeeded": self.succeeded,
+            "retried": self.retried,
+            "failed": self.failed,
+            "wait": self.wait.stats(),
+            "run": self.run.stats(),
+        }
+
+
+# Воркер: забирает задачи из таблицы jobs и выполняет до concurrency штук одновременно.
+# Захват - UPDATE ... WHERE status = 'queued' с проверкой числа строк, поэтому несколько
+# воркеров (в API и в worker.py) не возьмут одну задачу ни в MySQL, ни в PostgreSQL, ни в SQLite.
+# Успешные задачи удаляются, исчерпавшие попытки остаются со статусом failed.
+class JobWorker:
+    def __init__(self, concurrency: int = JOB_WORKER_CONCURRENCY, poll_interval: float = JOB_POLL_INTERVAL):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.metrics: Dict[str, KindMetrics] = {}
+        self._running: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._last_recover = 0.0
+
+    def notify(self) -> None:
+        self._wakeup.set()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.ensure_future(self.run())
+
+    # Дожидается выполняемых задач (не дольше timeout), остальные вернутся в очередь
+    async def stop(self, timeout: float = 10) -> None:
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._running:
+            await asyncio.wait(self._running, timeout=timeout)
+        for task in list(self._running):
+            task.cancel()
+        if self._running:
+            await asyncio.wait(self._running)
+
+    async def run(self) -> None:
+        while not self._stopping:
+            # Сбрасываем до захвата: notify() во время захвата не потеряется
+            self._wakeup.clear()
+            try:
+                if time.monotonic() - self._last_recover > RECOVER_INTERVAL:
+                    await self.recover_expired()
+                    self._last_recover = time.monotonic()
+                free = self.concurrency - len(self._running)
+                jobs = await self.claim(free) if free > 0 else []
+            except Exception:
+                logger.exception("Job queue is unavailable")
+                jobs = []
+
+            for job in jobs:
+                task = asyncio.ensure_future(self.execute(job))
+                self._running.add(task)
+                task.add_done_callback(self._finished)
+
+            if not jobs:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._running.discard(task)
+        # Освободилось место - можно сразу брать следующую задачу
+        self._wakeup.set()
+
+    async def claim(self, limit: int) -> List[Job]:
+        async with AsyncSessionLocal() as db:
+            now = utcnow()
+            candidates = await db.execute(
+                select(Job.id)
+                .where(Job.status == "queued", Job.run_at <= now)
+                .order_by(Job.priority.desc(), Job.run_at, Job.id)
+                .limit(limit * 2)
+            )
+            claimed = []
+            for job_id in candidates.scalars().all():
+                result = await db.execute(
+                    update(Job)
+                    .where(Job.id == job_id, Job.status == "queued")
+                    .values(
+                        status="running",
+                        attempts=Job.attempts + 1,
+                        started_at=now,
+                        locked_until=now + timedelta(seconds=LEASE_SECONDS),
+                    )
+                )
+                if result.rowcount == 1:
+                    claimed.append(job_id)
+                    if len(claimed) == limit:
+                        break
+            await db.commit()
+            if not claimed:
+                return []
+            jobs = await db.execute(select(Job).where(Job.id.in_(claimed)).order_by(Job.priority.desc(), Job.run_at))
+            return list(jobs.scalars().all())
+
+    async def execute(self, job: Job) -> None:
+        metrics = self.metrics.setdefault(job.kind, KindMetrics())
+        metrics.wait.add(max(0.0, (job.started_at - job.run_at).total_seconds()))
+        started = time.perf_counter()
+        try:
+            handler = HANDLERS.get(job.kind)
+            if handler is None:
+                raise LookupError(f"No handler for job kind {job.kind}")
+            await asyncio.wait_for(handler(json.loads(job.payload)), timeout=JOB_TIMEOUT)
+        except asyncio.CancelledError:
+            # Воркер останавливается: задача вернётся в очередь без потери попытки
+            await self._finish(job, status="queued", attempts=job.attempts - 1, run_at=utcnow())
+            raise
+        except Exception as error:
+            metrics.run.add(time.perf_counter() - started)
+            message = f"{type(error).__name__}: {error}"
+            if job.attempts >= job.max_attempts:
+                metrics.failed += 1
+                logger.error("Job %s (%s) failed after %s attempts: %s", job.id, job.kind, job.attempts, message)
+                await self._finish(job, status="failed", last_error=message)
+            else:
+                metrics.retried += 1
+                delay = retry_delay(job.attempts)
+                await self._finish(job, status="queued", last_error=message, run_at=utcnow() + timedelta(seconds=delay))
+                # Повтор подхватывается сразу по истечении отсрочки, а не на следующем опросе
+                asyncio.get_running_loop().call_later(delay, self.notify)
+            return
+
+        metrics.run.add(time.perf_counter() - started)
+        metrics.succeeded += 1
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(Job).where(Job.id == job.id))
+            await db.commit()
+
+    async def _finish(self, job: Job, **values) -> None:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(Job).where(Job.id == job.id).values(locked_until=None, **values))
+            await db.commit()
+
+    # Задачи воркеров, которые умерли, не закончив работу, возвращаются в очередь
+    async def recover_expired(self) -> int:
+        async with AsyncSessionLocal() as db:
+            now = utcnow()
+            result = await db.execute(
+                update(Job)
+                .where(Job.status == "running", Job.locked_until < now)
+                .values(status="queued", run_at=now, locked_until=None)
+            )
+            await db.commit()
+            return result.rowcount
+
+    def stats(self) -> dict:
+        return {
+            "running": len(self._running),
+            "concurrency": self.concurrency,
+            "kinds": {kind: metrics.stats() for kind, metrics in sorted(self.metrics.items())},
+        }
+
+
+# Глубина очереди по видам и статусам и возраст самой старой ожидающей задачи (общие для всех воркеров)
+async def queue_depth(db: AsyncSession) -> dict:
+    rows = await db.execute(
+        select(Job.kind, Job.status, func.count(Job.id), func.min(Job.run_at))
+        .group_by(Job.kind, Job.status)
+    )
+    now = utcnow()
+    depth: Dict[str, dict] = {}
+    for kind, status, count, oldest in rows.all():
+        entry = depth.setdefault(kind, {"queued": 0, "running": 0, "failed": 0, "oldest_queued_seconds": None})
+        entry[status] = count
+        if status == "queued" and oldest is not None:
+            entry["oldest_queued_seconds"] = round(max(0.0, (now - oldest).total_seconds()), 3)
+    return depth
+
+
+job_worker = JobWorker()
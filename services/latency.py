@@ -0,0 +1,25 @@
+from collections import deque
+from typing import Deque
+
+# Сколько последних замеров хранить
+LATENCY_WINDOW = 1000
+
+
+# Скользящее окно замеров времени с перцентилями (для счётчиков в /stats/)
+class LatencyWindow:
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.values: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float) -> None:
+        self.values.append(seconds * 1000)
+
+    def stats(self) -> dict:
+        if not self.values:
+            return {"count": 0}
+        values = sorted(self.values)
+        return {
+            "count": len(values),
+            "p50_ms": round(values[len(values) // 2], 2),
+            "p95_ms": round(values[min(len(values) - 1, int(len(values) * 0.95))], 2),
+            "max_ms": round(values[-1], 2),
+        }
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Set
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.timestamps import utcnow
+
+# Сколько строк читать из базы за раз при построении индекса
+LOAD_BATCH_SIZE = 5000
+# Как часто индекс подтягивает изменения других процессов (воркеры uvicorn, worker.py), секунды.
+# Синхронизация идёт при обращении к индексу, не чаще этого интервала
+MEMORY_INDEX_SYNC_INTERVAL = float(os.getenv("MEMORY_INDEX_SYNC_INTERVAL", 5))
+# Перекрытие окна синхронизации: запись с updated_at чуть раньше прошлой синхронизации
+# могла зафиксироваться уже после неё (и реплика могла отставать)
+SYNC_OVERLAP = timedelta(seconds=max(30.0, 3 * MEMORY_INDEX_SYNC_INTERVAL))
+
+
+# Индекс в памяти процесса, который строится из базы при первом обращении и дальше
+# обновляется обработчиками записи. Наследник задаёт load_statement() и load_row(row).
+# Строки, изменённые обработчиками во время построения, из потока не берутся - они новее.
+# Изменения других процессов наследник подтягивает, задав changed_statement(since) (строки для
+# load_row) и removed_statement(since) (id для remove); удалённые без отметки (SOFT_DELETE=0)
+# убираются при чтении через drop_missing.
+class LazyMemoryIndex:
+    def __init__(self):
+        self.ready = False
+        self._building = False
+        self._touched_while_building: Set[int] = set()
+        self._lock = asyncio.Lock()
+        self._synced_at: Optional[datetime] = None
+        self._next_sync = 0.0
+        self.synced_rows = 0
+
+    def load_statement(self):
+        raise NotImplementedError
+
+    def load_row(self, row) -> None:
+        raise NotImplementedError
+
+    def changed_statement(self, since: datetime):
+        return None
+
+    def removed_statement(self, since: datetime):
+        return None
+
+    async def ensure_built(self, db: AsyncSession) -> None:
+        if self.ready:
+            await self.catch_up(db)
+            return
+        async with self._lock:
+            if self.ready:
+                return
+            self._building = True
+            try:
+                self._synced_at = utcnow()
+                self._next_sync = time.monotonic() + MEMORY_INDEX_SYNC_INTERVAL
+                statement = self.load_statement().execution_options(stream_results=True, yield_per=LOAD_BATCH_SIZE)
+                result = await db.stream(statement)
+                async for partition in result.partitions():
+                    for row in partition:
+                        if row.id not in self._touched_while_building:
+                            self.load_row(row)
+                self.ready = True
+            finally:
+                self._building = False
+                self._touched_while_building.clear()
+
+    # Вызывается перед инкрементальным изменением записи: False - индекс ещё не
+    # строился (или не используется), менять нечего
+    def touch(self, item_id: int) -> bool:
+        if self._building:
+            self._touched_while_building.add(item_id)
+            return True
+        return self.ready
+
+    # Строки, изменённые или скрытые другими процессами после прошлой синхронизации
+    async def catch_up(self, db: AsyncSession) -> None:
+        if time.monotonic() < self._next_sync:
+            return
+        self._next_sync = time.monotonic() + MEMORY_INDEX_SYNC_INTERVAL
+        since = self._synced_at - SYNC_OVERLAP
+        changed = self.changed_statement(since)
+        if changed is None:
+            return
+        started = utcnow()
+        for row in await db.execute(changed):
+            self.synced_rows += 1
+            self.load_row(row)
+        removed = self.removed_statement(since)
+        if removed is not None:
+            for item_id in (await db.execute(removed)).scalars():
+                self.remove(item_id)
+        self._synced_at = started
+
+    # Убирает из индекса строки ответа, которых в базе уже нет (или они скрыты).
+    # True - что-то убрано, ответ нужно собрать заново
+    async def drop_missing(self, db: AsyncSession, model, ids: Iterable[int]) -> bool:
+        ids = list(ids)
+        if not ids:
+            return False
+        present = set((await db.execute(select(model.id).where(model.id.in_(ids)))).scalars())
+        missing = [item_id for item_id in ids if item_id not in present]
+        for item_id in missing:
+            self.remove(item_id)
+        return bool(missing)
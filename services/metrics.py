@@ -0,0 +1,316 @@
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import event
+
+# Метрики в текстовом формате Prometheus (GET /metrics) без внешних зависимостей.
+# Все наборы меток создаются заранее (instrument() проходит по маршрутам приложения),
+# поэтому на запрос приходится только увеличение счётчиков в уже созданных объектах.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+STATEMENT_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+STATUS_CLASSES = ("1xx", "2xx", "3xx", "4xx", "5xx")
+OPERATIONS = ("SELECT", "INSERT", "UPDATE", "DELETE", "OTHER")
+
+# Маршрут для запросов, не попавших ни в один обработчик (404, 405)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: Dict[Tuple[str, ...], object] = {}
+
+    # Создаёт (или возвращает уже созданный) дочерний объект для набора меток
+    def labels(self, *values):
+        values = tuple(str(value) for value in values)
+        child = self.children.get(values)
+        if child is None:
+            child = self._new_child()
+            self.children[values] = child
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self.children.items():
+            lines.extend(self._render_child(_label_text(self.labelnames, values), values, child))
+        return lines
+
+    def _render_child(self, labels: str, values, child) -> Iterable[str]:
+        return [f"{self.name}{labels} {_number(child.value)}"]
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+
+# Значение снимается при отдаче /metrics: collect() возвращает {(метки...): значение}
+class GaugeFunction(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str], collect: Callable[[], Dict[tuple, float]]):
+        super().__init__(name, documentation, labelnames)
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.collect().items():
+            lines.append(f"{self.name}{_label_text(self.labelnames, values)} {_number(value)}")
+        return lines
+
+
+# То же для монотонных значений, которые уже считаются в другом месте
+class CounterFunction(GaugeFunction):
+    kind = "counter"
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Граница le включительна: значение попадает в первую корзину с границей >= value
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def _render_child(self, labels: str, values, child) -> Iterable[str]:
+        lines = []
+        cumulative = 0
+        names = self.labelnames + ("le",)
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_label_text(names, values + (_number(bound),))} {cumulative}")
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route, method and status class", ("route", "method", "status"),
+))
+http_exceptions = registry.register(Counter(
+    "http_request_exceptions_total", "Requests that ended with an unhandled exception", ("route", "method"),
+))
+http_latency = registry.register(Histogram(
+    "http_request_duration_seconds", "Request latency until the last body chunk is sent", ("route", "method"), LATENCY_BUCKETS,
+))
+http_response_size = registry.register(Histogram(
+    "http_response_size_bytes", "Response body size", ("route", "method"), SIZE_BUCKETS,
+))
+http_db_time = registry.register(Histogram(
+    "http_request_db_seconds", "Total SQL time per request", ("route", "method"), DB_TIME_BUCKETS,
+))
+http_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "SQL statements per request", ("route", "method"), STATEMENT_COUNT_BUCKETS,
+))
+http_in_flight = registry.register(Gauge("http_requests_in_flight", "Requests being processed")).labels()
+db_statement_time = registry.register(Histogram(
+    "db_statement_duration_seconds", "SQL statement duration by operation", ("operation",), DB_TIME_BUCKETS,
+))
+_db_operation = {operation: db_statement_time.labels(operation) for operation in OPERATIONS}
+
+
+# Накопленное время SQL текущего запроса (contextvar виден и в greenlet-ах SQLAlchemy)
+class RequestDbStats:
+    __slots__ = ("time", "statements")
+
+    def __init__(self):
+        self.time = 0.0
+        self.statements = 0
+
+
+_request_db: ContextVar[Optional[RequestDbStats]] = ContextVar("request_db", default=None)
+
+
+def current_db_stats() -> Optional[RequestDbStats]:
+    return _request_db.get()
+
+
+# Заранее созданные объекты метрик одного маршрута и метода
+class RouteMetrics:
+    __slots__ = ("latency", "size", "db_time", "db_statements", "statuses", "exceptions")
+
+    def __init__(self, route: str, method: str):
+        self.latency = http_latency.labels(route, method)
+        self.size = http_response_size.labels(route, method)
+        self.db_time = http_db_time.labels(route, method)
+        self.db_statements = http_db_statements.labels(route, method)
+        self.statuses = [http_requests.labels(route, method, status) for status in STATUS_CLASSES]
+        self.exceptions = http_exceptions.labels(route, method)
+
+    def observe(self, elapsed: float, status: int, size: int, db: RequestDbStats) -> None:
+        self.latency.observe(elapsed)
+        self.size.observe(size)
+        self.db_time.observe(db.time)
+        self.db_statements.observe(db.statements)
+        self.statuses[min(max(status // 100, 1), 5) - 1].inc()
+
+
+# Pure ASGI middleware (без BaseHTTPMiddleware: не буферизует потоковые ответы)
+class MetricsMiddleware:
+    def __init__(self, app, routes: Dict[int, Dict[str, RouteMetrics]], unmatched: Dict[str, RouteMetrics]):
+        self.app = app
+        self.routes = routes
+        self.unmatched = unmatched
+
+    def _metrics_for(self, scope) -> RouteMetrics:
+        method = scope["method"]
+        by_method = self.routes.get(id(scope.get("route")), self.unmatched)
+        return by_method.get(method) or self.unmatched.get(method) or self.unmatched["OTHER"]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        db = RequestDbStats()
+        token = _request_db.set(db)
+        http_in_flight.inc()
+        started = time.perf_counter()
+        response = [500, 0]  # статус, размер тела
+
+        async def send_with_metrics(message):
+            if message["type"] == "http.response.start":
+                response[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                response[1] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            self._metrics_for(scope).exceptions.inc()
+            response[0] = 500
+            raise
+        finally:
+            http_in_flight.dec()
+            _request_db.reset(token)
+            self._metrics_for(scope).observe(time.perf_counter() - started, response[0], response[1], db)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    keyword = statement.lstrip()[:6].upper()
+    _db_operation.get(keyword, _db_operation["OTHER"]).observe(elapsed)
+    db = _request_db.get()
+    if db is not None:
+        db.time += elapsed
+        db.statements += 1
+
+
+# Подключает замер SQL к engine (для асинхронного - async_engine.sync_engine)
+def instrument_engine(engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+
+
+# Подключает middleware и заранее создаёт метрики для каждого маршрута приложения.
+# Вызывается после добавления всех маршрутов.
+def instrument(app) -> None:
+    # Ключ - id(route): маршруты Starlette определяют __eq__ и не хешируются
+    routes: Dict[int, Dict[str, RouteMetrics]] = {}
+    for route in app.routes:
+        methods = getattr(route, "methods", None)
+        if not methods:
+            continue
+        routes[id(route)] = {method: RouteMetrics(route.path, method) for method in methods}
+    unmatched = {method: RouteMetrics(UNMATCHED_ROUTE, method) for method in HTTP_METHODS}
+    unmatched["OTHER"] = RouteMetrics(UNMATCHED_ROUTE, "OTHER")
+    app.add_middleware(MetricsMiddleware, routes=routes, unmatched=unmatched)
@@ -0,0 +1,146 @@
+import base64
+import json
+from typing import Optional, Sequence, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import select, and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from services.serialization import FAST_SERIALIZATION, schema_columns, rows_to_json, json_response
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+
+# Заголовок, в котором клиент получает курсор следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# Курсор - это значения ключа сортировки последней строки страницы,
+# упакованные в непрозрачную для клиента base64-строку
+def encode_cursor(values: Sequence) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> list:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+# Параметры страницы: общая зависимость для всех списочных эндпоинтов
+class PageParams:
+    def __init__(
+        self,
+        limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT),
+        cursor: Optional[str] = Query(None, description="Значение заголовка X-Next-Cursor предыдущей страницы"),
+        fields: Optional[str] = Query(None, description="Список полей через запятую, например id,name,country"),
+    ):
+        self.limit = limit
+        self.cursor = decode_cursor(cursor) if cursor else None
+        self.fields = None
+        if fields:
+            # dict.fromkeys убирает повторы, сохраняя порядок
+            self.fields = list(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip())) or None
+
+
+# Условие "строго после курсора" для ключа из нескольких колонок:
+# (a, b) > (va, vb)  =>  a > va OR (a = va AND b > vb), с учетом направления каждой колонки
+def _after_cursor(order_by: Sequence[Tuple], values: Sequence):
+    if len(values) != len(order_by):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    conditions = []
+    for i, (column, descending) in enumerate(order_by):
+        equal_prefix = [order_by[j][0] == values[j] for j in range(i)]
+        step = column < values[i] if descending else column > values[i]
+        conditions.append(and_(*equal_prefix, step))
+    return or_(*conditions)
+
+
+# Запрос страницы: (select, выбираемые поля или None, ключи кортежа). Отдельно от paginate,
+# чтобы tests/test_query_plans.py проверял планы тех же запросов, что выполняют обработчики.
+def page_statement(
+    model,
+    page: PageParams,
+    where: Sequence = (),
+    order_by: Optional[Sequence[Tuple]] = None,
+    allowed_fields: Optional[Sequence[str]] = None,
+    options: Sequence = (),
+    schema=None,
+):
+    order_by = list(order_by or [(model.id, False)])
+
+    fields = page.fields
+    if fields:
+        allowed = set(allowed_fields or ()) | {"id"}
+        unknown = [name for name in fields if name not in allowed]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    elif schema is not None and not options and FAST_SERIALIZATION:
+        fields = schema_columns(model, schema)
+
+    keys = None
+    if fields:
+        # Загружаем только нужные колонки плюс ключ сортировки (в конце кортежа)
+        keys = list(fields) + [column.key for column, _ in order_by if column.key not in fields]
+        query = select(*[getattr(model, name) for name in keys])
+    else:
+        query = select(model).options(*options)
+
+    query = query.where(*where)
+    if page.cursor is not None:
+        query = query.where(_after_cursor(order_by, page.cursor))
+    query = query.order_by(*[column.desc() if descending else column.asc() for column, descending in order_by])
+    # Берём на одну строку больше, чтобы понять, есть ли следующая страница
+    return query.limit(page.limit + 1), fields, keys
+
+
+# Keyset-пагинация с проекцией полей.
+# order_by - список пар (колонка, по убыванию); последней должна идти уникальная колонка (id).
+# allowed_fields - поля, которые можно запросить через fields= (обычно поля схемы ответа).
+# not_found - если задано, пустая первая страница отдаёт 404 с этим текстом.
+# options - опции загрузки связей (selectinload/joinedload), только без fields=.
+# schema - схема ответа: если все её поля - колонки модели, страница выбирается кортежами
+# и отдаётся готовым JSON (services/serialization.py) вместо ORM-объектов.
+async def paginate(
+    db: AsyncSession,
+    model,
+    page: PageParams,
+    response: Response,
+    where: Sequence = (),
+    order_by: Optional[Sequence[Tuple]] = None,
+    allowed_fields: Optional[Sequence[str]] = None,
+    not_found: Optional[str] = None,
+    options: Sequence = (),
+    schema=None,
+):
+    order_by = list(order_by or [(model.id, False)])
+    query, fields, keys = page_statement(model, page, where, order_by, allowed_fields, options, schema)
+
+    result = await db.execute(query)
+    rows = result.all() if fields else result.scalars().all()
+
+    if not rows and not_found and page.cursor is None:
+        raise HTTPException(status_code=404, detail=not_found)
+
+    next_cursor = None
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        if fields:
+            next_cursor = encode_cursor([last[keys.index(column.key)] for column, _ in order_by])
+        else:
+            next_cursor = encode_cursor([getattr(last, column.key) for column, _ in order_by])
+
+    if fields:
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        # Кортежи не проходят response_model: JSON собирается сразу (лишние колонки ключа сортировки отбрасывает zip)
+        return json_response(rows_to_json(fields, rows), headers=headers)
+
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return rows
@@ -0,0 +1,63 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+# Единая стоимость bcrypt для всего приложения. При изменении старые хеши
+# пересчитываются при следующем успешном входе (см. verify_password).
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+
+# Размер пула для хеширования и максимум задач в очереди (выполняемые + ожидающие)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", PASSWORD_HASH_WORKERS * 8))
+
+# Контекст хеширования паролей создаётся при первом использовании: passlib и backend bcrypt
+# не загружаются при импорте приложения (прогревается в services/readiness.py)
+@functools.lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+    context.handler("bcrypt").get_backend()
+    return context
+
+# bcrypt отпускает GIL, поэтому потоков достаточно, процессы не нужны
+_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_pending = 0
+rejected = 0
+
+
+# Выполняет fn в пуле; при переполнении очереди отвечает 503, а не копит задачи
+async def _run_in_pool(fn, *args):
+    global _pending, rejected
+    if _pending >= PASSWORD_HASH_QUEUE_LIMIT:
+        rejected += 1
+        raise HTTPException(status_code=503, detail="Server is busy, try again later", headers={"Retry-After": "1"})
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, fn, *args)
+    finally:
+        _pending -= 1
+
+
+async def hash_password(password: str) -> str:
+    return await _run_in_pool(password_context().hash, password)
+
+
+# Возвращает (пароль верный, новый хеш или None). Новый хеш появляется,
+# если текущий создан с другой стоимостью - его нужно сохранить.
+async def verify_password(password: str, hashed: str):
+    return await _run_in_pool(password_context().verify_and_update, password, hashed)
+
+
+def stats() -> dict:
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        "pending": _pending,
+        "rejected": rejected,
+        "rounds": BCRYPT_ROUNDS,
+    }
@@ -0,0 +1,62 @@
+from typing import Dict
+from config.database import async_engine, read_async_engine, pool_checkout_observers, DB_MAX_OVERFLOW
+from services.latency import LatencyWindow
+from services.readRouting import read_routing
+
+
+# Счётчики пула: ожидание соединения, таймауты, пик занятых соединений
+class PoolMetrics:
+    def __init__(self):
+        self.wait = LatencyWindow()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.peak_checked_out = 0
+
+
+# Счётчики по классу пула: у каждого engine свой класс (config/database.py), и он не меняется при dispose()
+_metrics: Dict[type, PoolMetrics] = {}
+
+
+def _metrics_for(pool) -> PoolMetrics:
+    metrics = _metrics.get(type(pool))
+    if metrics is None:
+        metrics = _metrics[type(pool)] = PoolMetrics()
+    return metrics
+
+
+def _observe(pool, seconds: float, outcome: str) -> None:
+    metrics = _metrics_for(pool)
+    metrics.wait.add(seconds)
+    if outcome == "timeout":
+        metrics.timeouts += 1
+    elif outcome == "ok":
+        metrics.checkouts += 1
+        metrics.peak_checked_out = max(metrics.peak_checked_out, pool.checkedout())
+
+
+pool_checkout_observers.append(_observe)
+
+
+def _pool_stats(engine_) -> dict:
+    pool = engine_.pool
+    metrics = _metrics_for(pool)
+    capacity = pool.size() + DB_MAX_OVERFLOW
+    return {
+        "size": pool.size(),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checked_out": pool.checkedout(),
+        "saturation": round(pool.checkedout() / capacity, 3) if capacity else None,
+        "peak_checked_out": metrics.peak_checked_out,
+        "checkouts": metrics.checkouts,
+        "timeouts": metrics.timeouts,
+        "wait": metrics.wait.stats(),
+    }
+
+
+# Счётчики пулов соединений: ожидание выдачи соединения и занятость пула
+def pool_stats() -> dict:
+    stats = {"primary": _pool_stats(async_engine.sync_engine)}
+    if read_async_engine is not async_engine:
+        stats["replica"] = _pool_stats(read_async_engine.sync_engine)
+    stats["read_routing"] = read_routing.stats()
+    return stats
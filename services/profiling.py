@@ -0,0 +1,285 @@
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import List, Optional
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import fastapi.routing
+from services.metrics import current_db_stats
+
+# Профилирование по запросу (PROFILING=1): заголовок Server-Timing с разбивкой времени запроса,
+# журнал медленных SQL с планом и сэмплирующий профайлер. Выключенное - ничего не подключает.
+PROFILING_ENABLED = os.getenv("PROFILING", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "1") == "1"
+SLOW_QUERY_HISTORY = int(os.getenv("SLOW_QUERY_HISTORY", 100))
+# Писать параметры медленных SQL в журнал и /profiling/slow-queries. По умолчанию нет:
+# среди них email, хеши паролей и другие данные пользователей
+SLOW_QUERY_PARAMETERS = os.getenv("SLOW_QUERY_PARAMETERS", "0") == "1"
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", 60))
+
+logger = logging.getLogger(__name__)
+
+# Операторы, план которых можно получить без выполнения
+EXPLAINABLE = ("SELECT", "UPDATE", "DELETE", "WITH")
+MAX_LOGGED_PARAMS = 2000
+
+
+# Время запроса по частям, секунды. Части не пересекаются: из auth и orm вычтено время SQL.
+class RequestTimings:
+    __slots__ = ("path", "orm", "auth", "serialize", "serialize_started")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.orm = 0.0
+        self.auth = 0.0
+        self.serialize = 0.0
+        self.serialize_started: Optional[float] = None
+
+
+_timings: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+
+def _db_time() -> float:
+    db = current_db_stats()
+    return db.time if db is not None else 0.0
+
+
+# Декоратор для зависимостей и функций: время выполнения без SQL добавляется к части field.
+# Сигнатура сохраняется (functools.wraps), поэтому FastAPI видит те же параметры.
+def timed(field: str):
+    def decorate(fn):
+        if not PROFILING_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return await fn(*args, **kwargs)
+            started = time.perf_counter()
+            db_before = _db_time() + timings.orm
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started - (_db_time() + timings.orm - db_before)
+                setattr(timings, field, getattr(timings, field) + max(0.0, elapsed))
+        return wrapper
+    return decorate
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    db = _db_time()
+    parts = {
+        "db": db,
+        "orm": timings.orm,
+        "auth": timings.auth,
+        "serialize": timings.serialize,
+    }
+    parts["app"] = max(0.0, total - sum(parts.values()))
+    parts["total"] = total
+    return ", ".join(f"{name};dur={value * 1000:.2f}" for name, value in parts.items())
+
+
+# Добавляет Server-Timing к ответу. Должна стоять внутри MetricsMiddleware: время SQL берётся из неё.
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings(scope["path"])
+        token = _timings.set(timings)
+        started = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                if timings.serialize_started is not None:
+                    # От начала валидации ответа до отправки заголовков: Pydantic и JSON-кодирование
+                    timings.serialize = now - timings.serialize_started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, now - started).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+
+
+_serialize_response = fastapi.routing.serialize_response
+
+
+# FastAPI вызывает serialize_response (валидация response_model и jsonable_encoder) через глобальное имя модуля
+async def _timed_serialize_response(*args, **kwargs):
+    timings = _timings.get()
+    if timings is not None and timings.serialize_started is None:
+        timings.serialize_started = time.perf_counter()
+    return await _serialize_response(*args, **kwargs)
+
+
+# Время ORM: выполнение запроса сессией вместе с созданием объектов, минус время самого SQL.
+# AsyncSession буферизует строки (prebuffer_rows), поэтому объекты создаются внутри execute.
+def _orm_execute(orm_execute_state):
+    timings = _timings.get()
+    if timings is None:
+        return None
+    started = time.perf_counter()
+    db_before = _db_time()
+    orm_before = timings.orm
+    result = orm_execute_state.invoke_statement()
+    nested = timings.orm - orm_before
+    timings.orm += max(0.0, time.perf_counter() - started - (_db_time() - db_before) - nested)
+    return result
+
+
+# Последние медленные запросы этого процесса
+slow_queries: deque = deque(maxlen=SLOW_QUERY_HISTORY)
+
+
+def _explain(conn, statement, parameters) -> List[str]:
+    dialect = conn.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+    # Отдельный курсор того же соединения: тот же драйвер и формат параметров, та же транзакция.
+    # Строки исходного запроса уже прочитаны драйвером (курсоры буферизованные).
+    explain_cursor = conn.connection.cursor()
+    try:
+        if dialect == "postgresql":
+            # Ошибка EXPLAIN не должна прерывать транзакцию обработчика
+            explain_cursor.execute("SAVEPOINT slow_query_explain")
+        try:
+            explain_cursor.execute(prefix + statement, parameters)
+            rows = explain_cursor.fetchall()
+        except Exception:
+            if dialect == "postgresql":
+                explain_cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+            raise
+        if dialect == "postgresql":
+            explain_cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+    finally:
+        explain_cursor.close()
+    if dialect == "sqlite":
+        return [str(row[-1]) for row in rows]
+    if dialect == "postgresql":
+        return [str(row[0]) for row in rows]
+    return [" ".join(f"{value}" for value in row) for row in rows]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._profiling_started = time.perf_counter()
+
+
+# Вместо значений параметров - только их количество
+def _redacted(parameters) -> str:
+    count = len(parameters) if isinstance(parameters, (list, tuple, dict)) else 1
+    return f"<{count} redacted>"
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - context._profiling_started) * 1000
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+
+    plan = None
+    explainable = (
+        SLOW_QUERY_EXPLAIN
+        and not executemany
+        and not context.execution_options.get("stream_results")
+        and statement.lstrip()[:6].upper().startswith(EXPLAINABLE)
+    )
+    if explainable:
+        try:
+            plan = _explain(conn, statement, parameters)
+        except Exception as error:
+            plan = [f"EXPLAIN failed: {type(error).__name__}: {error}"]
+
+    timings = _timings.get()
+    entry = {
+        "at": time.time(),
+        "duration_ms": round(elapsed_ms, 2),
+        "path": timings.path if timings is not None else None,
+        "statement": statement,
+        "parameters": repr(parameters)[:MAX_LOGGED_PARAMS] if SLOW_QUERY_PARAMETERS else _redacted(parameters),
+        "plan": plan,
+    }
+    slow_queries.append(entry)
+    logger.warning(
+        "Slow query %.1f ms (%s): %s\nparameters: %s%s",
+        elapsed_ms, entry["path"] or "-", statement, entry["parameters"],
+        "\nplan:\n    " + "\n    ".join(plan) if plan else "",
+    )
+
+
+# Подключает журнал медленных запросов к engine (для асинхронного - async_engine.sync_engine)
+def profile_engine(engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# Подключает Server-Timing; вызывать до instrument(app), чтобы MetricsMiddleware была снаружи
+def install(app) -> None:
+    fastapi.routing.serialize_response = _timed_serialize_response
+    if not event.contains(Session, "do_orm_execute", _orm_execute):
+        event.listen(Session, "do_orm_execute", _orm_execute)
+    app.add_middleware(ProfilingMiddleware)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+# Сэмплирующий профайлер: поток раз в interval снимает стеки всех потоков процесса
+# (sys._current_frames) и считает одинаковые стеки. Результат - collapsed stacks
+# ("поток;функция;...;функция число"), их читают flamegraph.pl и speedscope.
+class SamplingProfiler:
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self._lock.locked()
+
+    def _sample(self, seconds: float, interval: float, stacks: Counter) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if ident not in names:
+                    names = {thread.ident: thread.name for thread in threading.enumerate()}
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+
+    # Снимает стеки seconds секунд, не блокируя event loop; одновременно - только один замер
+    async def capture(self, seconds: float, interval: float) -> Optional[str]:
+        if not self._lock.acquire(blocking=False):
+            return None
+        try:
+            stacks: Counter = Counter()
+            await asyncio.to_thread(self._sample, seconds, interval, stacks)
+            return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        finally:
+            self._lock.release()
+
+
+profiler = SamplingProfiler()
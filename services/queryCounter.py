@@ -0,0 +1,27 @@
+from typing import List
+from sqlalchemy import event
+
+# Счётчик SQL-запросов: with count_queries(engine) as counter: ...; counter.count.
+# Для асинхронного engine передаётся async_engine.sync_engine.
+class QueryCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before_cursor_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, "before_cursor_execute", self._before_cursor_execute)
+
+
+def count_queries(engine) -> QueryCounter:
+    return QueryCounter(engine)
@@ -0,0 +1,99 @@
+from typing import Iterable, Optional
+from sqlalchemy import update, select, func, case, literal
+from models.landmarks import Landmark
+
+# Колонки гистограммы по количеству звёзд
+HISTOGRAM_COLUMNS = {
+    1: Landmark.rating_1,
+    2: Landmark.rating_2,
+    3: Landmark.rating_3,
+    4: Landmark.rating_4,
+    5: Landmark.rating_5,
+}
+
+
+# Строит UPDATE, который атомарно сдвигает агрегаты одной достопримечательности.
+# old/new - значение оценки до и после (None - оценки не было / больше нет).
+def rating_delta_statement(landmark_id: int, old: Optional[int] = None, new: Optional[int] = None):
+    delta = AggregateDelta()
+    delta.add(old=old, new=new)
+    return delta.statement(landmark_id)
+
+
+# Накопленное изменение агрегатов одной достопримечательности
+class AggregateDelta:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = {star: 0 for star in HISTOGRAM_COLUMNS}
+
+    def add(self, old: Optional[int] = None, new: Optional[int] = None):
+        if old is not None:
+            self.count -= 1
+            self.total -= old
+            self.histogram[old] -= 1
+        if new is not None:
+            self.count += 1
+            self.total += new
+            self.histogram[new] += 1
+
+    def statement(self, landmark_id: int):
+        new_count = Landmark.rating_count + self.count
+        new_sum = Landmark.rating_sum + self.total
+
+        # avg_rating идёт первым: MySQL вычисляет SET слева направо по уже
+        # обновлённым значениям, Postgres/SQLite - по старым. Так результат одинаков.
+        values = [
+            (Landmark.avg_rating, case(
+                (new_count > 0, new_sum * literal(1.0) / new_count),
+                else_=literal(0.0),
+            )),
+            (Landmark.rating_count, new_count),
+            (Landmark.rating_sum, new_sum),
+            (Landmark.similarity_dirty, True),
+        ]
+        for star, change in self.histogram.items():
+            if change:
+                values.append((HISTOGRAM_COLUMNS[star], HISTOGRAM_COLUMNS[star] + change))
+
+        return update(Landmark).where(Landmark.id == landmark_id).ordered_values(*values)
+
+
+# Полный пересчёт агрегатов из таблицы ratings (для заполнения после миграции).
+# landmark_ids - пересчитать только эти достопримечательности (фоновая задача после пакетной записи).
+def recalculate_statement(landmark_ids: Optional[Iterable[int]] = None):
+    from models.rating import Rating
+
+    def star_count(star):
+        return (
+            select(func.count(Rating.id))
+            .where(Rating.landmark_id == Landmark.id, Rating.rating == star)
+            .scalar_subquery()
+        )
+
+    count = select(func.count(Rating.id)).where(Rating.landmark_id == Landmark.id).scalar_subquery()
+    total = select(func.coalesce(func.sum(Rating.rating), 0)).where(Rating.landmark_id == Landmark.id).scalar_subquery()
+    average = select(func.coalesce(func.avg(Rating.rating), 0)).where(Rating.landmark_id == Landmark.id).scalar_subquery()
+
+    values = {
+        Landmark.rating_count: count,
+        Landmark.rating_sum: total,
+        Landmark.avg_rating: average,
+        Landmark.similarity_dirty: True,
+    }
+    for star, column in HISTOGRAM_COLUMNS.items():
+        values[column] = star_count(star)
+    statement = update(Landmark).values(values)
+    if landmark_ids is not None:
+        statement = statement.where(Landmark.id.in_(list(landmark_ids)))
+    return statement
+
+
+# Сводка по оценкам из уже посчитанных колонок
+def rating_summary(landmark: Landmark) -> dict:
+    return {
+        "landmark_id": landmark.id,
+        "rating_count": landmark.rating_count,
+        "avg_rating": landmark.avg_rating,
+        "histogram": {star: getattr(landmark, column.key) for star, column in HISTOGRAM_COLUMNS.items()},
+    }
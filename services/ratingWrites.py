@@ -0,0 +1,147 @@
+import asyncio
+import contextlib
+import importlib
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import AsyncSessionLocal, async_engine
+from models.landmarks import Landmark
+from models.rating import Rating
+from models.timestamps import utcnow
+from services.ratingAggregates import rating_delta_statement
+from services.similarity import schedule_refresh
+from services.trending import trending_board
+
+
+class LandmarkNotFound(LookupError):
+    pass
+
+
+# В SQLite пишет одна транзакция за раз, а ожидание блокировки - опрос с таймаутом без очереди:
+# под нагрузкой писатели падают с "database is locked". Поэтому для SQLite записи оценок
+# выстраиваются в очередь внутри процесса; серверные СУБД ждут блокировку строки сами.
+_sqlite_writes = asyncio.Lock() if async_engine.dialect.name == "sqlite" else None
+
+
+# Один INSERT, который при существующей оценке (уникальный индекс landmark_id + user_id)
+# меняет её значение. Без предварительного SELECT: две параллельные первые оценки не упадут на дубликате.
+# Модуль диалекта импортируется здесь: при старте загружается только диалект своей базы.
+def upsert_statement(dialect_name: str, user_id: int, landmark_id: int, value: int):
+    now = utcnow()
+    values = {"user_id": user_id, "landmark_id": landmark_id, "rating": value, "created_at": now, "updated_at": now}
+    if dialect_name in ("postgresql", "sqlite"):
+        statement = importlib.import_module(f"sqlalchemy.dialects.{dialect_name}").insert(Rating).values(values)
+        return statement.on_conflict_do_update(
+            index_elements=[Rating.landmark_id, Rating.user_id],
+            set_={"rating": statement.excluded.rating, "updated_at": statement.excluded.updated_at},
+        ).returning(Rating.id)
+    if dialect_name in ("mysql", "mariadb"):
+        statement = importlib.import_module("sqlalchemy.dialects.mysql").insert(Rating).values(values)
+        # LAST_INSERT_ID(id): при обновлении lastrowid указывает на существующую строку
+        return statement.on_duplicate_key_update(rating=statement.inserted.rating, updated_at=statement.inserted.updated_at, id=func.last_insert_id(Rating.id))
+    raise RuntimeError(f"Unsupported dialect for rating upsert: {dialect_name}")
+
+
+# Блокировка строки достопримечательности до конца транзакции: запись оценок и сдвиг агрегатов
+# одной достопримечательности идут по очереди. UPDATE, а не SELECT ... FOR UPDATE: в SQLite
+# транзакция, начатая чтением, не может дождаться записи (SQLITE_BUSY), а UPDATE сразу берёт блокировку записи.
+# Мягко удалённая (services/deletion.py) - как отсутствующая.
+async def _lock_landmark(db: AsyncSession, landmark_id: int) -> None:
+    result = await db.execute(
+        update(Landmark).where(Landmark.id == landmark_id, Landmark.deleted_at.is_(None)).values(rating_count=Landmark.rating_count),
+        execution_options={"synchronize_session": False},
+    )
+    if result.rowcount == 0:
+        raise LandmarkNotFound(landmark_id)
+
+
+# Ставит (value) или снимает (None) оценку пользователя и в той же транзакции сдвигает агрегаты.
+# Возвращает (id оценки, создана ли она, записанное значение); при снятии - (id удалённой или None, False, None).
+async def write_rating(user_id: int, landmark_id: int, value: Optional[int]) -> Tuple[Optional[int], bool, Optional[int]]:
+    async with _sqlite_writes or contextlib.nullcontext(), AsyncSessionLocal() as db:
+        await _lock_landmark(db, landmark_id)
+        current = await db.execute(
+            select(Rating.id, Rating.rating).where(Rating.landmark_id == landmark_id, Rating.user_id == user_id)
+        )
+        existing = current.first()
+        old_id, old_value = existing if existing is not None else (None, None)
+
+        if value is None:
+            if old_id is not None:
+                await db.execute(delete(Rating).where(Rating.id == old_id), execution_options={"synchronize_session": False})
+                await db.execute(rating_delta_statement(landmark_id, old=old_value))
+                schedule_refresh(db)
+            await db.commit()
+            return old_id, False, None
+
+        if old_value == value:
+            await db.commit()
+            return old_id, False, value
+
+        result = await db.execute(upsert_statement(db.get_bind().dialect.name, user_id, landmark_id, value))
+        rating_id = result.lastrowid if db.get_bind().dialect.name in ("mysql", "mariadb") else result.scalar_one()
+        await db.execute(rating_delta_statement(landmark_id, old=old_value, new=value))
+        schedule_refresh(db)
+        await db.commit()
+        # Популярность растёт от новых оценок; изменение своей оценки - не новое событие
+        if old_id is None:
+            trending_board.record_rating(landmark_id, value)
+        return rating_id, old_id is None, value
+
+
+# Склейка частых повторных записей одного ключа (пользователь, достопримечательность):
+# пока запись выполняется, новые значения заменяют друг друга, и в базу уходит только последнее.
+# Каждый вызов получает результат записи, которая включила его значение или более позднее.
+class _Pending:
+    def __init__(self, value):
+        self.value = value
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class WriteCoalescer:
+    def __init__(self):
+        self._pending: Dict[Hashable, _Pending] = {}
+        self._running: Dict[Hashable, asyncio.Task] = {}
+        self.writes = 0
+        self.coalesced = 0
+
+    async def submit(self, key: Hashable, value, write: Callable[[object], Awaitable]):
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = self._pending[key] = _Pending(value)
+            if key not in self._running:
+                self._running[key] = asyncio.ensure_future(self._drain(key, write))
+        else:
+            pending.value = value
+            self.coalesced += 1
+        # shield: отключившийся клиент не отменяет запись, которую ждут другие
+        return await asyncio.shield(pending.done)
+
+    async def _drain(self, key: Hashable, write) -> None:
+        try:
+            while key in self._pending:
+                pending = self._pending.pop(key)
+                self.writes += 1
+                try:
+                    result = await write(pending.value)
+                except Exception as error:
+                    pending.done.set_exception(error)
+                else:
+                    pending.done.set_result(result)
+        finally:
+            del self._running[key]
+
+    def stats(self) -> dict:
+        return {"writes": self.writes, "coalesced": self.coalesced, "in_flight": len(self._running)}
+
+
+rating_writes = WriteCoalescer()
+
+
+# Запись оценки через склейку (value=None - снять оценку). Значение в результате может быть
+# более поздним, чем value: тогда запрос склеен с последующим запросом того же пользователя.
+async def set_rating(user_id: int, landmark_id: int, value: Optional[int]) -> Tuple[Optional[int], bool, Optional[int]]:
+    return await rating_writes.submit(
+        (user_id, landmark_id), value,
+        lambda latest: write_rating(user_id, landmark_id, latest),
+    )
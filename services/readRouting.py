@@ -0,0 +1,78 @@
+import os
+from fastapi import Request, Response
+from sqlalchemy import event
+from config.database import AsyncSessionLocal, ReadSessionLocal, PrimarySession, async_engine, read_async_engine
+from services.cache import TTLCache
+
+# Сколько секунд после своей записи клиент читает с основной базы (не меньше задержки репликации)
+DB_READ_STICKY_SECONDS = float(os.getenv('DB_READ_STICKY_SECONDS', 5))
+READ_PRIMARY_COOKIE = 'read_primary'
+
+
+# Чтение своих записей: после commit с изменениями клиент какое-то время читает с основной базы.
+# Клиент узнаётся по заголовку Authorization (в памяти процесса) и по cookie (работает между воркерами).
+class ReadRouting:
+    def __init__(self, window: float):
+        self.window = window
+        self.recent_writers = TTLCache(maxsize=100000, ttl=window)
+        self.primary_reads = 0
+        self.replica_reads = 0
+
+    def mark_write(self, request: Request, response: Response) -> None:
+        authorization = request.headers.get('authorization')
+        if authorization:
+            self.recent_writers.set(authorization, True)
+        response.set_cookie(READ_PRIMARY_COOKIE, '1', max_age=max(1, int(self.window)), httponly=True, samesite='lax')
+
+    def use_primary(self, request: Request) -> bool:
+        return not self.replica or self.pinned_to_primary(request)
+
+    @property
+    def replica(self) -> bool:
+        return read_async_engine is not async_engine
+
+    # Клиент недавно записал данные и читает с основной базы, хотя реплика есть
+    def pinned_to_primary(self, request: Request) -> bool:
+        if not self.replica:
+            return False
+        authorization = request.headers.get('authorization')
+        return bool(request.cookies.get(READ_PRIMARY_COOKIE)) or bool(authorization and self.recent_writers.get(authorization))
+
+    def stats(self) -> dict:
+        return {
+            "replica": self.replica,
+            "sticky_seconds": self.window,
+            "primary_reads": self.primary_reads,
+            "replica_reads": self.replica_reads,
+        }
+
+
+read_routing = ReadRouting(DB_READ_STICKY_SECONDS)
+
+
+# Commit с записью в сессии обработчика помечает клиента. insert=True: выполняется раньше
+# обработчика config/database.py, который снимает признак session.info['wrote']
+@event.listens_for(PrimarySession, 'after_commit', insert=True)
+def _committed(session):
+    request_context = session.info.get('request')
+    if request_context is not None and session.info.get('wrote'):
+        read_routing.mark_write(*request_context)
+
+
+# Функция для получения асинхронной сессии (основная база: запись и чтение сразу после неё)
+async def get_async_db(request: Request, response: Response):
+    async with AsyncSessionLocal() as db:
+        db.sync_session.info['request'] = (request, response)
+        yield db
+
+
+# Сессия для GET-обработчиков: реплика, кроме клиентов, только что записавших данные
+async def get_read_db(request: Request):
+    if read_routing.use_primary(request):
+        read_routing.primary_reads += 1
+        factory = AsyncSessionLocal
+    else:
+        read_routing.replica_reads += 1
+        factory = ReadSessionLocal
+    async with factory() as db:
+        yield db
@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, Optional
+from sqlalchemy import text
+from config.database import async_engine, read_async_engine, ReadSessionLocal, DB_POOL_SIZE
+from services.passwords import password_context
+from services.search import landmark_search
+from services.geo import landmark_geo
+from services.trending import trending_board
+
+logger = logging.getLogger(__name__)
+
+# Сколько соединений каждого пула открыть при старте (больше pool_size не держится в пуле)
+STARTUP_POOL_WARMUP = min(int(os.getenv("STARTUP_POOL_WARMUP", DB_POOL_SIZE)), DB_POOL_SIZE)
+# Строить индексы поиска, карты и рейтинг популярности в памяти до готовности, а не на первом запросе
+STARTUP_WARM_INDEXES = os.getenv("STARTUP_WARM_INDEXES", "1") == "1"
+# Пауза между попытками прогрева, если база недоступна (растёт вдвое до максимума)
+STARTUP_RETRY_MAX = float(os.getenv("STARTUP_RETRY_MAX", 30))
+
+
+async def _ping(engine) -> None:
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+# Прогрев процесса после старта: соединения пулов, backend bcrypt, индексы в памяти.
+# Идёт в фоне, поэтому /health/live отвечает сразу, а /health/ready - только после прогрева.
+# Если база недоступна, прогрев повторяется, пока не получится.
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.attempts = 0
+        self.error: Optional[str] = None
+        self.steps: Dict[str, float] = {}
+        self._started = time.perf_counter()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _step(self, name: str, awaitable) -> None:
+        started = time.perf_counter()
+        await awaitable
+        self.steps[name] = round(time.perf_counter() - started, 4)
+
+    async def _warm_pools(self) -> None:
+        engines = {id(engine): engine for engine in (async_engine, read_async_engine)}.values()
+        await asyncio.gather(*(_ping(engine) for engine in engines for _ in range(max(1, STARTUP_POOL_WARMUP))))
+
+    async def _warm_indexes(self) -> None:
+        async with ReadSessionLocal() as db:
+            if landmark_search.uses_memory(db.get_bind().dialect.name):
+                await landmark_search.ensure_built(db)
+            if landmark_geo.uses_memory:
+                await landmark_geo.ensure_built(db)
+            await trending_board.ensure_built(db)
+
+    async def warm_up(self) -> None:
+        delay = 0.5
+        while True:
+            self.attempts += 1
+            try:
+                await self._step("pools", self._warm_pools())
+                await self._step("password_hashing", asyncio.to_thread(password_context))
+                if STARTUP_WARM_INDEXES:
+                    await self._step("indexes", self._warm_indexes())
+            except Exception as error:
+                self.error = f"{type(error).__name__}: {error}"
+                logger.warning("Warm-up attempt %d failed, retrying in %.1fs: %s", self.attempts, delay, self.error)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, STARTUP_RETRY_MAX)
+                continue
+            self.error = None
+            self.steps["total"] = round(time.perf_counter() - self._started, 4)
+            self.ready = True
+            return
+
+    def start(self) -> None:
+        self._started = time.perf_counter()
+        self._task = asyncio.ensure_future(self.warm_up())
+
+    async def stop(self) -> None:
+        self.ready = False
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "attempts": self.attempts,
+            "error": self.error,
+            "seconds": dict(self.steps),
+        }
+
+
+readiness = Readiness()
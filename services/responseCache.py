@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+from services.readRouting import read_routing, DB_READ_STICKY_SECONDS
+from services.cache import TTLCache
+
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_URL = os.getenv("RESPONSE_CACHE_URL", "redis://localhost:6379/0")
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 5000))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 30))
+
+# Заголовки, которые сохраняются вместе с телом ответа
+CACHED_HEADERS = ("X-Next-Cursor",)
+
+
+# Хранилище кэша в памяти процесса. Инвалидация действует только на текущий
+# воркер, в остальных запись доживает до TTL. С отдельным воркером задач (worker.py) не годится:
+# задачи сбрасывают кэш в своём процессе, поэтому worker.py и JOB_WORKER_INPROCESS=0 требуют redis.
+class MemoryBackend:
+    def __init__(self, maxsize: int, ttl: float):
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.versions: Dict[str, Tuple[int, float]] = {}
+
+    async def get(self, key: str):
+        return self.entries.get(key)
+
+    async def set(self, key: str, entry: tuple):
+        self.entries.set(key, entry)
+
+    # (версия, время её смены по unix)
+    async def version(self, namespace: str) -> Tuple[int, float]:
+        return self.versions.get(namespace, (0, 0.0))
+
+    async def bump(self, namespace: str) -> int:
+        version = self.versions.get(namespace, (0, 0.0))[0] + 1
+        self.versions[namespace] = (version, time.time())
+        return version
+
+
+# Хранилище в Redis (или совместимом сервере): общее для всех воркеров.
+# Нужен пакет redis; клиент создаётся только если выбран этот backend.
+class RedisBackend:
+    def __init__(self, url: str, ttl: float, prefix: str = "landmarks:response:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    async def get(self, key: str):
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        meta, body = raw.split(b"\n", 1)
+        etag, headers = json.loads(meta)
+        return etag, headers, body
+
+    async def set(self, key: str, entry: tuple):
+        etag, headers, body = entry
+        raw = json.dumps([etag, headers]).encode("utf-8") + b"\n" + body
+        await self.client.set(self.prefix + key, raw, ex=self.ttl)
+
+    async def version(self, namespace: str) -> Tuple[int, float]:
+        version, bumped_at = await self.client.mget(self.prefix + "version:" + namespace, self.prefix + "bumped:" + namespace)
+        return int(version or 0), float(bumped_at or 0)
+
+    async def bump(self, namespace: str) -> int:
+        async with self.client.pipeline(transaction=True) as pipeline:
+            pipeline.incr(self.prefix + "version:" + namespace)
+            pipeline.set(self.prefix + "bumped:" + namespace, time.time())
+            version, _ = await pipeline.execute()
+        return version
+
+
+# Кэш готовых JSON-ответов со строгими ETag.
+# Ключ включает версию пространства имён ("landmarks", "photos"), поэтому
+# инвалидация - это одно увеличение счётчика, без перебора ключей.
+# С репликой кэш не нарушает чтение своих записей: клиент, недавно писавший (читает с основной базы),
+# кэш не использует, а ответ, загруженный с реплики раньше DB_READ_STICKY_SECONDS после смены версии,
+# не сохраняется - реплика могла ещё не получить изменение, из-за которого версия сменилась.
+class ResponseCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bypassed = 0
+        self.invalidations: Dict[str, int] = {}
+
+    def _adapter(self, response_model) -> TypeAdapter:
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        return adapter
+
+    def _serialize(self, response_model, data) -> bytes:
+        adapter = self._adapter(response_model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+    @staticmethod
+    def _request_key(request: Request) -> str:
+        query = "&".join(f"{k}={v}" for k, v in sorted(request.query_params.multi_items()))
+        return f"{request.url.path}?{query}"
+
+    @staticmethod
+    def _etag(body: bytes) -> str:
+        return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+    @staticmethod
+    def _matches(request: Request, etag: str) -> bool:
+        header = request.headers.get("if-none-match")
+        if not header:
+            return False
+        return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+    def _build(self, request: Request, entry: tuple) -> Response:
+        etag, headers, body = entry
+        # no-cache: клиент может хранить ответ, но перепроверяет его по ETag
+        headers = {**headers, "ETag": etag, "Cache-Control": "no-cache"}
+        if self._matches(request, etag):
+            # Тело не отправляется и заново не сериализуется
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    # Отдаёт ответ из кэша или вызывает load(response) и кэширует результат.
+    # load может вернуть ORM-объекты (сериализуются через response_model) или готовый Response.
+    async def respond(
+        self,
+        request: Request,
+        namespace: str,
+        response_model,
+        load: Callable[[Response], Awaitable[Any]],
+    ) -> Response:
+        if read_routing.pinned_to_primary(request):
+            self.bypassed += 1
+            return self._build(request, await self._load(response_model, load))
+
+        version, bumped_at = await self.backend.version(namespace)
+        key = f"{namespace}:{version}:{self._request_key(request)}"
+
+        entry = await self.backend.get(key)
+        if entry is not None:
+            self.hits += 1
+            return self._build(request, entry)
+
+        self.misses += 1
+        entry = await self._load(response_model, load)
+        if not read_routing.replica or time.time() - bumped_at >= DB_READ_STICKY_SECONDS:
+            await self.backend.set(key, entry)
+        return self._build(request, entry)
+
+    async def _load(self, response_model, load) -> tuple:
+        response = Response()
+        data = await load(response)
+        if isinstance(data, Response):
+            body = bytes(data.body)
+            headers = data.headers
+        else:
+            body = self._serialize(response_model, data)
+            headers = response.headers
+        saved_headers = {name: headers[name] for name in CACHED_HEADERS if name in headers}
+        return self._etag(body), saved_headers, body
+
+    # Вызывается обработчиками create/update/delete соответствующего ресурса
+    async def invalidate(self, *namespaces: str) -> None:
+        for namespace in namespaces:
+            await self.backend.bump(namespace)
+            self.invalidations[namespace] = self.invalidations.get(namespace, 0) + 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "not_modified": self.not_modified,
+            "bypassed": self.bypassed,
+            "invalidations": dict(self.invalidations),
+        }
+
+
+def _create_backend():
+    if RESPONSE_CACHE_BACKEND == "redis":
+        return RedisBackend(RESPONSE_CACHE_URL, RESPONSE_CACHE_TTL)
+    return MemoryBackend(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL)
+
+
+response_cache = ResponseCache(_create_backend())
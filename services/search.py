@@ -0,0 +1,280 @@
+import bisect
+import heapq
+import math
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import select, func, literal_column, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+from models.landmarks import Landmark
+from services.deletion import hidden_landmarks_since
+from services.memoryIndex import LazyMemoryIndex
+
+# auto/database - полнотекстовый индекс базы для MySQL/PostgreSQL, memory - индекс в памяти процесса
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto")
+# Сколько терминов максимум подставляется вместо префикса (берутся самые частые)
+MAX_PREFIX_EXPANSIONS = int(os.getenv("SEARCH_MAX_PREFIX_EXPANSIONS", 50))
+EXPANSION_REFRESH = 1000
+
+# Вес поля в ранжировании
+FIELD_WEIGHTS = {"name": 3.0, "location": 2.0, "description": 1.0}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(value: Optional[str]) -> List[str]:
+    if not value:
+        return []
+    return _TOKEN_RE.findall(value.lower())
+
+
+# Инвертированный индекс по name/location/description в памяти процесса.
+# Термины хранятся ещё и отсортированным списком, чтобы префикс искался бинарным поиском.
+# Кроме postings (term -> {id: вес}) документы разложены по корзинам одинакового веса
+# (term -> {вес: {id}}): вес принимает всего несколько значений, поэтому документы термина
+# можно перебирать по убыванию веса без сортировки, а обновление остаётся O(1).
+class InvertedIndex:
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = {}  # term -> {landmark_id: вес}
+        self.impacts: Dict[str, Dict[float, Set[int]]] = {}  # term -> {вес: {landmark_id}}
+        self.terms: List[str] = []  # отсортированный словарь
+        self.doc_terms: Dict[int, Set[str]] = {}
+        self.docs: Dict[int, Tuple[str, Optional[str], Optional[str]]] = {}  # id -> (name, location, country)
+        # Подстановки для коротких префиксов ("a", "mo") - самые дорогие, поэтому кэшируются.
+        # vocabulary_version растёт при появлении/исчезновении термина.
+        self.vocabulary_version = 0
+        self._expansions: Dict[str, Tuple[int, List[str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def add(self, landmark_id: int, name: str, description: Optional[str], location: Optional[str], country: Optional[str]) -> None:
+        self.remove(landmark_id)
+
+        weights: Dict[str, float] = {}
+        for field, value in (("name", name), ("location", location), ("description", description)):
+            for term in tokenize(value):
+                weights[term] = weights.get(term, 0.0) + FIELD_WEIGHTS[field]
+
+        for term, weight in weights.items():
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = {}
+                self.impacts[term] = {}
+                bisect.insort(self.terms, term)
+                self.vocabulary_version += 1
+            # Логарифм сглаживает длинные описания с повторами
+            impact = round(1.0 + math.log(weight), 4)
+            posting[landmark_id] = impact
+            self.impacts[term].setdefault(impact, set()).add(landmark_id)
+
+        self.doc_terms[landmark_id] = set(weights)
+        self.docs[landmark_id] = (name, location, country)
+
+    def remove(self, landmark_id: int) -> None:
+        for term in self.doc_terms.pop(landmark_id, ()):
+            posting = self.postings[term]
+            impact = posting.pop(landmark_id)
+            bucket = self.impacts[term][impact]
+            bucket.discard(landmark_id)
+            if not bucket:
+                del self.impacts[term][impact]
+            if not posting:
+                del self.postings[term]
+                del self.impacts[term]
+                index = bisect.bisect_left(self.terms, term)
+                if index < len(self.terms) and self.terms[index] == term:
+                    del self.terms[index]
+                self.vocabulary_version += 1
+        self.docs.pop(landmark_id, None)
+
+    # Термины, начинающиеся с prefix. Если их больше MAX_PREFIX_EXPANSIONS, берутся самые
+    # частые; такой выбор пересчитывается не чаще раза в EXPANSION_REFRESH изменений словаря.
+    def _expand(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + "\U0010ffff")
+        if end - start <= MAX_PREFIX_EXPANSIONS:
+            return self.terms[start:end]
+
+        cached = self._expansions.get(prefix)
+        if cached is not None and self.vocabulary_version - cached[0] < EXPANSION_REFRESH:
+            return [term for term in cached[1] if term in self.postings]
+
+        terms = heapq.nlargest(MAX_PREFIX_EXPANSIONS, self.terms[start:end], key=lambda term: len(self.postings[term]))
+        self._expansions[prefix] = (self.vocabulary_version, terms)
+        return terms
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self.docs) / len(self.postings[term]))
+
+    # Корзины слова запроса по убыванию оценки: (оценка, множество id).
+    # Для префикса это корзины всех подходящих терминов.
+    def _buckets(self, terms: List[str]) -> List[Tuple[float, Set[int]]]:
+        buckets = []
+        for term in terms:
+            idf = self._idf(term)
+            for impact, ids in self.impacts[term].items():
+                buckets.append((impact * idf, ids))
+        buckets.sort(key=lambda bucket: bucket[0], reverse=True)
+        return buckets
+
+    # Все слова запроса должны встретиться (AND); последнее слово - префикс, если prefix=True.
+    # Оценка - сумма tf-idf по словам запроса.
+    # Сочетания корзин (по одной на слово) перебираются по убыванию суммы оценок, документы
+    # сочетания - пересечение множеств (выполняется на C). Первое сочетание, где встретился
+    # документ, даёт его итоговую оценку, поэтому перебор останавливается на limit документах.
+    def search(self, query: str, limit: int = 20, prefix: bool = True) -> List[Tuple[int, float]]:
+        words = tokenize(query)
+        if not words or not self.docs:
+            return []
+
+        per_word: List[List[Tuple[float, Set[int]]]] = []
+        for i, word in enumerate(words):
+            is_prefix = prefix and i == len(words) - 1
+            terms = self._expand(word) if is_prefix else ([word] if word in self.postings else [])
+            if not terms:
+                return []
+            per_word.append(self._buckets(terms))
+
+        def combo_score(combo: Tuple[int, ...]) -> float:
+            return sum(buckets[position][0] for buckets, position in zip(per_word, combo))
+
+        start = (0,) * len(per_word)
+        queue = [(-combo_score(start), start)]
+        queued = {start}
+        hits: List[Tuple[int, float]] = []
+        seen: Set[int] = set()
+
+        while queue and len(hits) < limit:
+            negative_score, combo = heapq.heappop(queue)
+
+            sets = sorted((buckets[position][1] for buckets, position in zip(per_word, combo)), key=len)
+            ids = sets[0].intersection(*sets[1:]) if len(sets) > 1 else sets[0]
+            ids = ids - seen
+            if ids:
+                # При равной оценке - меньший id первым
+                for landmark_id in heapq.nsmallest(limit - len(hits), ids):
+                    hits.append((landmark_id, -negative_score))
+                seen |= ids
+
+            for index in range(len(combo)):
+                if combo[index] + 1 < len(per_word[index]):
+                    successor = combo[:index] + (combo[index] + 1,) + combo[index + 1:]
+                    if successor not in queued:
+                        queued.add(successor)
+                        heapq.heappush(queue, (-combo_score(successor), successor))
+
+        return hits
+
+
+# Поиск с выбором реализации под диалект базы
+class LandmarkSearch(LazyMemoryIndex):
+    def __init__(self, backend: str = SEARCH_BACKEND):
+        super().__init__()
+        self.backend = backend
+        self.index = InvertedIndex()
+
+    # У SQLite полнотекстового индекса нет - для него всегда индекс в памяти
+    def uses_memory(self, dialect_name: str) -> bool:
+        return self.backend == "memory" or dialect_name not in ("mysql", "mariadb", "postgresql")
+
+    def load_statement(self):
+        return select(Landmark.id, Landmark.name, Landmark.description, Landmark.location, Landmark.country)
+
+    def load_row(self, row) -> None:
+        self.index.add(*row)
+
+    # Созданные и изменённые другими процессами (по индексу ix_landmarks_updated_at)
+    def changed_statement(self, since):
+        return self.load_statement().where(Landmark.updated_at >= since)
+
+    def removed_statement(self, since):
+        return hidden_landmarks_since(since)
+
+    # Инкрементальные обновления из обработчиков create/update/delete
+    def add(self, landmark) -> None:
+        if self.touch(landmark.id):
+            self.index.add(landmark.id, landmark.name, landmark.description, landmark.location, landmark.country)
+
+    def add_many(self, landmarks: Iterable) -> None:
+        for landmark in landmarks:
+            self.add(landmark)
+
+    def remove(self, landmark_id: int) -> None:
+        if self.touch(landmark_id):
+            self.index.remove(landmark_id)
+
+    def remove_many(self, landmark_ids: Iterable[int]) -> None:
+        for landmark_id in landmark_ids:
+            self.remove(landmark_id)
+
+    async def search(self, db: AsyncSession, query: str, limit: int = 20, prefix: bool = True) -> List[dict]:
+        dialect_name = db.get_bind().dialect.name
+        if self.uses_memory(dialect_name):
+            await self.ensure_built(db)
+            found = self.index.search(query, limit=limit, prefix=prefix)
+            # Удалённые другими процессами убираются, и поиск повторяется
+            while await self.drop_missing(db, Landmark, [landmark_id for landmark_id, _ in found]):
+                found = self.index.search(query, limit=limit, prefix=prefix)
+            hits = []
+            for landmark_id, score in found:
+                name, location, country = self.index.docs[landmark_id]
+                hits.append({"id": landmark_id, "name": name, "location": location, "country": country, "score": round(score, 4)})
+            return hits
+
+        statement = search_statement(dialect_name, query, limit, prefix)
+        if statement is None:
+            return []
+        result = await db.execute(statement)
+        return [dict(row._mapping) for row in result]
+
+
+# Запрос к полнотекстовому индексу базы (MySQL/PostgreSQL); None - в запросе нет слов
+def search_statement(dialect_name: str, query: str, limit: int = 20, prefix: bool = True):
+    words = tokenize(query)
+    if not words:
+        return None
+    if dialect_name == "postgresql":
+        statement = _postgres_query(words, prefix)
+    else:
+        statement = _mysql_query(words, prefix)
+    return statement.limit(limit)
+
+
+# Выражение должно совпадать с индексом ix_landmarks_fulltext из миграции 0004
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce(landmarks.name, '') || ' ' || "
+    "coalesce(landmarks.location, '') || ' ' || coalesce(landmarks.description, ''))"
+)
+
+
+def _postgres_query(words: List[str], prefix: bool):
+    terms = [f"{word}:*" if prefix and i == len(words) - 1 else word for i, word in enumerate(words)]
+    tsquery = func.to_tsquery(literal_column("'simple'"), bindparam("tsquery", " & ".join(terms)))
+    document = literal_column(POSTGRES_DOCUMENT)
+    score = func.ts_rank(document, tsquery).label("score")
+    return (
+        select(Landmark.id, Landmark.name, Landmark.location, Landmark.country, score)
+        .where(document.op("@@")(tsquery))
+        .order_by(score.desc(), Landmark.id)
+    )
+
+
+def _mysql_query(words: List[str], prefix: bool):
+    from sqlalchemy.dialects.mysql import match as mysql_match
+
+    # Boolean mode: +слово обязательно, слово* - префикс
+    terms = [f"+{word}*" if prefix and i == len(words) - 1 else f"+{word}" for i, word in enumerate(words)]
+    # Колонки и порядок - как в индексе ft_landmarks_text из миграции 0004
+    relevance = mysql_match(
+        Landmark.name, Landmark.description, Landmark.location, against=" ".join(terms)
+    ).in_boolean_mode()
+    score = relevance.label("score")
+    return (
+        select(Landmark.id, Landmark.name, Landmark.location, Landmark.country, score)
+        .where(relevance > 0)
+        .order_by(score.desc(), Landmark.id)
+    )
+
+
+landmark_search = LandmarkSearch()
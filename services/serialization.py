@@ -0,0 +1,36 @@
+import os
+from typing import Dict, List, Optional, Sequence
+import orjson
+from fastapi import Response
+from sqlalchemy import inspect
+
+# Быстрая сериализация списков: запрос выбирает только колонки схемы ответа (кортежи, без ORM-объектов),
+# строки кодируются orjson сразу в байты, без проверки каждого объекта через Pydantic.
+# Схемы из schemas/*.py остаются контрактом: по ним строится список колонок и OpenAPI (response_model).
+# FAST_SERIALIZATION=0 возвращает обычный путь (ORM-объекты + response_model).
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") == "1"
+
+_schema_columns: Dict[tuple, Optional[List[str]]] = {}
+
+
+# Поля схемы, если все они - колонки модели; иначе None (схему нельзя собрать из кортежей)
+def schema_columns(model, schema) -> Optional[List[str]]:
+    key = (model, schema)
+    if key not in _schema_columns:
+        columns = inspect(model).columns
+        fields = list(schema.model_fields)
+        _schema_columns[key] = fields if all(name in columns for name in fields) else None
+    return _schema_columns[key]
+
+
+def dumps(data) -> bytes:
+    return orjson.dumps(data)
+
+
+# Строки-кортежи в JSON-массив объектов с ключами keys
+def rows_to_json(keys: Sequence[str], rows) -> bytes:
+    return orjson.dumps([dict(zip(keys, row)) for row in rows])
+
+
+def json_response(body: bytes, headers: Optional[dict] = None) -> Response:
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -0,0 +1,431 @@
+import logging
+import os
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Sequence
+from sqlalchemy import select, update, delete, insert, func, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from config.database import engine
+from models.landmarks import Landmark
+from models.rating import Rating
+from models.similarity import LandmarkSimilarity
+from services.jobs import enqueue, PRIORITY_LOW
+from services.ratingAggregates import HISTOGRAM_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+# Соседей на достопримечательность
+SIMILARITY_TOP_K = int(os.getenv("SIMILARITY_TOP_K", 20))
+# Меньше общих оценок - пара не считается похожей
+SIMILARITY_MIN_COMMON = int(os.getenv("SIMILARITY_MIN_COMMON", 2))
+# Штраф за малое число общих оценок: score * common / (common + SHRINK)
+SIMILARITY_SHRINK = float(os.getenv("SIMILARITY_SHRINK", 10))
+# Оценка пар за один шаг (ограничивает память): примерно столько произведений на блок строк
+SIMILARITY_BLOCK_WORK = int(os.getenv("SIMILARITY_BLOCK_WORK", 10_000_000))
+# Как часто собирать отмеченные достопримечательности в задачи пересчёта, секунды
+SIMILARITY_REFRESH_INTERVAL = float(os.getenv("SIMILARITY_REFRESH_INTERVAL", 60))
+# Достопримечательностей в одной задаче инкрементального пересчёта
+SIMILARITY_REFRESH_CHUNK = int(os.getenv("SIMILARITY_REFRESH_CHUNK", 100))
+# Если отмечена такая доля оценённых достопримечательностей, дешевле собрать модель заново
+SIMILARITY_REBUILD_FRACTION = float(os.getenv("SIMILARITY_REBUILD_FRACTION", 0.5))
+# Оценки считаются от нейтральной: выше - "понравилось", ниже - "не понравилось".
+# Близость и рекомендации строятся на отклонениях, а не на самом факте оценки
+SIMILARITY_NEUTRAL_RATING = float(os.getenv("SIMILARITY_NEUTRAL_RATING", 3))
+
+LOAD_BATCH = 100_000
+WRITE_BATCH = 5_000
+IN_BATCH = 500
+
+
+def _chunks(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+# Оценки из запроса (user_id, landmark_id, rating) в три массива NumPy, потоком пачками
+def _load_ratings(connection, statement):
+    import numpy as np
+
+    chunks = []
+    result = connection.execution_options(stream_results=True, yield_per=LOAD_BATCH).execute(statement)
+    for rows in result.partitions():
+        chunks.append(np.array([tuple(row) for row in rows], dtype=np.int64))
+    if not chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    data = np.concatenate(chunks)
+    return data[:, 0], data[:, 1], data[:, 2]
+
+
+# Первые k элементов каждой строки по убыванию score: индексы в исходных массивах
+def _top_k(rows, scores, k: int):
+    import numpy as np
+
+    order = np.lexsort((-scores, rows))
+    ordered = rows[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    rank = np.arange(len(ordered)) - np.repeat(starts, np.diff(np.r_[starts, len(ordered)]))
+    return order[rank < k]
+
+
+# Разреженная матрица оценок: строки - пользователи, столбцы - достопримечательности,
+# значения - отклонение оценки от нейтральной. Близость двух достопримечательностей - косинус их
+# столбцов: согласие в оценках общих пользователей, а не только то, что их оценивали одни и те же люди.
+# Число общих пользователей - то же произведение бинарных столбцов.
+# Всё считается умножением разреженных матриц блоками строк, без цикла по парам в Python.
+class RatingMatrix:
+    def __init__(self, users, landmarks, ratings):
+        import numpy as np
+        from scipy import sparse
+
+        self.landmark_ids, columns = np.unique(landmarks, return_inverse=True)
+        user_ids, user_rows = np.unique(users, return_inverse=True)
+        shape = (len(user_ids), len(self.landmark_ids))
+        deviations = ratings.astype(np.float32) - np.float32(SIMILARITY_NEUTRAL_RATING)
+        self.ratings = sparse.csr_matrix((deviations, (user_rows, columns)), shape=shape)
+        # Нейтральная оценка даёт 0 в ratings, но общим пользователем остаётся
+        self.binary = sparse.csr_matrix((np.ones(len(columns), dtype=np.float32), (user_rows, columns)), shape=shape)
+        # По строке на достопримечательность: блок строк умножается на всю матрицу
+        self.ratings_by_landmark = self.ratings.T.tocsr()
+        self.binary_by_landmark = self.binary.T.tocsr()
+
+    def __len__(self) -> int:
+        return len(self.landmark_ids)
+
+    # Нормы столбцов по этой матрице (при полной сборке матрица содержит все оценки)
+    def norms(self):
+        import numpy as np
+
+        return np.sqrt(np.asarray(self.ratings.multiply(self.ratings).sum(axis=0)).ravel())
+
+    # Разбивка строк на блоки так, чтобы в каждом было около SIMILARITY_BLOCK_WORK произведений.
+    # Работа строки - сумма числа оценок у всех, кто её оценил.
+    def blocks(self, rows) -> Iterator:
+        import numpy as np
+
+        degree = np.diff(self.binary.indptr).astype(np.float64)
+        work = np.cumsum(self.binary_by_landmark[rows] @ degree)
+        start = 0
+        while start < len(rows):
+            done = work[start - 1] if start else 0.0
+            end = max(int(np.searchsorted(work, done + SIMILARITY_BLOCK_WORK, side="right")), start + 1)
+            yield rows[start:end]
+            start = end
+
+    # Все похожие пары (строка, столбец, близость, общих) для строк block - индексов столбцов матрицы.
+    # norms - нормы всех столбцов.
+    def pairs(self, block, norms):
+        import numpy as np
+
+        dots = self.ratings_by_landmark[block] @ self.ratings
+        common = self.binary_by_landmark[block] @ self.binary
+        dots.sort_indices()
+        common.sort_indices()
+
+        # Нулевые произведения (отклонения разных знаков взаимно погасились) в dots не хранятся:
+        # значения раскладываются по позициям common, где есть каждая пара с общими пользователями
+        width = common.shape[1]
+        positions = np.arange(len(block))
+        common_keys = np.repeat(positions, np.diff(common.indptr)) * width + common.indices
+        dot_keys = np.repeat(positions, np.diff(dots.indptr)) * width + dots.indices
+        products = np.zeros(len(common_keys))
+        products[np.searchsorted(common_keys, dot_keys)] = dots.data
+
+        rows = np.repeat(block, np.diff(common.indptr))
+        columns = common.indices
+        counts = common.data
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = products / (norms[rows] * norms[columns]) * (counts / (counts + SIMILARITY_SHRINK))
+        keep = (columns != rows) & (counts >= SIMILARITY_MIN_COMMON) & np.isfinite(scores) & (scores > 0)
+        return rows[keep], columns[keep], scores[keep], counts[keep].astype(np.int64)
+
+    # Соседи строк rows блоками: (landmark_id, similar_id, score, common) и id последней строки блока
+    def neighbours(self, rows, norms, top_k: int = SIMILARITY_TOP_K):
+        for block in self.blocks(rows):
+            row, column, score, common = self.pairs(block, norms)
+            top = _top_k(row, score, top_k)
+            yield (
+                (self.landmark_ids[row[top]], self.landmark_ids[column[top]], score[top], common[top]),
+                int(self.landmark_ids[block[-1]]),
+            )
+
+
+def _similarity_rows(landmark_ids, similar_ids, scores, commons) -> List[dict]:
+    return [
+        {"landmark_id": landmark_id, "similar_id": similar_id, "score": score, "common": common}
+        for landmark_id, similar_id, score, common in zip(
+            landmark_ids.tolist(), similar_ids.tolist(), scores.tolist(), commons.tolist()
+        )
+    ]
+
+
+def _insert(connection, rows: List[dict]) -> None:
+    for batch in _chunks(rows, WRITE_BATCH):
+        connection.execute(insert(LandmarkSimilarity), list(batch))
+
+
+# Модель "похожих" достопримечательностей: полная сборка из всей таблицы ratings и инкрементальный
+# пересчёт отмеченных (similarity_dirty) достопримечательностей. Расчёт синхронный (NumPy/SciPy
+# и синхронный engine): из асинхронного кода вызывается через asyncio.to_thread.
+# Расчёты идут по одному в процессе, чтобы не умножать пиковую память.
+class SimilarityModel:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.refreshes = 0
+        self.last_rebuild: Optional[dict] = None
+        self.last_refresh: Optional[dict] = None
+
+    # Полная сборка. Отметки снимаются до чтения оценок: оценки, записанные во время сборки,
+    # отметят достопримечательности снова и попадут в следующий инкрементальный пересчёт.
+    # Результат записывается по блокам: каждый блок заменяет строки своего диапазона id
+    # в отдельной короткой транзакции, чтение таблицы при этом не прерывается.
+    def rebuild(self) -> dict:
+        import numpy as np
+
+        with self._lock:
+            started = time.perf_counter()
+            with engine.begin() as connection:
+                connection.execute(update(Landmark).where(Landmark.similarity_dirty.is_(True)).values(similarity_dirty=False))
+            with engine.connect() as connection:
+                users, landmarks, ratings = _load_ratings(connection, select(Rating.user_id, Rating.landmark_id, Rating.rating))
+            loaded = time.perf_counter()
+
+            matrix = RatingMatrix(users, landmarks, ratings)
+            del users, landmarks, ratings
+            norms = matrix.norms()
+            pairs = 0
+            previous_last = None
+            for (landmark_ids, similar_ids, scores, commons), last in matrix.neighbours(np.arange(len(matrix)), norms):
+                with engine.begin() as connection:
+                    stale = delete(LandmarkSimilarity).where(LandmarkSimilarity.landmark_id <= last)
+                    if previous_last is not None:
+                        stale = stale.where(LandmarkSimilarity.landmark_id > previous_last)
+                    connection.execute(stale)
+                    _insert(connection, _similarity_rows(landmark_ids, similar_ids, scores, commons))
+                pairs += len(landmark_ids)
+                previous_last = last
+            with engine.begin() as connection:
+                stale = delete(LandmarkSimilarity)
+                if previous_last is not None:
+                    stale = stale.where(LandmarkSimilarity.landmark_id > previous_last)
+                connection.execute(stale)
+
+            self.rebuilds += 1
+            self.last_rebuild = {
+                "ratings": int(matrix.ratings.nnz),
+                "landmarks": len(matrix),
+                "pairs": pairs,
+                "load_seconds": round(loaded - started, 3),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            logger.info("Similarity model rebuilt: %s", self.last_rebuild)
+            return self.last_rebuild
+
+    # Пересчёт соседей отмеченных достопримечательностей D без полной сборки.
+    # Новая оценка достопримечательности L меняет только её столбец матрицы, то есть только пары с L.
+    # Поэтому достаточно оценок тех, кто оценил что-то из D: их произведения дают близость D со всеми,
+    # а нормы прочих столбцов берутся из гистограммы оценок в landmarks.
+    # Списки D заменяются целиком. В списках остальных J меняется только место D: (J, L) получает
+    # новую близость и остаётся, если проходит в top-K J. Кандидат, который вытеснил бы L из списка J
+    # при падении её близости, здесь не виден - его вернёт следующая полная сборка.
+    def refresh(self, landmark_ids: Iterable[int]) -> dict:
+        import numpy as np
+
+        dirty = np.array(sorted(set(int(id) for id in landmark_ids)), dtype=np.int64)
+        with self._lock:
+            started = time.perf_counter()
+            with engine.connect() as connection:
+                raters = select(Rating.user_id).where(Rating.landmark_id.in_(dirty.tolist()))
+                users, landmarks, ratings = _load_ratings(
+                    connection, select(Rating.user_id, Rating.landmark_id, Rating.rating).where(Rating.user_id.in_(raters))
+                )
+                matrix = RatingMatrix(users, landmarks, ratings)
+                norms = self._histogram_norms(connection, matrix.landmark_ids)
+
+                rows = np.flatnonzero(np.isin(matrix.landmark_ids, dirty))
+                found = [matrix.pairs(block, norms) for block in matrix.blocks(rows)]
+                if found:
+                    row, column, score, common = (np.concatenate(parts) for parts in zip(*found))
+                else:
+                    row = column = common = np.zeros(0, dtype=np.int64)
+                    score = np.zeros(0)
+                row_ids, column_ids = matrix.landmark_ids[row], matrix.landmark_ids[column]
+
+                top = _top_k(row, score, SIMILARITY_TOP_K)
+                forward = (row_ids[top], column_ids[top], score[top], common[top])
+
+                # Обратные пары (J, L): J из нового top-K L или уже хранящие L в своём списке
+                referencing = set()
+                for chunk in _chunks(dirty.tolist(), IN_BATCH):
+                    result = connection.execute(
+                        select(LandmarkSimilarity.landmark_id).where(LandmarkSimilarity.similar_id.in_(chunk))
+                    )
+                    referencing.update(result.scalars())
+                others = np.array(sorted((referencing | set(forward[1].tolist())) - set(dirty.tolist())), dtype=np.int64)
+                candidate = np.isin(column_ids, others)
+                reverse = (column_ids[candidate], row_ids[candidate], score[candidate], common[candidate])
+
+                current = [[], [], [], []]
+                for chunk in _chunks(others.tolist(), IN_BATCH):
+                    result = connection.execute(
+                        select(LandmarkSimilarity.landmark_id, LandmarkSimilarity.similar_id,
+                               LandmarkSimilarity.score, LandmarkSimilarity.common)
+                        .where(LandmarkSimilarity.landmark_id.in_(chunk))
+                    )
+                    for values in result:
+                        for column_values, value in zip(current, values):
+                            column_values.append(value)
+            current = [np.array(values, dtype=dtype) for values, dtype in zip(current, (np.int64, np.int64, np.float64, np.int64))]
+            kept = ~np.isin(current[1], dirty)
+            merged = [np.concatenate((values[kept], new)) for values, new in zip(current, reverse)]
+            top = _top_k(merged[0], merged[2], SIMILARITY_TOP_K)
+            merged = [values[top] for values in merged]
+
+            with engine.begin() as connection:
+                for chunk in _chunks(np.concatenate((dirty, others)).tolist(), IN_BATCH):
+                    connection.execute(delete(LandmarkSimilarity).where(LandmarkSimilarity.landmark_id.in_(chunk)))
+                _insert(connection, _similarity_rows(*forward) + _similarity_rows(*merged))
+
+            self.refreshes += 1
+            self.last_refresh = {
+                "landmarks": len(dirty),
+                "ratings": int(matrix.ratings.nnz),
+                "pairs": len(forward[0]),
+                "updated_lists": len(others),
+                "seconds": round(time.perf_counter() - started, 3),
+            }
+            return self.last_refresh
+
+    # Нормы столбцов по гистограммам оценок: sqrt(sum((s - нейтральная)^2 * rating_s))
+    @staticmethod
+    def _histogram_norms(connection, landmark_ids):
+        import numpy as np
+
+        squares = {}
+        columns = list(HISTOGRAM_COLUMNS.items())
+        for chunk in _chunks(landmark_ids.tolist(), IN_BATCH):
+            result = connection.execute(select(Landmark.id, *(column for _, column in columns)).where(Landmark.id.in_(chunk)))
+            for id, *counts in result:
+                squares[id] = sum((star - SIMILARITY_NEUTRAL_RATING) ** 2 * count for (star, _), count in zip(columns, counts))
+        return np.sqrt(np.array([squares.get(id, 0) for id in landmark_ids.tolist()], dtype=np.float64))
+
+    def stats(self) -> dict:
+        return {
+            "rebuilds": self.rebuilds,
+            "refreshes": self.refreshes,
+            "last_rebuild": self.last_rebuild,
+            "last_refresh": self.last_refresh,
+        }
+
+
+similarity_model = SimilarityModel()
+
+
+# Сбор отметок не чаще раза в SIMILARITY_REFRESH_INTERVAL на процесс: первая запись оценки после
+# паузы ставит отложенную задачу, остальные только отмечают достопримечательности.
+class RefreshSchedule:
+    def __init__(self, interval: float = SIMILARITY_REFRESH_INTERVAL):
+        self.interval = interval
+        self._next = 0.0
+
+    def due(self) -> bool:
+        now = time.monotonic()
+        if now < self._next:
+            return False
+        self._next = now + self.interval
+        return True
+
+
+refresh_schedule = RefreshSchedule()
+
+
+# Вызывается в транзакции, которая меняет оценки (отметки ставит сам UPDATE агрегатов)
+def schedule_refresh(db: AsyncSession) -> None:
+    if refresh_schedule.due():
+        enqueue(db, "similarity_refresh", {}, priority=PRIORITY_LOW, delay=refresh_schedule.interval)
+
+
+# Отмеченные достопримечательности - в задачи пересчёта (или одну полную сборку), отметки снимаются
+# в той же транзакции. Возвращает число собранных.
+def dirty_statement():
+    return select(Landmark.id).where(Landmark.similarity_dirty.is_(True)).order_by(Landmark.id)
+
+
+async def collect_dirty(db: AsyncSession) -> int:
+    dirty = (await db.execute(dirty_statement())).scalars().all()
+    if not dirty:
+        return 0
+
+    rated = (await db.execute(select(func.count()).select_from(Landmark).where(Landmark.rating_count > 0))).scalar_one()
+    built = (await db.execute(select(exists().select_from(LandmarkSimilarity)))).scalar()
+    if not built or len(dirty) >= SIMILARITY_REBUILD_FRACTION * rated:
+        enqueue(db, "similarity_rebuild", {}, priority=PRIORITY_LOW)
+    else:
+        for chunk in _chunks(dirty, SIMILARITY_REFRESH_CHUNK):
+            enqueue(db, "similarity_refresh", {"landmark_ids": list(chunk)}, priority=PRIORITY_LOW)
+    # Задачи читают оценки после commit этой транзакции, поэтому снятые отметки ничего не теряют
+    for chunk in _chunks(dirty, IN_BATCH):
+        await db.execute(
+            update(Landmark).where(Landmark.id.in_(chunk)).values(similarity_dirty=False),
+            execution_options={"synchronize_session": False},
+        )
+    # Отметки, поставленные транзакциями, которые закончатся после этого сбора
+    enqueue(db, "similarity_refresh", {}, priority=PRIORITY_LOW, delay=SIMILARITY_REFRESH_INTERVAL)
+    return len(dirty)
+
+
+def _landmark_columns():
+    return (Landmark.id, Landmark.name, Landmark.location, Landmark.country, Landmark.image_url,
+            Landmark.avg_rating, Landmark.rating_count)
+
+
+# Похожие достопримечательности из готовой таблицы, по убыванию близости
+def similar_statement(landmark_id: int, limit: int):
+    return (
+        select(*_landmark_columns(), LandmarkSimilarity.score, LandmarkSimilarity.common)
+        .join(LandmarkSimilarity, LandmarkSimilarity.similar_id == Landmark.id)
+        .where(LandmarkSimilarity.landmark_id == landmark_id)
+        .order_by(LandmarkSimilarity.score.desc(), LandmarkSimilarity.similar_id)
+        .limit(limit)
+    )
+
+
+async def similar_landmarks(db: AsyncSession, landmark_id: int, limit: int) -> List[dict]:
+    result = await db.execute(similar_statement(landmark_id, limit))
+    return [dict(row) for row in result.mappings()]
+
+
+# Рекомендации пользователю: соседи его оценённых достопримечательностей, которые он ещё не оценил.
+# score - сумма близостей, взвешенных отклонением оценки от нейтральной (соседи того, что не понравилось,
+# опускаются); predicted_rating - нейтральная оценка плюс среднее этих отклонений, взвешенное близостью.
+# Один запрос по индексам ratings(user_id) и первичному ключу landmark_similarities.
+def recommendations_statement(user_id: int, limit: int):
+    own = aliased(Rating)
+    weight = func.sum(LandmarkSimilarity.score * (Rating.rating - SIMILARITY_NEUTRAL_RATING))
+    candidates = (
+        select(
+            LandmarkSimilarity.similar_id.label("landmark_id"),
+            weight.label("score"),
+            (SIMILARITY_NEUTRAL_RATING + weight / func.sum(LandmarkSimilarity.score)).label("predicted_rating"),
+        )
+        .join(Rating, Rating.landmark_id == LandmarkSimilarity.landmark_id)
+        .where(Rating.user_id == user_id)
+        .where(~exists().where(own.user_id == user_id, own.landmark_id == LandmarkSimilarity.similar_id))
+        .group_by(LandmarkSimilarity.similar_id)
+        .having(weight > 0)
+        .order_by(weight.desc(), LandmarkSimilarity.similar_id)
+        .limit(limit)
+        .subquery()
+    )
+    return (
+        select(*_landmark_columns(), candidates.c.score, candidates.c.predicted_rating)
+        .join(candidates, candidates.c.landmark_id == Landmark.id)
+        .order_by(candidates.c.score.desc(), Landmark.id)
+    )
+
+
+async def recommendations(db: AsyncSession, user_id: int, limit: int) -> List[dict]:
+    result = await db.execute(recommendations_statement(user_id, limit))
+    return [dict(row) for row in result.mappings()]
@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
+from services.blobStore import BlobStore, blob_store
+
+# Длинная сторона миниатюр в пикселях
+THUMBNAIL_SIZES = (256, 1024)
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 85))
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", os.cpu_count() or 2))
+
+
+# Миниатюра тоже адресуется содержимым исходника: <sha256>_<размер>.jpg
+def thumbnail_key(key: str, size: int) -> str:
+    return f"{key.split('.', 1)[0]}_{size}.jpg"
+
+
+# Выполняется в процессе пула. draft() уменьшает JPEG ещё при декодировании,
+# поэтому большие фотографии не распаковываются целиком.
+def render_thumbnail(source: str, target: str, size: int, quality: int) -> None:
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image.draft("RGB", (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.Resampling.LANCZOS)
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+        image.save(target, "JPEG", quality=quality, optimize=True, progressive=True)
+
+
+# Миниатюры строятся в пуле процессов (декодирование и ресайз упираются в CPU).
+# Одна миниатюра строится один раз: параллельные запросы ждут одну и ту же задачу.
+class ThumbnailService:
+    def __init__(self, store: BlobStore, workers: int):
+        self.store = store
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.rendered = 0
+        self.failed = 0
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    async def _render(self, key: str, size: int, target_key: str) -> None:
+        if await self.store.head_object(target_key) is not None:
+            return
+        handle, target = tempfile.mkstemp(prefix="thumb-", suffix=".jpg", dir=self.store.temp_dir())
+        os.close(handle)
+        try:
+            async with self.store.local_copy(key) as source:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self._pool(), render_thumbnail, source, target, size, THUMBNAIL_QUALITY)
+            await self.store.upload_file(target, target_key, "image/jpeg")
+            self.rendered += 1
+        except BaseException:
+            self.failed += 1
+            if os.path.exists(target):
+                os.unlink(target)
+            raise
+
+    # Возвращает ключ готовой миниатюры, при необходимости построив её
+    async def ensure(self, key: str, size: int) -> str:
+        target_key = thumbnail_key(key, size)
+        task = self._pending.get(target_key)
+        if task is None:
+            task = asyncio.ensure_future(self._render(key, size, target_key))
+            self._pending[target_key] = task
+            task.add_done_callback(lambda _: self._pending.pop(target_key, None))
+        await asyncio.shield(task)
+        return target_key
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "pending": len(self._pending),
+            "rendered": self.rendered,
+            "failed": self.failed,
+        }
+
+
+thumbnails = ThumbnailService(blob_store, THUMBNAIL_WORKERS)
@@ -0,0 +1,394 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sortedcontainers import SortedList
+from sqlalchemy import select, update, bindparam, literal, case
+from sqlalchemy.ext.asyncio import AsyncSession
+from config.database import AsyncSessionLocal, engine
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from models.timestamps import utcnow
+from services.memoryIndex import LazyMemoryIndex
+
+logger = logging.getLogger(__name__)
+
+# Период полураспада популярности: вклад события уменьшается вдвое за столько часов
+TRENDING_HALF_LIFE_HOURS = float(os.getenv("TRENDING_HALF_LIFE_HOURS", 72))
+# Начало отсчёта (UTC). Счёт в базе - вклад событий, приведённый к точке отсчёта:
+# w * 2^((t - epoch) / half_life). Затухание одинаково для всех, поэтому порядок по хранимому счёту
+# совпадает с порядком по текущему, а новое событие - просто прибавка (без пересчёта остальных).
+# Точка отсчёта сдвигается каждые EPOCH_HALF_LIVES периодов (см. ниже), поэтому показатель степени
+# ограничен. После смены начала отсчёта или периода - python -m config.trending
+TRENDING_EPOCH = datetime.fromisoformat(os.getenv("TRENDING_EPOCH", "2026-01-01T00:00:00"))
+# Вес оценки (умножается на rating / 5) и загруженного фото
+TRENDING_RATING_WEIGHT = float(os.getenv("TRENDING_RATING_WEIGHT", 1))
+TRENDING_PHOTO_WEIGHT = float(os.getenv("TRENDING_PHOTO_WEIGHT", 2))
+# Как часто накопленные прибавки записываются в базу и подтягиваются чужие, секунды
+TRENDING_CHECKPOINT_INTERVAL = float(os.getenv("TRENDING_CHECKPOINT_INTERVAL", 5))
+
+HALF_LIFE_SECONDS = TRENDING_HALF_LIFE_HOURS * 3600
+# Точка отсчёта - начало текущего отрезка в столько периодов полураспада (96 дней при 72 часах):
+# счёт не больше w * 2^32, а без сдвига рос бы вдвое за каждый период и через ~1000 периодов
+# переполнил бы float64. Хранимый счёт строки отсчитан от начала отрезка, в который попадает её
+# trending_at: строка со старым отрезком переводится при следующей записи и при чтении в память
+# (старше прошлого отрезка - ноль, такие события весят меньше 2^-32)
+EPOCH_HALF_LIVES = 32
+EPOCH_SECONDS = HALF_LIFE_SECONDS * EPOCH_HALF_LIVES
+EPOCH_SCALE = 2.0 ** EPOCH_HALF_LIVES
+# Полный пересчёт учитывает события не старше стольких периодов (старше весят меньше 2^-20)
+REBUILD_HALF_LIVES = 20
+# Перекрытие окна синхронизации: запись с trending_at чуть раньше прошлой синхронизации
+# могла зафиксироваться уже после неё (и реплика, с которой строился индекс, могла отставать)
+SYNC_OVERLAP = timedelta(seconds=max(30.0, 3 * TRENDING_CHECKPOINT_INTERVAL))
+WRITE_BATCH = 5_000
+
+
+# Колонки рейтинга в памяти
+BOARD_COLUMNS = (Landmark.id, Landmark.name, Landmark.location, Landmark.country, Landmark.trending_score, Landmark.trending_at)
+
+
+# Строки, чей счёт менялся начиная с since (по индексу ix_landmarks_trending_at)
+def sync_statement(since: datetime):
+    return select(*BOARD_COLUMNS).where(Landmark.trending_at >= since)
+
+
+# События для полного пересчёта: (landmark_id, значение, created_at) начиная с since
+def rating_events_statement(since: datetime):
+    return select(Rating.landmark_id, Rating.rating, Rating.created_at).where(Rating.created_at >= since)
+
+
+def photo_events_statement(since: datetime):
+    return select(Photo.landmark_id, literal(1), Photo.created_at).where(Photo.created_at >= since)
+
+
+# Номер отрезка, в который попадает момент at, и начало отрезка (точка отсчёта его счётов)
+def epoch_index(at: datetime) -> int:
+    return math.floor((at - TRENDING_EPOCH).total_seconds() / EPOCH_SECONDS)
+
+
+def epoch_start(epoch: int) -> datetime:
+    return TRENDING_EPOCH + timedelta(seconds=epoch * EPOCH_SECONDS)
+
+
+# Вклад события веса weight в момент at, приведённый к точке отсчёта отрезка epoch
+def event_score(weight: float, at: datetime, epoch: int) -> float:
+    return weight * 2.0 ** ((at - epoch_start(epoch)).total_seconds() / HALF_LIFE_SECONDS)
+
+
+# Множитель от хранимого счёта отрезка epoch к текущему
+def decay_factor(now: datetime, epoch: int) -> float:
+    return 2.0 ** (-(now - epoch_start(epoch)).total_seconds() / HALF_LIFE_SECONDS)
+
+
+# Счёт строки из базы (отсчитан от отрезка её trending_at) в единицах отрезка epoch не старше строки
+def stored_score(score: float, trending_at: Optional[datetime], epoch: int) -> float:
+    if not score or trending_at is None:
+        return 0.0
+    return score * 2.0 ** (EPOCH_HALF_LIVES * (epoch_index(trending_at) - epoch))
+
+
+# Хранимый счёт в единицах отрезка epoch - в UPDATE, который ставит trending_at в этом отрезке.
+# Отрезок строки определяется по её trending_at; следующий отрезок возможен, если часы другого
+# процесса уже перешли границу
+def carried_score_expression(epoch: int):
+    table = Landmark.__table__
+    return case(
+        (table.c.trending_at >= epoch_start(epoch + 1), table.c.trending_score * EPOCH_SCALE),
+        (table.c.trending_at >= epoch_start(epoch), table.c.trending_score),
+        (table.c.trending_at >= epoch_start(epoch - 1), table.c.trending_score / EPOCH_SCALE),
+        else_=0.0,
+    )
+
+
+def rating_weight(value: int) -> float:
+    return TRENDING_RATING_WEIGHT * value / 5
+
+
+# Рейтинг в памяти: общий и по странам, упорядочен по (-счёт, id).
+# Первые N - O(log n + N), изменение счёта одной достопримечательности - O(log n).
+class TrendingRanking:
+    def __init__(self):
+        self.entries: Dict[int, Tuple[float, str, Optional[str], Optional[str]]] = {}
+        self.overall = SortedList()
+        self.by_country: Dict[str, SortedList] = {}
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def put(self, landmark_id: int, score: float, name: str, location: Optional[str], country: Optional[str]) -> None:
+        self.remove(landmark_id)
+        if score <= 0:
+            return
+        self.entries[landmark_id] = (score, name, location, country)
+        self.overall.add((-score, landmark_id))
+        if country is not None:
+            self.by_country.setdefault(country, SortedList()).add((-score, landmark_id))
+
+    def remove(self, landmark_id: int) -> None:
+        entry = self.entries.pop(landmark_id, None)
+        if entry is None:
+            return
+        score, _, _, country = entry
+        self.overall.remove((-score, landmark_id))
+        if country is not None:
+            ranking = self.by_country[country]
+            ranking.remove((-score, landmark_id))
+            if not ranking:
+                del self.by_country[country]
+
+    def top(self, country: Optional[str], limit: int) -> List[Tuple[int, float, str, Optional[str], Optional[str]]]:
+        ranking = self.overall if country is None else self.by_country.get(country)
+        if not ranking:
+            return []
+        return [(landmark_id, *self.entries[landmark_id]) for _, landmark_id in ranking.islice(0, limit)]
+
+
+# Популярные достопримечательности. Новые оценки и фото сразу меняют рейтинг в памяти и копятся
+# как прибавки; раз в TRENDING_CHECKPOINT_INTERVAL прибавки уходят в базу одним UPDATE
+# trending_score = trending_score + :delta (прибавка, а не перезапись: воркеры не затирают друг друга),
+# после чего из базы подтягиваются строки, изменённые другими процессами (по trending_at).
+class TrendingBoard(LazyMemoryIndex):
+    def __init__(self):
+        super().__init__()
+        self.ranking = TrendingRanking()
+        # Отрезок, от начала которого отсчитаны счёты рейтинга и прибавки
+        self.epoch = epoch_index(utcnow())
+        self.pending: Dict[int, float] = defaultdict(float)
+        # Попали в рейтинг первым событием: название и страна ещё не загружены
+        self.unnamed: Set[int] = set()
+        self.events = 0
+        self.checkpoints = 0
+        self.synced = 0
+        self.error: Optional[str] = None
+        self._last_sync: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # Вызывается один раз в начале построения: всё, что изменится позже, подтянет синхронизация
+    def load_statement(self):
+        self._last_sync = utcnow()
+        return select(*BOARD_COLUMNS).where(Landmark.trending_score > 0)
+
+    def load_row(self, row) -> None:
+        if row.trending_at is not None:
+            self.rebase(epoch_index(row.trending_at))
+        score = stored_score(row.trending_score, row.trending_at, self.epoch)
+        self.unnamed.discard(row.id)
+        self.ranking.put(row.id, score + self.pending.get(row.id, 0.0), row.name, row.location, row.country)
+
+    # Переход к более позднему отрезку: счёты и прибавки делятся на 2^EPOCH_HALF_LIVES (порядок не меняется).
+    # Раз в EPOCH_HALF_LIVES периодов, O(n log n)
+    def rebase(self, epoch: int) -> None:
+        if epoch <= self.epoch:
+            return
+        scale = 2.0 ** (-EPOCH_HALF_LIVES * (epoch - self.epoch))
+        self.epoch = epoch
+        for landmark_id in self.pending:
+            self.pending[landmark_id] *= scale
+        entries, self.ranking = self.ranking.entries, TrendingRanking()
+        for landmark_id, (score, name, location, country) in entries.items():
+            self.ranking.put(landmark_id, score * scale, name, location, country)
+
+    # Событие после commit записи: оценка или фото
+    def record(self, landmark_id: int, weight: float, at: Optional[datetime] = None) -> None:
+        at = at or utcnow()
+        self.rebase(epoch_index(at))
+        delta = event_score(weight, at, self.epoch)
+        self.events += 1
+        self.pending[landmark_id] += delta
+        if self.touch(landmark_id):
+            entry = self.ranking.entries.get(landmark_id)
+            if entry is not None:
+                self.ranking.put(landmark_id, entry[0] + delta, *entry[1:])
+            else:
+                # Не в рейтинге - значит счёт в базе нулевой: входит сразу со счётом события,
+                # название и страна подгружаются при чтении рейтинга
+                self.ranking.put(landmark_id, delta, "", None, None)
+                self.unnamed.add(landmark_id)
+
+    def record_rating(self, landmark_id: int, value: int) -> None:
+        self.record(landmark_id, rating_weight(value))
+
+    def record_photos(self, landmark_ids: Iterable[int]) -> None:
+        for landmark_id in landmark_ids:
+            self.record(landmark_id, TRENDING_PHOTO_WEIGHT)
+
+    # Изменение названия или страны из обработчиков update
+    def add(self, landmark) -> None:
+        if self._building:
+            # Строка будет пропущена при построении: нулевая прибавка вернёт её через синхронизацию
+            self.pending[landmark.id] += 0.0
+        if self.touch(landmark.id):
+            entry = self.ranking.entries.get(landmark.id)
+            if entry is not None:
+                self.ranking.put(landmark.id, entry[0], landmark.name, landmark.location, landmark.country)
+                self.unnamed.discard(landmark.id)
+
+    def add_many(self, landmarks: Iterable) -> None:
+        for landmark in landmarks:
+            self.add(landmark)
+
+    def remove(self, landmark_id: int) -> None:
+        self.pending.pop(landmark_id, None)
+        self.unnamed.discard(landmark_id)
+        if self.touch(landmark_id):
+            self.ranking.remove(landmark_id)
+
+    def remove_many(self, landmark_ids: Iterable[int]) -> None:
+        for landmark_id in landmark_ids:
+            self.remove(landmark_id)
+
+    # Записи без названия (строка ещё не видна или уже удалена) пропускаются
+    def top(self, country: Optional[str], limit: int, now: Optional[datetime] = None) -> List[dict]:
+        now = now or utcnow()
+        self.rebase(epoch_index(now))
+        factor = decay_factor(now, self.epoch)
+        return [
+            {"id": landmark_id, "name": name, "location": location, "country": country, "trending_score": round(score * factor, 6)}
+            for landmark_id, score, name, location, country in self.ranking.top(country, limit + len(self.unnamed))
+            if landmark_id not in self.unnamed
+        ][:limit]
+
+    # Название и страна для записей, добавленных первым событием; счёт остаётся из памяти.
+    # Не найденные (реплика отстаёт) остаются без названия до следующего чтения или синхронизации.
+    async def load_unnamed(self, db: AsyncSession) -> None:
+        landmark_ids, self.unnamed = self.unnamed, set()
+        rows = await db.execute(select(*BOARD_COLUMNS).where(Landmark.id.in_(sorted(landmark_ids))))
+        for row in rows:
+            entry = self.ranking.entries.get(row.id)
+            if entry is not None:
+                self.ranking.put(row.id, entry[0], row.name, row.location, row.country)
+            landmark_ids.discard(row.id)
+        self.unnamed |= {landmark_id for landmark_id in landmark_ids if landmark_id in self.ranking.entries}
+
+    async def trending(self, db: AsyncSession, country: Optional[str], limit: int) -> List[dict]:
+        await self.ensure_built(db)
+        if self.unnamed:
+            await self.load_unnamed(db)
+        return self.top(country, limit)
+
+    async def checkpoint(self) -> None:
+        now = utcnow()
+        self.rebase(epoch_index(now))
+        batch, self.pending, epoch = self.pending, defaultdict(float), self.epoch
+        if batch:
+            table = Landmark.__table__
+            # Хранимый счёт переводится в отрезок epoch, в который попадает новый trending_at
+            statement = (
+                update(table)
+                .where(table.c.id == bindparam("_id"))
+                .values(trending_score=carried_score_expression(epoch) + bindparam("_delta"), trending_at=bindparam("_at"))
+            )
+            # trending_at не раньше начала отрезка: он мог смениться по строке процесса, чьи часы впереди
+            at = max(now, epoch_start(epoch))
+            # По возрастанию id: параллельные процессы блокируют строки в одном порядке
+            params = [{"_id": landmark_id, "_delta": delta, "_at": at} for landmark_id, delta in sorted(batch.items())]
+            try:
+                async with AsyncSessionLocal() as db:
+                    for start in range(0, len(params), WRITE_BATCH):
+                        await db.execute(statement, params[start:start + WRITE_BATCH])
+                    await db.commit()
+            except BaseException:
+                # Не записанное вернётся в следующую попытку (в единицах отрезка, если он успел смениться)
+                scale = 2.0 ** (-EPOCH_HALF_LIVES * (self.epoch - epoch))
+                for landmark_id, delta in batch.items():
+                    self.pending[landmark_id] += delta * scale
+                raise
+        self.checkpoints += 1
+        if self.ready:
+            await self.sync()
+
+    # Строки, чей счёт менялся после прошлой синхронизации (в том числе своими checkpoint):
+    # значение из базы плюс ещё не записанные свои прибавки
+    async def sync(self) -> None:
+        since = self._last_sync - SYNC_OVERLAP
+        self._last_sync = utcnow()
+        async with AsyncSessionLocal() as db:
+            for row in await db.execute(sync_statement(since)):
+                self.synced += 1
+                self.load_row(row)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(TRENDING_CHECKPOINT_INTERVAL)
+            try:
+                await self.checkpoint()
+                self.error = None
+            except Exception as error:
+                self.error = f"{type(error).__name__}: {error}"
+                logger.warning("Trending checkpoint failed: %s", self.error)
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._run())
+
+    # Остановка с последней записью накопленного
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.pending:
+            try:
+                await self.checkpoint()
+            except Exception as error:
+                logger.warning("Final trending checkpoint failed, %d landmarks lost: %s", len(self.pending), error)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "landmarks": len(self.ranking),
+            "countries": len(self.ranking.by_country),
+            "events": self.events,
+            "epoch": epoch_start(self.epoch).isoformat(),
+            "pending": len(self.pending),
+            "checkpoints": self.checkpoints,
+            "synced_rows": self.synced,
+            "error": self.error,
+        }
+
+
+trending_board = TrendingBoard()
+
+
+# Полный пересчёт счёта по created_at оценок и фото за последние REBUILD_HALF_LIVES периодов
+# (после смены TRENDING_EPOCH / TRENDING_HALF_LIFE_HOURS или весов). Счёт перезаписывается,
+# запущенные процессы подтянут его синхронизацией. Синхронный: для CLI (python -m config.trending).
+def rebuild_scores(now: Optional[datetime] = None) -> dict:
+    started = time.perf_counter()
+    now = now or utcnow()
+    epoch = epoch_index(now)
+    since = now - timedelta(seconds=HALF_LIFE_SECONDS * REBUILD_HALF_LIVES)
+    scores: Dict[int, float] = defaultdict(float)
+    events = 0
+    sources = (
+        (rating_events_statement(since), rating_weight),
+        (photo_events_statement(since), lambda _: TRENDING_PHOTO_WEIGHT),
+    )
+    with engine.connect() as connection:
+        for statement, weight in sources:
+            result = connection.execution_options(stream_results=True, yield_per=WRITE_BATCH).execute(statement)
+            for landmark_id, value, created_at in result:
+                scores[landmark_id] += event_score(weight(value), created_at, epoch)
+                events += 1
+
+    table = Landmark.__table__
+    statement = (
+        update(table)
+        .where(table.c.id == bindparam("_id"))
+        .values(trending_score=bindparam("_score"), trending_at=now)
+    )
+    params = [{"_id": landmark_id, "_score": score} for landmark_id, score in sorted(scores.items())]
+    with engine.begin() as connection:
+        connection.execute(update(table).where(table.c.trending_score != 0).values(trending_score=0, trending_at=now))
+        for start in range(0, len(params), WRITE_BATCH):
+            connection.execute(statement, params[start:start + WRITE_BATCH])
+
+    return {"events": events, "landmarks": len(scores), "seconds": round(time.perf_counter() - started, 2)}
@@ -0,0 +1,126 @@
+import os
+from typing import Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from services.blobStore import BlobStore, BlobWriter
+
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+
+# Обычные поля формы маленькие; больше - ошибка клиента
+MAX_FIELD_BYTES = 1024
+
+# Тип файла определяется по первым байтам, заголовку Content-Type от клиента не доверяем
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"GIF87a", "gif", "image/gif"),
+    (b"GIF89a", "gif", "image/gif"),
+)
+
+CONTENT_TYPES = {extension: content_type for _, extension, content_type in IMAGE_SIGNATURES}
+CONTENT_TYPES["webp"] = "image/webp"
+
+
+def sniff_image(head: bytes) -> Optional[Tuple[str, str]]:
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension, content_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp", "image/webp"
+    return None
+
+
+# Загруженный файл: ключ в хранилище, тип и размер
+class StoredUpload:
+    def __init__(self, key: str, content_type: str, size: int):
+        self.key = key
+        self.content_type = content_type
+        self.size = size
+
+
+# Разбирает multipart/form-data прямо из потока запроса: содержимое поля file_field
+# пишется в хранилище по мере получения (в памяти - не больше буфера BlobWriter),
+# остальные поля возвращаются строками. Возвращает (поля, файл или None).
+async def receive_image(request: Request, store: BlobStore, file_field: str = "file") -> Tuple[Dict[str, str], Optional[StoredUpload]]:
+    from python_multipart.exceptions import MultipartParseError
+    from python_multipart.multipart import MultipartParser, parse_options_header
+
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+
+    fields: Dict[str, str] = {}
+    state = {"name": None, "header": b"", "value": b"", "headers": {}, "data": bytearray()}
+    writer: Optional[BlobWriter] = None
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["name"] = None
+        state["data"] = bytearray()
+
+    def on_header_field(data, start, end):
+        state["header"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header"].lower()] = state["value"]
+        state["header"] = b""
+        state["value"] = b""
+
+    def on_headers_finished():
+        nonlocal writer
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = disposition.get(b"name", b"").decode("utf-8", "replace")
+        if state["name"] == file_field:
+            if writer is not None:
+                raise HTTPException(status_code=400, detail="Only one file per upload")
+            writer = BlobWriter(store, MAX_UPLOAD_BYTES)
+
+    def on_part_data(data, start, end):
+        if state["name"] == file_field:
+            writer.feed(data[start:end])
+        else:
+            state["data"] += data[start:end]
+            if len(state["data"]) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=400, detail=f"Form field {state['name']} is too long")
+
+    def on_part_end():
+        if state["name"] and state["name"] != file_field:
+            fields[state["name"]] = state["data"].decode("utf-8", "replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    try:
+        try:
+            async for chunk in request.stream():
+                parser.write(chunk)
+                if writer is not None:
+                    if writer.too_large:
+                        raise HTTPException(status_code=413, detail=f"File is larger than {MAX_UPLOAD_BYTES} bytes")
+                    await writer.flush()
+            parser.finalize()
+        except MultipartParseError:
+            raise HTTPException(status_code=400, detail="Malformed multipart body")
+
+        if writer is None:
+            return fields, None
+        image = sniff_image(writer.head)
+        if image is None:
+            raise HTTPException(status_code=415, detail="Unsupported image type (expected JPEG, PNG, GIF or WebP)")
+        extension, image_type = image
+        key = await writer.commit(extension, image_type)
+        return fields, StoredUpload(key, image_type, writer.size)
+    except BaseException:
+        if writer is not None:
+            await writer.discard()
+        raise
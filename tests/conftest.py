@@ -0,0 +1,48 @@
+# Тесты работают на временной базе SQLite: база из .env не трогается.
+# Переменные окружения задаются до импорта модулей приложения (настройки читаются при импорте).
+import asyncio
+import os
+import tempfile
+
+_workdir = tempfile.mkdtemp(prefix="landmarks-tests-")
+os.environ["DB_DIALECT"] = "sqlite"
+os.environ["DB_ASYNC_DIALECT"] = "sqlite+aiosqlite"
+os.environ["DB_NAME"] = os.path.join(_workdir, "tests.db")
+os.environ.pop("DB_REPLICA_HOST", None)
+
+import pytest
+
+
+# Схема до последней миграции, один раз на прогон
+@pytest.fixture(scope="session")
+def database():
+    import main  # noqa: F401 - все модели и обработчики событий
+    from config.createtables import create_tables
+
+    create_tables()
+
+
+# Запуск корутины в своём цикле событий; пулы асинхронных engine закрываются в том же цикле
+@pytest.fixture
+def run_async(database):
+    from config.database import dispose_engines
+
+    def run(coroutine_function, *args, **kwargs):
+        async def main():
+            try:
+                return await coroutine_function(*args, **kwargs)
+            finally:
+                await dispose_engines()
+
+        return asyncio.run(main())
+
+    return run
+
+
+# Счётчик SQL-запросов основной базы: with count_queries() as counter: ...; counter.count
+@pytest.fixture
+def count_queries(database):
+    from config.database import async_engine
+    from services.queryCounter import count_queries as counter
+
+    return lambda: counter(async_engine.sync_engine)
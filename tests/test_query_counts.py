@@ -0,0 +1,86 @@
+# Число SQL-запросов у эндпоинтов с ?include= должно быть постоянным и не расти с размером
+# страницы (нет N+1): страница + по одному запросу на каждую коллекцию из selectinload.
+from itertools import combinations
+import pytest
+from fastapi import Response
+from sqlalchemy import insert
+from config.database import SessionLocal, AsyncSessionLocal
+from config.createtables import recalculate_rating_aggregates
+from controllers.landmarkController import get_landmarks_detail, get_landmark_detail
+from models.user import User
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from schemas.landmarks import LandmarkDetail
+from services.embeds import IncludeParams, LANDMARK_INCLUDES
+from services.pagination import PageParams
+
+LANDMARKS = 150
+PHOTOS_PER_LANDMARK = 3
+PAGE_SIZES = (1, 10, 100)
+
+# Все сочетания include, от пустого до полного
+INCLUDES = [
+    ",".join(names)
+    for size in range(len(LANDMARK_INCLUDES) + 1)
+    for names in combinations(LANDMARK_INCLUDES, size)
+]
+
+
+def expected_queries(include: str) -> int:
+    return 1 + ("photos" in include.split(","))
+
+
+@pytest.fixture(scope="module")
+def landmarks(database):
+    with SessionLocal() as db:
+        users = db.execute(
+            insert(User).returning(User.id),
+            [{"username": f"owner{i}", "email": f"owner{i}@example.com", "password": "-"} for i in range(10)],
+        ).scalars().all()
+        landmark_ids = db.execute(insert(Landmark).returning(Landmark.id), [
+            {
+                "name": f"Landmark {i}", "description": "", "location": "", "country": "Checkland",
+                "image_url": "", "user_id": users[i % len(users)],
+            }
+            for i in range(LANDMARKS)
+        ]).scalars().all()
+        db.execute(insert(Photo), [
+            {"user_id": users[i % len(users)], "landmark_id": landmark_id, "image_url": f"https://example.com/{landmark_id}/{n}.jpg"}
+            for i, landmark_id in enumerate(landmark_ids) for n in range(PHOTOS_PER_LANDMARK)
+        ])
+        db.execute(insert(Rating), [
+            {"user_id": user_id, "landmark_id": landmark_id, "rating": (i + n) % 5 + 1}
+            for i, landmark_id in enumerate(landmark_ids) for n, user_id in enumerate(users[:3])
+        ])
+        db.commit()
+    recalculate_rating_aggregates()
+    return landmark_ids
+
+
+# Вызывает обработчик и сериализует ответ так же, как FastAPI: ленивые загрузки
+# при сериализации тоже попадают в счётчик (или падают на raiseload)
+async def measure(count_queries, handler, **kwargs) -> int:
+    async with AsyncSessionLocal() as db:
+        with count_queries() as counter:
+            result = await handler(db=db, **kwargs)
+            items = result if isinstance(result, list) else [result]
+            for item in items:
+                LandmarkDetail.model_validate(item)
+    return counter.count
+
+
+@pytest.mark.parametrize("size", PAGE_SIZES)
+@pytest.mark.parametrize("include", INCLUDES, ids=lambda include: include or "-")
+def test_landmarks_detail_page_query_count(landmarks, run_async, count_queries, include, size):
+    embeds = IncludeParams(include=include or None)
+    page = PageParams(limit=size, cursor=None, fields=None)
+    count = run_async(measure, count_queries, get_landmarks_detail, response=Response(), country="Checkland", embeds=embeds, page=page)
+    assert count == expected_queries(include)
+
+
+@pytest.mark.parametrize("include", INCLUDES, ids=lambda include: include or "-")
+def test_landmark_detail_query_count(landmarks, run_async, count_queries, include):
+    embeds = IncludeParams(include=include or None)
+    count = run_async(measure, count_queries, get_landmark_detail, landmark_id=landmarks[0], embeds=embeds)
+    assert count == expected_queries(include)
@@ -0,0 +1,172 @@
+# Проверка планов запросов: каждый фильтрующий запрос обработчиков должен идти по индексу.
+# Запросы строятся теми же функциями, что и в обработчиках (page_statement, геозапросы, поиск,
+# embeds, CRUDController), поэтому проверка не расходится с кодом. Полный проход по таблице
+# и полный проход по индексу - ошибка, если запрос не указан в ALLOWED_SCANS с причиной.
+# Каждый запрос проверяется и с критериями мягкого удаления (SOFT_DELETE=1): подзапросы NOT IN
+# по отмеченным строкам тоже должны идти по индексу deleted_at.
+# Планы зависят от статистики: тест смотрит план на пустой схеме (без ANALYZE).
+from datetime import datetime
+from itertools import takewhile
+import pytest
+from sqlalchemy import text
+from config.database import engine, Base
+from models.user import User
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from schemas.landmarks import LandmarkBase
+from schemas.user import UserBase
+from controllers.landmarkController import LANDMARK_FIELDS, landmark_list_filters
+from controllers.photoControllers import PHOTO_FIELDS, PhotoBase
+from controllers.ratingController import RATING_FIELDS, RatingBase
+from controllers.userController import USER_FIELDS
+from middleware.authJWT import principal_statement
+from generateCRUDControllers import landmark_crud, photo_crud, rating_crud, user_crud
+from services.deletion import VISIBILITY_CRITERIA
+from services.pagination import PageParams, encode_cursor, page_statement
+from services.embeds import LANDMARK_INCLUDES, landmark_load_options, landmark_detail_statement
+from services.geo import nearest_statement, within_statement, clusters_statement, landmark_geo
+from services.search import search_statement, landmark_search
+from services.deletion import hidden_landmarks_since
+from services.similarity import similar_statement, recommendations_statement, dirty_statement
+from services.trending import sync_statement, rating_events_statement, photo_events_statement
+
+PARIS = (48.80, 2.20, 48.90, 2.40)
+
+# Запросы, которым разрешён полный проход по таблице: таблица и причина
+ALLOWED_SCANS = {
+    "get_all_landmarks": ("landmarks", "keyset page by primary key: LIMIT stops the scan after one page"),
+    "get_all_landmarks?sort=rating": ("landmarks", "keyset page in ix_landmarks_avg_rating order: LIMIT stops the scan after one page"),
+    "get_all_landmarks?sort=-rating": ("landmarks", "keyset page in ix_landmarks_avg_rating order: LIMIT stops the scan after one page"),
+    "get_all_photos": ("photos", "keyset page by primary key: LIMIT stops the scan after one page"),
+    "get_all_ratings": ("ratings", "keyset page by primary key: LIMIT stops the scan after one page"),
+    "get_all_users": ("users", "keyset page by primary key: LIMIT stops the scan after one page"),
+}
+
+
+def _page(model, where=(), order_by=None, allowed_fields=None, schema=None, options=(), cursor=None):
+    page = PageParams(limit=100, cursor=encode_cursor(cursor) if cursor else None, fields=None)
+    return page_statement(model, page, where, order_by, allowed_fields, options, schema)[0]
+
+
+def _landmark_list(country=None, rating=None, sort="id", cursor=None):
+    where, order_by = landmark_list_filters(country, rating, sort)
+    return _page(Landmark, where, order_by, LANDMARK_FIELDS, LandmarkBase, cursor=cursor)
+
+
+# Запросы обработчиков для диалекта (поиск по индексу базы есть только в MySQL и PostgreSQL)
+def controller_queries(dialect_name: str) -> dict:
+    include = set(LANDMARK_INCLUDES)
+    queries = {
+        "find_landmarks_by_user": _page(Landmark, [Landmark.user_id == 1], None, LANDMARK_FIELDS, LandmarkBase),
+        "find_landmarks_by_country": _page(Landmark, [Landmark.country == "France"], None, LANDMARK_FIELDS, LandmarkBase),
+        "get_all_landmarks": _landmark_list(),
+        "get_all_landmarks?sort=rating": _landmark_list(None, None, "rating"),
+        "get_all_landmarks?sort=-rating": _landmark_list(None, None, "-rating"),
+        "get_all_landmarks?sort=-rating (next page)": _landmark_list(None, None, "-rating", cursor=[4.5, 10]),
+        "get_all_landmarks?rating&sort=-rating": _landmark_list(None, 4, "-rating"),
+        "get_all_landmarks?country&rating": _landmark_list("France", 4),
+        "get_all_landmarks?country&sort=rating": _landmark_list("France", None, "rating"),
+        "get_all_landmarks?country&sort=-rating": _landmark_list("France", 4, "-rating"),
+        "get_all_landmarks?country&sort=-rating (next page)": _landmark_list("France", 4, "-rating", cursor=[4.5, 10]),
+        "get_landmarks_detail?country&include": _page(
+            Landmark, [Landmark.country == "France"], None, LANDMARK_FIELDS, options=landmark_load_options(include)
+        ),
+        "get_landmark_detail?include": landmark_detail_statement(1, include),
+        "landmark_crud batch": landmark_crud.batch_statement([1, 2, 3]),
+        "photo_crud batch": photo_crud.batch_statement([1, 2, 3]),
+        "rating_crud batch": rating_crud.batch_statement([1, 2, 3]),
+        "user_crud batch": user_crud.batch_statement([1, 2, 3]),
+        "find_landmarks_nearby": nearest_statement(48.85, 2.35, 5),
+        "find_landmarks_nearby (antimeridian)": nearest_statement(-17.7, 179.99, 50),
+        "find_landmarks_in_bbox": within_statement(PARIS, 500),
+        "cluster_landmarks": clusters_statement(PARIS, 5),
+        "get_photos_by_user": _page(Photo, [Photo.user_id == 1], None, PHOTO_FIELDS, PhotoBase),
+        "get_photos_by_landmark": _page(Photo, [Photo.landmark_id == 1], None, PHOTO_FIELDS, PhotoBase),
+        "get_all_photos": _page(Photo, (), None, PHOTO_FIELDS, PhotoBase),
+        "get_ratings_by_user": _page(Rating, [Rating.user_id == 1], None, RATING_FIELDS, RatingBase),
+        "get_ratings_by_landmark": _page(Rating, [Rating.landmark_id == 1], None, RATING_FIELDS, RatingBase),
+        "get_all_ratings": _page(Rating, (), None, RATING_FIELDS, RatingBase),
+        "get_users_by_username": _page(User, [User.username == "user1"], None, USER_FIELDS, UserBase),
+        "get_all_users": _page(User, (), None, USER_FIELDS, UserBase),
+        "get_current_user": principal_statement("user1"),
+        "get_similar_landmarks": similar_statement(1, 10),
+        "get_user_recommendations": recommendations_statement(1, 10),
+        "similarity_refresh (collect)": dirty_statement(),
+        "trending sync": sync_statement(datetime(2026, 1, 1)),
+        "memory index sync (changed)": landmark_search.changed_statement(datetime(2026, 1, 1)),
+        "geo index sync (changed)": landmark_geo.changed_statement(datetime(2026, 1, 1)),
+        "memory index sync (hidden)": hidden_landmarks_since(datetime(2026, 1, 1)),
+        "trending rebuild (ratings)": rating_events_statement(datetime(2026, 1, 1)),
+        "trending rebuild (photos)": photo_events_statement(datetime(2026, 1, 1)),
+    }
+    if dialect_name in ("mysql", "mariadb", "postgresql"):
+        queries["search_landmarks"] = search_statement(dialect_name, "eiffel tow", 20)
+    return queries
+
+
+# Строки плана PostgreSQL с полным проходом: Seq Scan или проход по индексу без Index Cond
+def _postgres_full_scans(lines):
+    scans = []
+    for i, line in enumerate(lines):
+        node = line.strip().lstrip("->").strip()
+        # "Seq Scan on landmarks", "Index Scan using ix on landmarks"
+        table = node.split(" on ", 1)[1].split()[0] if " on " in node else None
+        if node.startswith("Seq Scan"):
+            scans.append((table, line))
+        elif node.startswith(("Index Scan", "Index Only Scan")):
+            # Условия узла - строки до следующего узла ("->")
+            conditions = takewhile(lambda detail: "->" not in detail, lines[i + 1:])
+            if not any("Index Cond" in detail for detail in conditions):
+                scans.append((table, line))
+    return scans
+
+
+# Возвращает строки плана и полные проходы (таблица, строка плана) для текущего диалекта
+def explain(connection, statement):
+    dialect = connection.dialect.name
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={"literal_binds": True}))
+
+    if dialect == "sqlite":
+        rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+        details = [row[-1] for row in rows]
+        # SCAN по таблице - полный проход, в том числе "USING INDEX" / "USING COVERING INDEX"
+        # (весь индекс по порядку); SEARCH - поиск по ключу. Проход по уже материализованному
+        # подзапросу ("SCAN anon_1") таблицу не читает.
+        scans = [(line.split()[1], line) for line in details if line.startswith("SCAN") and line.split()[1] in Base.metadata.tables]
+        return details, scans
+
+    if dialect == "postgresql":
+        # На маленьких таблицах планировщик всегда выбирает Seq Scan, поэтому запрещаем его
+        connection.execute(text("SET LOCAL enable_seqscan = off"))
+        details = [row[0] for row in connection.execute(text(f"EXPLAIN {sql}")).fetchall()]
+        return details, _postgres_full_scans(details)
+
+    if dialect in ("mysql", "mariadb"):
+        result = connection.execute(text(f"EXPLAIN {sql}"))
+        rows = [dict(row._mapping) for row in result]
+        details = [f"{row.get('table')}: type={row.get('type')} key={row.get('key')}" for row in rows]
+        # ALL - проход по таблице, index - по всему индексу
+        scans = [
+            (row.get("table"), line) for line, row in zip(details, rows)
+            if row.get("type") in ("ALL", "index") and not str(row.get("table")).startswith("<")
+        ]
+        return details, scans
+
+    raise RuntimeError(f"Unsupported dialect for plan check: {dialect}")
+
+
+QUERIES = controller_queries(engine.dialect.name)
+
+
+@pytest.mark.parametrize("soft_delete", [False, True], ids=["visible", "soft-delete"])
+@pytest.mark.parametrize("name", list(QUERIES))
+def test_query_plan_uses_index(database, name, soft_delete):
+    statement = QUERIES[name]
+    if soft_delete:
+        statement = statement.options(*VISIBILITY_CRITERIA)
+    with engine.connect() as connection, connection.begin():
+        details, scans = explain(connection, statement)
+    allowed_table, _ = ALLOWED_SCANS.get(name, (None, None))
+    unexpected = [line for table, line in scans if table != allowed_table]
+    assert not unexpected, f"Full scan in {name}:\n" + "\n".join(details)
@@ -0,0 +1,99 @@
+# Параллельные записи оценок одной достопримечательности не роняют запросы и не портят агрегаты.
+import asyncio
+import random
+import pytest
+from fastapi import Request, Response
+from sqlalchemy import insert, select
+from config.database import SessionLocal, AsyncSessionLocal
+from controllers.ratingController import update_rating, delete_rating
+from models.user import User
+from models.landmarks import Landmark
+from models.rating import Rating
+from schemas.rating import RatingCreate
+from schemas.user import CurrentUser
+from services.bulk import insert_new_rows
+from services.ratingAggregates import HISTOGRAM_COLUMNS, recalculate_statement
+from services.ratingWrites import set_rating
+
+USERS = 20
+AGGREGATE_COLUMNS = [Landmark.rating_count, Landmark.rating_sum, Landmark.avg_rating, *HISTOGRAM_COLUMNS.values()]
+
+
+@pytest.fixture(scope="module")
+def landmarks(database):
+    with SessionLocal() as db:
+        users = db.execute(
+            insert(User).returning(User.id),
+            [{"username": f"rater{i}", "email": f"rater{i}@example.com", "password": "-"} for i in range(USERS)],
+        ).scalars().all()
+        landmark_ids = db.execute(insert(Landmark).returning(Landmark.id), [
+            {"name": f"Contested {i}", "description": "", "location": "", "country": "Raceland", "image_url": "", "user_id": users[0]}
+            for i in range(3)
+        ]).scalars().all()
+        db.commit()
+    return users, landmark_ids
+
+
+# Пакетная вставка (POST /ratings/bulk) после проверки "уже оценено" встречает оценку,
+# поставленную одиночной записью: такая строка пропускается, остальные вставляются
+def test_bulk_insert_skips_concurrent_rating(run_async, landmarks):
+    users, landmark_ids = landmarks
+    user_id = users[1]
+    rows = [{"user_id": user_id, "landmark_id": landmark_id, "rating": 3} for landmark_id in landmark_ids[:2]]
+
+    async def scenario():
+        async with AsyncSessionLocal() as db:
+            await set_rating(user_id, landmark_ids[1], 5)
+            inserted = await insert_new_rows(db, Rating, rows, ("landmark_id", "user_id"))
+            await db.commit()
+        async with AsyncSessionLocal() as db:
+            stored = await db.execute(select(Rating.landmark_id, Rating.rating).where(Rating.user_id == user_id))
+            return inserted, dict(stored.all())
+
+    inserted, stored = run_async(scenario)
+    assert set(inserted) == {(landmark_ids[0], user_id)}
+    assert stored == {landmark_ids[0]: 3, landmark_ids[1]: 5}
+
+
+def _request() -> Request:
+    return Request({"type": "http", "method": "PUT", "path": "/ratings/", "headers": [], "query_string": b""})
+
+
+# Один пользователь: оценка, изменение через PUT, пачка повторных кликов (склеиваются),
+# у части пользователей - снятие через DELETE
+async def _user_session(user_id: int, landmark_id: int, rng: random.Random) -> None:
+    current_user = CurrentUser(id=user_id, username=f"rater{user_id}")
+    rating_id, _, _ = await set_rating(user_id, landmark_id, rng.randint(1, 5))
+    async with AsyncSessionLocal() as db:
+        item = RatingCreate(landmark_id=landmark_id, rating=rng.randint(1, 5))
+        await update_rating(rating_id, item, _request(), Response(), db, current_user)
+    await asyncio.gather(*(set_rating(user_id, landmark_id, rng.randint(1, 5)) for _ in range(3)))
+    if user_id % 3 == 0:
+        async with AsyncSessionLocal() as db:
+            await delete_rating(rating_id, _request(), Response(), db, current_user)
+
+
+async def _aggregates(db, landmark_id: int) -> dict:
+    row = (await db.execute(select(*AGGREGATE_COLUMNS).where(Landmark.id == landmark_id))).one()
+    return dict(row._mapping)
+
+
+# Одновременные POST/PUT/DELETE оценок одной достопримечательности: хранимые агрегаты
+# (сдвигаются на дельту в транзакции записи) совпадают с полным пересчётом по таблице ratings
+def test_concurrent_writes_keep_aggregates(run_async, landmarks):
+    users, landmark_ids = landmarks
+    landmark_id = landmark_ids[2]
+    rng = random.Random(20)
+
+    async def scenario():
+        await asyncio.gather(*(_user_session(user_id, landmark_id, rng) for user_id in users))
+        async with AsyncSessionLocal() as db:
+            stored = await _aggregates(db, landmark_id)
+            await db.execute(recalculate_statement([landmark_id]), execution_options={"synchronize_session": False})
+            recalculated = await _aggregates(db, landmark_id)
+            await db.rollback()
+        return stored, recalculated
+
+    stored, recalculated = run_async(scenario)
+    assert stored["rating_count"] == USERS - len([user_id for user_id in users if user_id % 3 == 0])
+    assert stored == {**recalculated, "avg_rating": pytest.approx(recalculated["avg_rating"])}
@@ -0,0 +1,95 @@
+# Счёт популярности не переполняется со временем: точка отсчёта сдвигается, хранимые счёты переводятся.
+from datetime import timedelta
+import pytest
+from sqlalchemy import insert, select
+from config.database import SessionLocal, AsyncSessionLocal
+from models.user import User
+from models.landmarks import Landmark
+import services.trending as trending
+from services.trending import TrendingBoard, TRENDING_EPOCH, HALF_LIFE_SECONDS, EPOCH_SECONDS, EPOCH_SCALE
+
+HALF_LIFE = timedelta(seconds=HALF_LIFE_SECONDS)
+
+
+@pytest.fixture(scope="module")
+def landmarks(database):
+    with SessionLocal() as db:
+        user_id = db.execute(
+            insert(User).returning(User.id), [{"username": "trender", "email": "trender@example.com", "password": "-"}]
+        ).scalar_one()
+        landmark_ids = db.execute(insert(Landmark).returning(Landmark.id), [
+            {"name": f"Trending {i}", "description": "", "location": "", "country": f"Trendland {i}", "image_url": "", "user_id": user_id}
+            for i in range(4)
+        ]).scalars().all()
+        db.commit()
+    return landmark_ids
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(TRENDING_EPOCH)
+    monkeypatch.setattr(trending, "utcnow", clock)
+    return clock
+
+
+async def _built_board() -> TrendingBoard:
+    board = TrendingBoard()
+    async with AsyncSessionLocal() as db:
+        await board.ensure_built(db)
+    return board
+
+
+async def _stored(landmark_ids):
+    async with AsyncSessionLocal() as db:
+        rows = await db.execute(select(Landmark.id, Landmark.trending_score).where(Landmark.id.in_(landmark_ids)))
+        return dict(rows.all())
+
+
+# Через 1100 периодов полураспада (~9 лет при 72 часах) 2^1100 уже не помещается в float64
+def test_score_after_many_half_lives(run_async, landmarks, clock):
+    landmark_id = landmarks[0]
+    clock.now = TRENDING_EPOCH + HALF_LIFE * 1100
+
+    async def scenario():
+        board = await _built_board()
+        board.record(landmark_id, 2.0)
+        await board.checkpoint()
+        clock.now += HALF_LIFE
+        return board.top("Trendland 0", 1), await _stored([landmark_id])
+
+    top, stored = run_async(scenario)
+    assert top[0]["trending_score"] == pytest.approx(1.0)
+    assert stored[landmark_id] <= 2.0 * EPOCH_SCALE
+
+
+# События по разные стороны границы отрезка: порядок и счёт те же, что без сдвига точки отсчёта,
+# и в памяти процесса, и после загрузки из базы новым процессом
+def test_scores_carry_over_epoch_boundary(run_async, landmarks, clock):
+    first, second = landmarks[1], landmarks[2]
+    boundary = TRENDING_EPOCH + timedelta(seconds=EPOCH_SECONDS * 3)
+
+    async def scenario():
+        clock.now = boundary - HALF_LIFE
+        board = await _built_board()
+        board.record(first, 4.0)
+        board.record(second, 1.0)
+        await board.checkpoint()
+
+        clock.now = boundary + HALF_LIFE
+        board.record(second, 2.0)
+        await board.checkpoint()
+        return board.top(None, 10), (await _built_board()).top(None, 10)
+
+    in_memory, reloaded = run_async(scenario)
+    expected = {first: 4.0 / 4, second: 1.0 / 4 + 2.0}
+    for top in (in_memory, reloaded):
+        scores = {entry["id"]: entry["trending_score"] for entry in top if entry["id"] in expected}
+        assert scores == {landmark_id: pytest.approx(score) for landmark_id, score in expected.items()}
@@ -0,0 +1,41 @@
+# Отдельный процесс для фоновых задач (миниатюры, пересчёт агрегатов).
+# Запуск: python worker.py  (в API при этом можно выключить встроенный воркер: JOB_WORKER_INPROCESS=0)
+# Несколько воркеров на одной базе не берут одну задачу дважды.
+# Задачи сбрасывают кэш ответов (services/jobHandlers.py), поэтому нужен общий с API кэш:
+# RESPONSE_CACHE_BACKEND=redis. С кэшем в памяти сброс остался бы в этом процессе,
+# а API отдавали бы старые агрегаты и похожие до RESPONSE_CACHE_TTL - воркер не запускается.
+import asyncio
+import logging
+import signal
+
+from config.database import async_engine
+from models.user import User  # нужны для настройки связей моделей
+from models.landmarks import Landmark
+from models.photo import Photo
+from models.rating import Rating
+from services.jobs import job_worker
+from services.responseCache import RESPONSE_CACHE_BACKEND
+import services.jobHandlers  # регистрирует обработчики
+
+logger = logging.getLogger("worker")
+
+
+async def main():
+    if RESPONSE_CACHE_BACKEND != "redis":
+        raise SystemExit("worker.py needs RESPONSE_CACHE_BACKEND=redis: jobs invalidate the response cache of the API processes")
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for name in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(name, stopped.set)
+
+    job_worker.start()
+    logger.info("Job worker started, concurrency=%s", job_worker.concurrency)
+    await stopped.wait()
+    logger.info("Stopping job worker")
+    await job_worker.stop()
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())